@@ -0,0 +1,96 @@
+"""add catalog_changes (change feed)
+
+Revision ID: a1b2c3d4e5f7
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a1b2c3d4e5f7"
+down_revision: Union[str, None] = "f6a7b8c9d0e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+CATALOG_TABLES = (
+    ("live_streams", "live"),
+    ("vod_streams", "vod"),
+    ("series_items", "series"),
+)
+
+
+def upgrade():
+    op.create_table(
+        "catalog_changes",
+        sa.Column("seq", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column(
+            "version",
+            sa.BigInteger(),
+            server_default=sa.text("(pg_current_xact_id()::text::bigint)"),
+            nullable=False,
+        ),
+        sa.Column("content_type", sa.String(10), nullable=False),
+        sa.Column("item_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("provider_id", UUID(as_uuid=True), nullable=True),
+        sa.Column("op", sa.String(12), nullable=False),
+        sa.Column("changed_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("seq"),
+    )
+    op.create_index("ix_catalog_changes_version", "catalog_changes", ["version", "seq"])
+    op.create_index("ix_catalog_changes_item", "catalog_changes", ["item_id", "seq"])
+
+    # Triggers por statement con transition tables: una fila de log por fila tocada, sin
+    # importar si el cambio vino del ORM, de un upsert por lotes o de un merge con COPY.
+    op.execute("""
+        CREATE FUNCTION catalog_log_changes() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO catalog_changes (content_type, item_id, provider_id, op)
+                SELECT TG_ARGV[0], n.id, n.provider_id, 'insert' FROM new_rows n;
+            ELSIF TG_OP = 'UPDATE' THEN
+                INSERT INTO catalog_changes (content_type, item_id, provider_id, op)
+                SELECT TG_ARGV[0], n.id, n.provider_id,
+                       CASE WHEN o.is_active AND NOT n.is_active THEN 'deactivate' ELSE 'update' END
+                FROM new_rows n
+                JOIN old_rows o ON o.id = n.id;
+            ELSE
+                INSERT INTO catalog_changes (content_type, item_id, provider_id, op)
+                SELECT TG_ARGV[0], o.id, o.provider_id, 'delete' FROM old_rows o;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    for table, content_type in CATALOG_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_log_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION catalog_log_changes('{content_type}')
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_log_update AFTER UPDATE ON {table}
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION catalog_log_changes('{content_type}')
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_log_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION catalog_log_changes('{content_type}')
+        """)
+
+
+def downgrade():
+    for table, _ in CATALOG_TABLES:
+        for event in ("insert", "update", "delete"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_log_{event} ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS catalog_log_changes()")
+    op.drop_index("ix_catalog_changes_item", table_name="catalog_changes")
+    op.drop_index("ix_catalog_changes_version", table_name="catalog_changes")
+    op.drop_table("catalog_changes")
@@ -0,0 +1,37 @@
+"""add conditional fetch state to epg_sources
+
+Revision ID: a7b8c9d0e1fd
+Revises: f6a7b8c9d0ec
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7b8c9d0e1fd"
+down_revision: Union[str, None] = "f6a7b8c9d0ec"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column("epg_sources", sa.Column("http_etag", sa.String(length=255), nullable=True))
+    op.add_column("epg_sources", sa.Column("http_last_modified", sa.String(length=64), nullable=True))
+    op.add_column("epg_sources", sa.Column("content_digest", sa.String(length=64), nullable=True))
+    op.add_column("epg_sources", sa.Column("ingest_signature", sa.String(length=64), nullable=True))
+    op.add_column("epg_sources", sa.Column("last_ingest_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("epg_sources", sa.Column("last_sync_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("epg_sources", sa.Column("last_sync_outcome", sa.String(length=20), nullable=True))
+
+
+def downgrade():
+    op.drop_column("epg_sources", "last_sync_outcome")
+    op.drop_column("epg_sources", "last_sync_at")
+    op.drop_column("epg_sources", "last_ingest_at")
+    op.drop_column("epg_sources", "ingest_signature")
+    op.drop_column("epg_sources", "content_digest")
+    op.drop_column("epg_sources", "http_last_modified")
+    op.drop_column("epg_sources", "http_etag")
@@ -0,0 +1,30 @@
+"""add vod watermark to provider_auto_sync_config
+
+Revision ID: b2c3d4e5f6a8
+Revises: a1b2c3d4e5f7
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b2c3d4e5f6a8"
+down_revision: Union[str, None] = "a1b2c3d4e5f7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column("provider_auto_sync_config", sa.Column("vod_added_watermark", sa.BigInteger(), nullable=True))
+    op.add_column(
+        "provider_auto_sync_config",
+        sa.Column("vod_full_reconcile_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column("provider_auto_sync_config", "vod_full_reconcile_at")
+    op.drop_column("provider_auto_sync_config", "vod_added_watermark")
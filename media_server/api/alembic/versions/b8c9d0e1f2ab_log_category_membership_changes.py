@@ -0,0 +1,68 @@
+"""log category membership changes in catalog_changes
+
+Revision ID: b8c9d0e1f2ab
+Revises: a7b8c9d0e1fd
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b8c9d0e1f2ab"
+down_revision: Union[str, None] = "a7b8c9d0e1fd"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MEMBERSHIPS = (
+    ("live_stream_categories", "stream_id", "live_streams", "live"),
+    ("vod_stream_categories", "stream_id", "vod_streams", "vod"),
+    ("series_item_categories", "series_item_id", "series_items", "series"),
+)
+
+
+def upgrade():
+    # Un cambio de membresía (el item entra o sale de una categoría extra) no toca la fila
+    # del item: sin esto el feed no lo ve. Una fila de log por item tocado en el statement;
+    # si el item ya no existe (borrado en cascada) su propio trigger ya lo registró.
+    op.execute("""
+        CREATE FUNCTION catalog_log_memberships() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                EXECUTE format(
+                    'INSERT INTO catalog_changes (content_type, item_id, provider_id, op)
+                     SELECT %L, i.id, i.provider_id, ''categories''
+                     FROM (SELECT DISTINCT %I AS id FROM new_rows) m JOIN %I i ON i.id = m.id',
+                    TG_ARGV[0], TG_ARGV[1], TG_ARGV[2]);
+            ELSE
+                EXECUTE format(
+                    'INSERT INTO catalog_changes (content_type, item_id, provider_id, op)
+                     SELECT %L, i.id, i.provider_id, ''categories''
+                     FROM (SELECT DISTINCT %I AS id FROM old_rows) m JOIN %I i ON i.id = m.id',
+                    TG_ARGV[0], TG_ARGV[1], TG_ARGV[2]);
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    for table, item_col, item_table, content_type in MEMBERSHIPS:
+        op.execute(f"""
+            CREATE TRIGGER {table}_log_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION catalog_log_memberships('{content_type}', '{item_col}', '{item_table}')
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_log_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION catalog_log_memberships('{content_type}', '{item_col}', '{item_table}')
+        """)
+
+
+def downgrade():
+    for table, _, _, _ in MEMBERSHIPS:
+        for event in ("insert", "delete"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_log_{event} ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS catalog_log_memberships()")
@@ -0,0 +1,53 @@
+"""add stream x category membership tables
+
+Revision ID: c3d4e5f6a7b9
+Revises: b2c3d4e5f6a8
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c3d4e5f6a7b9"
+down_revision: Union[str, None] = "b2c3d4e5f6a8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MEMBERSHIPS = (
+    ("live_stream_categories", "stream_id", "live_streams"),
+    ("vod_stream_categories", "stream_id", "vod_streams"),
+    ("series_item_categories", "series_item_id", "series_items"),
+)
+
+
+def upgrade():
+    for table, item_col, item_table in MEMBERSHIPS:
+        op.create_table(
+            table,
+            sa.Column(item_col, UUID(as_uuid=True), nullable=False),
+            sa.Column("category_id", UUID(as_uuid=True), nullable=False),
+            sa.PrimaryKeyConstraint(item_col, "category_id"),
+            sa.ForeignKeyConstraint([item_col], [f"{item_table}.id"], ondelete="CASCADE"),
+            sa.ForeignKeyConstraint(["category_id"], ["categories.id"], ondelete="CASCADE"),
+        )
+        op.create_index(f"ix_{table}_category", table, ["category_id"])
+        # la categoría actual de cada fila pasa a ser su primera membresía
+        op.execute(f"""
+            INSERT INTO {table} ({item_col}, category_id)
+            SELECT id, category_id FROM {item_table} WHERE category_id IS NOT NULL
+        """)
+
+    # el content hash de antes no registró las membresías extra: que el próximo sync
+    # escriba todas las categorías una vez
+    op.execute("UPDATE categories SET content_hash = NULL")
+
+
+def downgrade():
+    for table, _, _ in reversed(MEMBERSHIPS):
+        op.drop_index(f"ix_{table}_category", table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,30 @@
+"""add content_hash to categories
+
+Revision ID: d4e5f6a7b8c9
+Revises: c8d9e1f2a3b4, a7b8c9d0e1f2, c1a2b3c4d5e6
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4e5f6a7b8c9"
+down_revision: Union[str, Sequence[str], None] = ("c8d9e1f2a3b4", "a7b8c9d0e1f2", "c1a2b3c4d5e6")
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    """
+    Hash of the last successfully synced streams/items response per category.
+    Lets the sync skip categories whose response did not change.
+    Also merges the three open heads.
+    """
+    op.add_column("categories", sa.Column("content_hash", sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    op.drop_column("categories", "content_hash")
@@ -0,0 +1,40 @@
+"""add epg_program_staging (UNLOGGED)
+
+Revision ID: d4e5f6a7b8ca
+Revises: c3d4e5f6a7b9
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4e5f6a7b8ca"
+down_revision: Union[str, None] = "c3d4e5f6a7b9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # UNLOGGED: la generación nueva de la guía vive acá hasta el swap del final del sync
+    op.execute("""
+        CREATE UNLOGGED TABLE epg_program_staging (
+            run_id uuid NOT NULL,
+            channel_id uuid NOT NULL,
+            start_time timestamptz NOT NULL,
+            end_time timestamptz NOT NULL,
+            title varchar(255) NOT NULL,
+            description varchar(2000),
+            category varchar(120),
+            created_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+    op.create_index(
+        "ix_epg_program_staging_run", "epg_program_staging", ["run_id", "channel_id", "start_time"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_epg_program_staging_run", table_name="epg_program_staging")
+    op.drop_table("epg_program_staging")
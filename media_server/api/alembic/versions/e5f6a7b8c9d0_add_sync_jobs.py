@@ -0,0 +1,49 @@
+"""add sync_jobs
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5f6a7b8c9d0"
+down_revision: Union[str, None] = "d4e5f6a7b8c9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        "sync_jobs",
+        sa.Column("id", UUID(as_uuid=True), nullable=False),
+        sa.Column("kind", sa.String(40), nullable=False),
+        sa.Column("provider_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("params", sa.JSON(), nullable=True),
+        sa.Column("status", sa.String(20), server_default="queued", nullable=False),
+        sa.Column("phase", sa.String(40), nullable=True),
+        sa.Column("categories_total", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("categories_done", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("items_done", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.String(2000), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.ForeignKeyConstraint(["provider_id"], ["providers.id"], ondelete="CASCADE"),
+    )
+    op.create_index("ix_sync_jobs_status_created", "sync_jobs", ["status", "created_at"])
+    op.create_index("ix_sync_jobs_provider_created", "sync_jobs", ["provider_id", "created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_sync_jobs_provider_created", table_name="sync_jobs")
+    op.drop_index("ix_sync_jobs_status_created", table_name="sync_jobs")
+    op.drop_table("sync_jobs")
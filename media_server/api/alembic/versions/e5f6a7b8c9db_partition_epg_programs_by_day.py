@@ -0,0 +1,100 @@
+"""partition epg_programs by day (start_time)
+
+Revision ID: e5f6a7b8c9db
+Revises: d4e5f6a7b8ca
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from datetime import datetime, time, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5f6a7b8c9db"
+down_revision: Union[str, None] = "d4e5f6a7b8ca"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_COLUMNS = "id, epg_source_id, provider_id, channel_id, start_time, end_time, title, description, category, created_at"
+
+# partición por delante de hoy (lo mismo que crea el mantenimiento al arrancar)
+_DAYS_AHEAD = 8
+
+
+def _create_partition(day):
+    lo = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    hi = lo + timedelta(days=1)
+    op.execute(f"""
+        CREATE TABLE IF NOT EXISTS epg_programs_p{day:%Y%m%d} PARTITION OF epg_programs
+        FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')
+    """)
+
+
+def upgrade():
+    op.execute("ALTER TABLE epg_programs RENAME TO epg_programs_old")
+    op.execute("ALTER TABLE epg_programs_old RENAME CONSTRAINT epg_programs_pkey TO epg_programs_old_pkey")
+    op.execute("ALTER TABLE epg_programs_old RENAME CONSTRAINT uq_epg_programs_channel_start TO uq_epg_programs_old_channel_start")
+    op.execute("ALTER INDEX ix_epg_programs_channel_time RENAME TO ix_epg_programs_old_channel_time")
+
+    # la PK / unique de una tabla particionada tienen que incluir la clave de partición
+    op.execute("""
+        CREATE TABLE epg_programs (
+            id uuid NOT NULL,
+            epg_source_id uuid NOT NULL REFERENCES epg_sources(id),
+            provider_id uuid REFERENCES providers(id),
+            channel_id uuid NOT NULL REFERENCES epg_channels(id),
+            start_time timestamptz NOT NULL,
+            end_time timestamptz NOT NULL,
+            title varchar(255) NOT NULL,
+            description varchar(2000),
+            category varchar(120),
+            created_at timestamptz NOT NULL,
+            CONSTRAINT epg_programs_pkey PRIMARY KEY (id, start_time),
+            CONSTRAINT uq_epg_programs_channel_start UNIQUE (channel_id, start_time)
+        ) PARTITION BY RANGE (start_time)
+    """)
+    op.create_index("ix_epg_programs_channel_time", "epg_programs", ["channel_id", "start_time", "end_time"])
+    op.create_index("ix_epg_programs_source_start", "epg_programs", ["epg_source_id", "start_time"])
+
+    bind = op.get_bind()
+    lo, hi = bind.execute(sa.text("SELECT min(start_time), max(start_time) FROM epg_programs_old")).one()
+    today = datetime.now(timezone.utc).date()
+    first = min(lo.astimezone(timezone.utc).date(), today) if lo else today
+    last = max(hi.astimezone(timezone.utc).date(), today + timedelta(days=_DAYS_AHEAD)) if hi else today + timedelta(days=_DAYS_AHEAD)
+    for n in range((last - first).days + 1):
+        _create_partition(first + timedelta(days=n))
+
+    op.execute(f"INSERT INTO epg_programs ({_COLUMNS}) SELECT {_COLUMNS} FROM epg_programs_old")
+    op.execute("DROP TABLE epg_programs_old")
+
+
+def downgrade():
+    op.execute("ALTER TABLE epg_programs RENAME TO epg_programs_part")
+    op.execute("ALTER TABLE epg_programs_part RENAME CONSTRAINT epg_programs_pkey TO epg_programs_part_pkey")
+    op.execute("ALTER TABLE epg_programs_part RENAME CONSTRAINT uq_epg_programs_channel_start TO uq_epg_programs_part_channel_start")
+    op.execute("ALTER INDEX ix_epg_programs_channel_time RENAME TO ix_epg_programs_part_channel_time")
+    op.execute("ALTER INDEX ix_epg_programs_source_start RENAME TO ix_epg_programs_part_source_start")
+
+    op.execute("""
+        CREATE TABLE epg_programs (
+            id uuid NOT NULL,
+            epg_source_id uuid NOT NULL,
+            provider_id uuid REFERENCES providers(id),
+            channel_id uuid NOT NULL REFERENCES epg_channels(id),
+            start_time timestamptz NOT NULL,
+            end_time timestamptz NOT NULL,
+            title varchar(255) NOT NULL,
+            description varchar(2000),
+            category varchar(120),
+            created_at timestamptz NOT NULL,
+            CONSTRAINT epg_programs_pkey PRIMARY KEY (id),
+            CONSTRAINT uq_epg_programs_channel_start UNIQUE (channel_id, start_time),
+            CONSTRAINT fk_epg_programs_epg_source FOREIGN KEY (epg_source_id) REFERENCES epg_sources(id)
+        )
+    """)
+    op.create_index("ix_epg_programs_channel_time", "epg_programs", ["channel_id", "start_time", "end_time"])
+    op.execute(f"INSERT INTO epg_programs ({_COLUMNS}) SELECT {_COLUMNS} FROM epg_programs_part")
+    op.execute("DROP TABLE epg_programs_part")
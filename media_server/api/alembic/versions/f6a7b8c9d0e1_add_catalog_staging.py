@@ -0,0 +1,42 @@
+"""add catalog_staging (UNLOGGED)
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f6a7b8c9d0e1"
+down_revision: Union[str, None] = "e5f6a7b8c9d0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # UNLOGGED: sin WAL, solo vive entre el COPY y el merge del mismo sync
+    op.execute("""
+        CREATE UNLOGGED TABLE catalog_staging (
+            seq bigserial PRIMARY KEY,
+            run_id uuid NOT NULL,
+            content_type varchar(10) NOT NULL,
+            category_id uuid,
+            ext_id integer NOT NULL,
+            name varchar NOT NULL,
+            icon varchar,
+            container_extension varchar,
+            rating varchar,
+            added varchar,
+            tmdb_id integer,
+            created_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+    op.create_index("ix_catalog_staging_run", "catalog_staging", ["run_id", "content_type"])
+
+
+def downgrade():
+    op.drop_index("ix_catalog_staging_run", table_name="catalog_staging")
+    op.drop_table("catalog_staging")
@@ -0,0 +1,30 @@
+"""add ingest filter to epg_sources
+
+Revision ID: f6a7b8c9d0ec
+Revises: e5f6a7b8c9db
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f6a7b8c9d0ec"
+down_revision: Union[str, None] = "e5f6a7b8c9db"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column(
+        "epg_sources",
+        sa.Column("ingest_filter", sa.String(length=20), nullable=False, server_default="all"),
+    )
+    op.add_column("epg_sources", sa.Column("ingest_allow_list", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("epg_sources", "ingest_allow_list")
+    op.drop_column("epg_sources", "ingest_filter")
@@ -0,0 +1,257 @@
+"""
+Change feed del catálogo (tabla catalog_changes, la llenan triggers).
+
+El cursor (`version`) es un id de transacción, no el seq de la fila: un seq más bajo
+puede commitearse después de uno más alto (syncs en paralelo) y el cliente se lo
+saltaría. Con ids de transacción, todo lo que tenga version < xmin del snapshot actual
+ya terminó (commit o rollback), así que [since, xmin) es un rango cerrado y cada cambio
+se entrega exactamente una vez.
+"""
+from datetime import datetime, timedelta, timezone
+import os
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.models import (
+    CatalogChange,
+    Category,
+    LiveStream,
+    LiveStreamCategory,
+    SeriesItem,
+    SeriesItemCategory,
+    VodStream,
+    VodStreamCategory,
+)
+
+
+# Filas de log más viejas que esto se compactan (queda solo la última por item)
+CATALOG_CHANGES_COMPACT_DAYS = int(os.getenv("CATALOG_CHANGES_COMPACT_DAYS", "7"))
+
+CONTENT_TYPES = ("live", "vod", "series")
+
+
+def current_horizon(db: Session) -> int:
+    """Primer id de transacción que todavía puede estar en curso."""
+    return int(db.execute(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")).scalar())
+
+
+def _category_ext_ids(db: Session, item_col, category_col, ids) -> dict:
+    """item_id -> category_id de Xtream de todas sus membresías (ordenados)."""
+    out: dict = {}
+    for item_id, ext_id in db.execute(
+        select(item_col, Category.provider_category_id)
+        .join(Category, Category.id == category_col)
+        .where(item_col.in_(ids))
+        .order_by(Category.provider_category_id)
+    ):
+        out.setdefault(item_id, []).append(ext_id)
+    return out
+
+
+def _live_items(db: Session, ids) -> dict:
+    rows = db.execute(
+        select(
+            LiveStream.id,
+            LiveStream.provider_id,
+            LiveStream.provider_stream_id,
+            LiveStream.name,
+            LiveStream.normalized_name,
+            LiveStream.custom_logo_url,
+            LiveStream.stream_icon,
+            LiveStream.channel_number,
+            LiveStream.approved,
+            LiveStream.is_active,
+            Category.provider_category_id,
+        )
+        .outerjoin(Category, Category.id == LiveStream.category_id)
+        .where(LiveStream.id.in_(ids))
+    ).all()
+    memberships = _category_ext_ids(db, LiveStreamCategory.stream_id, LiveStreamCategory.category_id, ids)
+    return {
+        r.id: {
+            "id": str(r.id),
+            "provider_id": str(r.provider_id),
+            "provider_stream_id": r.provider_stream_id,
+            "name": r.name,
+            "normalized_name": r.normalized_name,
+            "logo": r.custom_logo_url or r.stream_icon,
+            "channel_number": r.channel_number,
+            "category_ext_id": r.provider_category_id,
+            "category_ext_ids": memberships.get(r.id, []),
+            "approved": r.approved,
+        }
+        for r in rows
+        if r.is_active
+    }
+
+
+def _vod_items(db: Session, ids) -> dict:
+    rows = db.execute(
+        select(
+            VodStream.id,
+            VodStream.provider_id,
+            VodStream.provider_stream_id,
+            VodStream.name,
+            VodStream.custom_poster_url,
+            VodStream.stream_icon,
+            VodStream.container_extension,
+            VodStream.rating,
+            VodStream.added,
+            VodStream.approved,
+            VodStream.is_active,
+            VodStream.tmdb_id,
+            VodStream.tmdb_status,
+            VodStream.tmdb_title,
+            VodStream.tmdb_vote_average,
+            VodStream.tmdb_poster_path,
+            VodStream.tmdb_release_date,
+            Category.provider_category_id,
+        )
+        .outerjoin(Category, Category.id == VodStream.category_id)
+        .where(VodStream.id.in_(ids))
+    ).all()
+    memberships = _category_ext_ids(db, VodStreamCategory.stream_id, VodStreamCategory.category_id, ids)
+    return {
+        r.id: {
+            "id": str(r.id),
+            "provider_id": str(r.provider_id),
+            "provider_stream_id": r.provider_stream_id,
+            "name": r.name,
+            "poster": r.custom_poster_url or r.stream_icon,
+            "container_extension": r.container_extension,
+            "rating": r.rating,
+            "added": r.added,
+            "category_ext_id": r.provider_category_id,
+            "category_ext_ids": memberships.get(r.id, []),
+            "approved": r.approved,
+            "tmdb_id": r.tmdb_id,
+            "tmdb_status": r.tmdb_status,
+            "tmdb_title": r.tmdb_title,
+            "tmdb_vote_average": r.tmdb_vote_average,
+            "tmdb_poster_path": r.tmdb_poster_path,
+            "tmdb_release_date": r.tmdb_release_date.isoformat() if r.tmdb_release_date else None,
+        }
+        for r in rows
+        if r.is_active
+    }
+
+
+def _series_items(db: Session, ids) -> dict:
+    rows = db.execute(
+        select(
+            SeriesItem.id,
+            SeriesItem.provider_id,
+            SeriesItem.provider_series_id,
+            SeriesItem.name,
+            SeriesItem.custom_cover_url,
+            SeriesItem.cover,
+            SeriesItem.approved,
+            SeriesItem.is_active,
+            SeriesItem.tmdb_id,
+            SeriesItem.tmdb_status,
+            SeriesItem.tmdb_title,
+            SeriesItem.tmdb_vote_average,
+            SeriesItem.tmdb_poster_path,
+            Category.provider_category_id,
+        )
+        .outerjoin(Category, Category.id == SeriesItem.category_id)
+        .where(SeriesItem.id.in_(ids))
+    ).all()
+    memberships = _category_ext_ids(db, SeriesItemCategory.series_item_id, SeriesItemCategory.category_id, ids)
+    return {
+        r.id: {
+            "id": str(r.id),
+            "provider_id": str(r.provider_id),
+            "provider_series_id": r.provider_series_id,
+            "name": r.name,
+            "cover": r.custom_cover_url or r.cover,
+            "category_ext_id": r.provider_category_id,
+            "category_ext_ids": memberships.get(r.id, []),
+            "approved": r.approved,
+            "tmdb_id": r.tmdb_id,
+            "tmdb_status": r.tmdb_status,
+            "tmdb_title": r.tmdb_title,
+            "tmdb_vote_average": r.tmdb_vote_average,
+            "tmdb_poster_path": r.tmdb_poster_path,
+        }
+        for r in rows
+        if r.is_active
+    }
+
+
+_ITEM_LOADERS = {"live": _live_items, "vod": _vod_items, "series": _series_items}
+
+
+def changes_since(db: Session, since: int, limit: int, provider_id=None, types=CONTENT_TYPES) -> dict:
+    """
+    Deltas desde `since` (el `version` de la respuesta anterior; 0 = todo el log).
+
+    Por item se manda el estado actual, no cada cambio: `upserted` (activo) o `removed`
+    (desactivado o borrado). `category_ext_id` es la categoría principal y
+    `category_ext_ids` todas sus membresías. Las páginas cortan en borde de transacción; si `has_more`,
+    pedir de nuevo con el `version` devuelto.
+    """
+    horizon = current_horizon(db)
+    if since > horizon:
+        # cursor de otra base (restore / DB nueva): el cliente tiene que recargar todo
+        return {"version": horizon, "reset": True, "has_more": False}
+
+    def query(where):
+        q = select(CatalogChange.version, CatalogChange.content_type, CatalogChange.item_id).where(
+            *where, CatalogChange.content_type.in_(types)
+        )
+        if provider_id is not None:
+            q = q.where(CatalogChange.provider_id == provider_id)
+        return q.order_by(CatalogChange.version.asc(), CatalogChange.seq.asc())
+
+    rows = db.execute(
+        query([CatalogChange.version >= since, CatalogChange.version < horizon]).limit(limit + 1)
+    ).all()
+
+    next_version, has_more = horizon, False
+    if len(rows) > limit:
+        has_more = True
+        cut = rows[limit].version
+        if rows[0].version == cut:
+            # una sola transacción más grande que limit: va entera
+            rows = db.execute(query([CatalogChange.version == cut])).all()
+            next_version = cut + 1
+        else:
+            rows = [r for r in rows[:limit] if r.version != cut]
+            next_version = cut
+
+    ids: dict[str, set] = {t: set() for t in types}
+    for r in rows:
+        ids[r.content_type].add(r.item_id)
+
+    out = {"version": next_version, "reset": False, "has_more": has_more, "changes": len(rows)}
+    for content_type in types:
+        wanted = ids[content_type]
+        current = _ITEM_LOADERS[content_type](db, list(wanted)) if wanted else {}
+        out[content_type] = {
+            "upserted": list(current.values()),
+            "removed": sorted(str(i) for i in wanted if i not in current),
+        }
+    return out
+
+
+def compact_catalog_changes(db: Session, older_than_days: int = CATALOG_CHANGES_COMPACT_DAYS) -> int:
+    """
+    Borra las filas de log viejas que tienen una más nueva del mismo item. Como siempre queda
+    la última de cada item, un cursor viejo sigue recibiendo el estado correcto (sin reset).
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    res = db.execute(
+        text("""
+            DELETE FROM catalog_changes c
+            WHERE c.changed_at < :cutoff
+              AND EXISTS (
+                  SELECT 1 FROM catalog_changes n
+                  WHERE n.item_id = c.item_id AND n.seq > c.seq
+              )
+        """),
+        {"cutoff": cutoff},
+    )
+    db.commit()
+    return int(res.rowcount or 0)
@@ -0,0 +1,207 @@
+"""
+Ingesta por COPY: los items normalizados van a una tabla UNLOGGED (catalog_staging) con
+COPY FROM STDIN y después se mergean con un solo INSERT ... ON CONFLICT por tipo de
+contenido. Evita el binding de parámetros de SQLAlchemy fila por fila / chunk por chunk.
+
+Cada sync usa su propio run_id; las filas de staging se borran al terminar el merge (y
+las que quedan de runs que murieron a mitad se purgan al arrancar el siguiente).
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.catalog_upsert import live_row, series_row, vod_row
+from app.pg_copy import copy_records
+
+
+STAGING_TABLE = "catalog_staging"
+STAGING_RETENTION = timedelta(hours=24)
+
+_COPY_COLUMNS = (
+    "run_id",
+    "content_type",
+    "category_id",
+    "ext_id",
+    "name",
+    "icon",
+    "container_extension",
+    "rating",
+    "added",
+    "tmdb_id",
+)
+
+ROW_NORMALIZERS = {"live": live_row, "vod": vod_row, "series": series_row}
+EXT_KEYS = {"live": "provider_stream_id", "vod": "provider_stream_id", "series": "provider_series_id"}
+
+
+def _staging_tuple(run_id, content_type: str, category_id, row: dict) -> tuple:
+    return (
+        run_id,
+        content_type,
+        category_id,
+        row[EXT_KEYS[content_type]],
+        row["name"],
+        row.get("stream_icon") if content_type != "series" else row.get("cover"),
+        row.get("container_extension"),
+        row.get("rating"),
+        row.get("added"),
+        row.get("tmdb_id"),
+    )
+
+
+def copy_rows(db: Session, run_id, content_type: str, category_id, rows: list[dict]) -> int:
+    """COPY de filas normalizadas (live_row / vod_row / series_row) a staging."""
+    if not rows:
+        return 0
+    return copy_records(
+        db,
+        STAGING_TABLE,
+        _COPY_COLUMNS,
+        (_staging_tuple(run_id, content_type, category_id, row) for row in rows),
+    )
+
+
+def stage_items(db: Session, run_id, content_type: str, category_id, raw: list) -> set[int]:
+    """Normaliza items crudos del panel y los manda a staging. Devuelve los ids externos vistos."""
+    rows = [r for r in map(ROW_NORMALIZERS[content_type], raw) if r]
+    copy_rows(db, run_id, content_type, category_id, rows)
+    key = EXT_KEYS[content_type]
+    return {r[key] for r in rows}
+
+
+def _latest_staged(content_type: str) -> str:
+    # última aparición por ext_id dentro del run (mismo criterio que catalog_upsert._dedupe)
+    return f"""
+        SELECT DISTINCT ON (ext_id) *
+        FROM {STAGING_TABLE}
+        WHERE run_id = :run_id AND content_type = '{content_type}'
+        ORDER BY ext_id, seq DESC
+    """
+
+
+def _merge_sql(table: str, key: str, fields: dict[str, str], content_type: str, extra_insert: dict[str, str]) -> str:
+    """
+    fields: columna destino -> columna de staging. Misma condición de cambio que
+    catalog_upsert._upsert, así RETURNING cuenta solo inserts + updates reales.
+    extra_insert: columnas que solo se escriben al insertar (expresión SQL).
+    """
+    insert_cols = ["id", "provider_id", key, *fields, "is_active", "created_at", "updated_at", *extra_insert]
+    select_cols = [
+        "gen_random_uuid()", ":provider_id", "s.ext_id",
+        *[f"s.{src}" for src in fields.values()],
+        "true", ":now", ":now",
+        *extra_insert.values(),
+    ]
+    set_cols = ",\n            ".join(
+        [f"{col} = EXCLUDED.{col}" for col in fields] + ["is_active = true", "updated_at = EXCLUDED.updated_at"]
+    )
+    changed = " OR ".join(["t.is_active = false"] + [f"t.{col} IS DISTINCT FROM EXCLUDED.{col}" for col in fields])
+    return f"""
+        INSERT INTO {table} AS t ({', '.join(insert_cols)})
+        SELECT {', '.join(select_cols)}
+        FROM ({_latest_staged(content_type)}) AS s
+        ON CONFLICT (provider_id, {key}) DO UPDATE SET
+            {set_cols}
+        WHERE {changed}
+        RETURNING t.category_id
+    """
+
+
+_LIVE_MERGE = _merge_sql(
+    "live_streams", "provider_stream_id",
+    {"name": "name", "stream_icon": "icon"},
+    "live",
+    {"category_id": "s.category_id", "approved": "false"},
+)
+
+_SERIES_MERGE = _merge_sql(
+    "series_items", "provider_series_id",
+    {"name": "name", "cover": "icon"},
+    "series",
+    {"category_id": "s.category_id", "approved": "false", "tmdb_status": "'missing'", "tmdb_fail_count": "0"},
+)
+
+_VOD_MERGE = _merge_sql(
+    "vod_streams", "provider_stream_id",
+    {
+        "name": "name",
+        "stream_icon": "icon",
+        "container_extension": "container_extension",
+        "rating": "rating",
+        "added": "added",
+    },
+    "vod",
+    {"category_id": "s.category_id", "approved": "false", "tmdb_status": "'missing'", "tmdb_fail_count": "0"},
+)
+
+# Re-key por tmdb_id (igual que catalog_upsert._rekey_vod_by_tmdb): stream_id nuevo con un
+# tmdb_id que el provider ya tiene -> se reutiliza la fila más nueva con ese tmdb_id.
+_VOD_REKEY = f"""
+    WITH s AS (
+        SELECT DISTINCT ON (n.tmdb_id) n.*
+        FROM ({_latest_staged("vod")}) AS n
+        WHERE n.tmdb_id IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM vod_streams e
+              WHERE e.provider_id = :provider_id AND e.provider_stream_id = n.ext_id
+          )
+        ORDER BY n.tmdb_id, n.seq DESC
+    ),
+    target AS (
+        SELECT DISTINCT ON (v.tmdb_id) v.id, v.tmdb_id
+        FROM vod_streams v
+        JOIN s ON s.tmdb_id = v.tmdb_id
+        WHERE v.provider_id = :provider_id
+        ORDER BY v.tmdb_id, v.created_at DESC, v.id DESC
+    )
+    UPDATE vod_streams AS v
+    SET provider_stream_id = s.ext_id,
+        category_id = s.category_id,
+        name = s.name,
+        stream_icon = s.icon,
+        container_extension = s.container_extension,
+        rating = s.rating,
+        added = s.added,
+        is_active = true,
+        updated_at = :now
+    FROM target
+    JOIN s ON s.tmdb_id = target.tmdb_id
+    WHERE v.id = target.id
+    RETURNING v.category_id
+"""
+
+
+def merge_run(db: Session, content_type: str, provider_id, run_id, now: datetime | None = None) -> Counter:
+    """
+    Merge de todo lo staged en el run para un tipo de contenido.
+
+    Returns:
+        filas cambiadas por category_id (uuid de Category)
+    """
+    params = {"provider_id": provider_id, "run_id": run_id, "now": now or datetime.now(timezone.utc)}
+    changed: Counter = Counter()
+
+    if content_type == "vod":
+        changed.update(r[0] for r in db.execute(text(_VOD_REKEY), params))
+        sql = _VOD_MERGE
+    elif content_type == "live":
+        sql = _LIVE_MERGE
+    elif content_type == "series":
+        sql = _SERIES_MERGE
+    else:
+        raise ValueError(f"unknown content type: {content_type}")
+
+    changed.update(r[0] for r in db.execute(text(sql), params))
+    return changed
+
+
+def clear_run(db: Session, run_id) -> None:
+    db.execute(text(f"DELETE FROM {STAGING_TABLE} WHERE run_id = :run_id"), {"run_id": run_id})
+
+
+def purge_stale_staging(db: Session) -> int:
+    cutoff = datetime.now(timezone.utc) - STAGING_RETENTION
+    res = db.execute(text(f"DELETE FROM {STAGING_TABLE} WHERE created_at < :cutoff"), {"cutoff": cutoff})
+    return int(res.rowcount or 0)
@@ -0,0 +1,528 @@
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Category,
+    LiveStream,
+    LiveStreamCategory,
+    SeriesItem,
+    SeriesItemCategory,
+    VodStream,
+    VodStreamCategory,
+)
+
+
+# Postgres acepta 65535 parámetros por statement; ~12 columnas x 1000 filas queda holgado.
+UPSERT_CHUNK_ROWS = 1000
+
+# category_id no está: se escribe solo al insertar (categoría "principal"); las categorías
+# de verdad son las membresías (sync_memberships), así un item listado en varias
+# categorías no se re-escribe en cada pasada
+LIVE_FIELDS = ("name", "stream_icon")
+VOD_FIELDS = ("name", "stream_icon", "container_extension", "rating", "added")
+SERIES_FIELDS = ("name", "cover")
+
+# modelo -> (tabla de membresías, columna que apunta al item)
+MEMBERSHIPS = {
+    LiveStream: (LiveStreamCategory, "stream_id"),
+    VodStream: (VodStreamCategory, "stream_id"),
+    SeriesItem: (SeriesItemCategory, "series_item_id"),
+}
+
+log = logging.getLogger("mini_media_server")
+
+# modelo -> Category.cat_type
+CATEGORY_TYPES = {LiveStream: "live", VodStream: "vod", SeriesItem: "series"}
+
+
+def _as_str(value) -> str | None:
+    if value is None or value == "":
+        return None
+    return str(value)
+
+
+def parse_tmdb_id(raw_value) -> int | None:
+    try:
+        parsed = int(raw_value)
+    except Exception:
+        return None
+    return parsed if parsed > 0 else None
+
+
+def live_row(item) -> dict | None:
+    """Normaliza un item de get_live_streams. None si no trae stream_id válido."""
+    if not isinstance(item, dict):
+        return None
+    try:
+        ext_id = int(item.get("stream_id"))
+    except Exception:
+        return None
+    return {
+        "provider_stream_id": ext_id,
+        "name": (item.get("name") or "").strip() or f"Live {ext_id}",
+        "stream_icon": item.get("stream_icon") or None,
+    }
+
+
+def vod_row(item) -> dict | None:
+    """Normaliza un item de get_vod_streams. `tmdb_id` solo se usa para re-key, no se guarda."""
+    if not isinstance(item, dict):
+        return None
+    try:
+        ext_id = int(item.get("stream_id"))
+    except Exception:
+        return None
+    return {
+        "provider_stream_id": ext_id,
+        "name": (item.get("name") or "").strip() or f"VOD {ext_id}",
+        "stream_icon": item.get("stream_icon") or None,
+        "container_extension": _as_str(item.get("container_extension")),
+        "rating": _as_str(item.get("rating")),
+        "added": _as_str(item.get("added")),
+        "tmdb_id": parse_tmdb_id(item.get("tmdb_id") or item.get("tmdb")),
+    }
+
+
+def series_row(item) -> dict | None:
+    """Normaliza un item de get_series."""
+    if not isinstance(item, dict):
+        return None
+    try:
+        ext_id = int(item.get("series_id"))
+    except Exception:
+        return None
+    return {
+        "provider_series_id": ext_id,
+        "name": (item.get("name") or "").strip() or f"Series {ext_id}",
+        "cover": item.get("cover") or item.get("stream_icon") or None,
+    }
+
+
+def _dedupe(rows: list[dict], key: str) -> list[dict]:
+    # ON CONFLICT no permite tocar la misma fila dos veces en un statement: gana la última
+    by_key: dict[int, dict] = {}
+    for r in rows:
+        by_key[r[key]] = r
+    return list(by_key.values())
+
+
+def _chunks(rows: list[dict], size: int = UPSERT_CHUNK_ROWS):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _upsert(
+    db: Session,
+    model,
+    key: str,
+    fields: tuple[str, ...],
+    provider_id,
+    category_id,
+    rows: list[dict],
+    now: datetime,
+    insert_defaults: dict,
+) -> int:
+    """
+    INSERT ... ON CONFLICT (provider_id, <key>) DO UPDATE ... WHERE <algo cambió>.
+
+    Las filas idénticas no se escriben ni se devuelven, así que len(RETURNING) es
+    exactamente inserts + updates reales.
+    """
+    table = model.__table__
+    changed = 0
+
+    for chunk in _chunks(_dedupe(rows, key)):
+        values = [
+            {
+                "id": uuid.uuid4(),
+                "provider_id": provider_id,
+                "category_id": category_id,
+                key: r[key],
+                **{f: r[f] for f in fields},
+                "is_active": True,
+                "updated_at": now,
+                "created_at": now,
+                **insert_defaults,
+            }
+            for r in chunk
+        ]
+        stmt = insert(table).values(values)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.provider_id, table.c[key]],
+            set_={
+                **{f: excluded[f] for f in fields},
+                "is_active": True,
+                "updated_at": excluded.updated_at,
+            },
+            where=or_(
+                table.c.is_active == False,
+                *[table.c[f].is_distinct_from(excluded[f]) for f in fields],
+            ),
+        ).returning(table.c.id)
+        changed += len(db.execute(stmt).all())
+
+    return changed
+
+
+def upsert_live_streams(db: Session, provider_id, category_id, rows: list[dict], now: datetime | None = None) -> int:
+    return _upsert(
+        db, LiveStream, "provider_stream_id", LIVE_FIELDS,
+        provider_id, category_id, rows, now or datetime.now(timezone.utc),
+        insert_defaults={"approved": False},
+    )
+
+
+def upsert_series_items(db: Session, provider_id, category_id, rows: list[dict], now: datetime | None = None) -> int:
+    return _upsert(
+        db, SeriesItem, "provider_series_id", SERIES_FIELDS,
+        provider_id, category_id, rows, now or datetime.now(timezone.utc),
+        insert_defaults={"approved": False, "tmdb_status": "missing", "tmdb_fail_count": 0},
+    )
+
+
+def _rekey_vod_by_tmdb(db: Session, provider_id, category_id, rows: list[dict], now: datetime) -> tuple[int, set[int]]:
+    """
+    Items con stream_id nuevo pero tmdb_id ya conocido: el panel re-publicó la peli con otro
+    id. Reutilizamos la fila existente (y su metadata TMDB) en vez de crear otra.
+
+    Returns:
+        (changed, stream_ids ya resueltos que no deben pasar por el upsert)
+    """
+    pending = {r["tmdb_id"]: r for r in rows if r.get("tmdb_id") is not None}
+    if not pending:
+        return 0, set()
+
+    known = set(db.execute(
+        select(VodStream.provider_stream_id).where(
+            VodStream.provider_id == provider_id,
+            VodStream.provider_stream_id.in_([r["provider_stream_id"] for r in pending.values()]),
+        )
+    ).scalars().all())
+    pending = {t: r for t, r in pending.items() if r["provider_stream_id"] not in known}
+    if not pending:
+        return 0, set()
+
+    matches = db.execute(
+        select(VodStream)
+        .where(VodStream.provider_id == provider_id, VodStream.tmdb_id.in_(list(pending)))
+        .order_by(VodStream.created_at.desc(), VodStream.id.desc())
+    ).scalars().all()
+
+    changed = 0
+    handled: set[int] = set()
+    for current in matches:
+        r = pending.get(current.tmdb_id)
+        if r is None or r["provider_stream_id"] in handled:
+            continue
+        handled.add(r["provider_stream_id"])
+        current.provider_stream_id = r["provider_stream_id"]
+        current.category_id = category_id
+        for f in VOD_FIELDS:
+            setattr(current, f, r[f])
+        current.is_active = True
+        current.updated_at = now
+        changed += 1
+
+    if handled:
+        db.flush()
+    return changed, handled
+
+
+def upsert_vod_streams(db: Session, provider_id, category_id, rows: list[dict], now: datetime | None = None) -> int:
+    now = now or datetime.now(timezone.utc)
+    changed, handled = _rekey_vod_by_tmdb(db, provider_id, category_id, rows, now)
+    if handled:
+        rows = [r for r in rows if r["provider_stream_id"] not in handled]
+    return changed + _upsert(
+        db, VodStream, "provider_stream_id", VOD_FIELDS,
+        provider_id, category_id, rows, now,
+        insert_defaults={"approved": False, "tmdb_status": "missing", "tmdb_fail_count": 0},
+    )
+
+
+def sync_memberships(
+    db: Session,
+    model,
+    key: str,
+    provider_id,
+    category_id,
+    seen,
+    full: bool = True,
+) -> tuple[int, int]:
+    """
+    Deja las membresías de la categoría igual a los ids vistos: inserta las que faltan y,
+    si full (se vio la categoría completa), borra las de items que ya no vienen. Un solo
+    statement; las que ya estaban no se tocan.
+
+    Returns:
+        (agregadas, quitadas)
+    """
+    membership, item_col = MEMBERSHIPS[model]
+    mtable = membership.__table__.name
+    delete_cte = f"""
+        removed AS (
+            DELETE FROM {mtable} m
+            WHERE m.category_id = :category_id
+              AND NOT EXISTS (SELECT 1 FROM cur WHERE cur.id = m.{item_col})
+            RETURNING 1
+        )
+    """ if full else "removed AS (SELECT 1 WHERE false)"
+    row = db.execute(
+        text(f"""
+            WITH cur AS (
+                SELECT t.id FROM {model.__table__.name} t
+                WHERE t.provider_id = :provider_id
+                  AND t.{key} = ANY(CAST(:seen AS integer[]))
+            ),
+            added AS (
+                INSERT INTO {mtable} ({item_col}, category_id)
+                SELECT id, :category_id FROM cur
+                ON CONFLICT DO NOTHING
+                RETURNING 1
+            ),
+            {delete_cte}
+            SELECT (SELECT count(*) FROM added), (SELECT count(*) FROM removed)
+        """),
+        {"provider_id": provider_id, "category_id": category_id, "seen": list(seen)},
+    ).one()
+    return int(row[0]), int(row[1])
+
+
+def prune_inactive_memberships(db: Session, model, provider_id) -> int:
+    """
+    Borra las membresías en categorías del provider que el panel ya no devuelve
+    (upsert_categories las dejó is_active=false): esas categorías no se recorren, así que
+    sync_memberships nunca las vacía.
+    """
+    membership, _item_col = MEMBERSHIPS[model]
+    res = db.execute(
+        text(f"""
+            DELETE FROM {membership.__table__.name} AS m
+            USING categories AS c
+            WHERE c.id = m.category_id
+              AND c.provider_id = :provider_id
+              AND c.cat_type = :cat_type
+              AND NOT c.is_active
+        """),
+        {"provider_id": provider_id, "cat_type": CATEGORY_TYPES[model]},
+    )
+    return int(res.rowcount or 0)
+
+
+def deactivate_orphans(db: Session, model, provider_id, now: datetime) -> int:
+    """
+    Desactiva los items activos del provider que ya no están en ninguna categoría (antes
+    se sacan las membresías de categorías que ya no vienen).
+
+    Nunca vacía el catálogo entero: sin ninguna categoría activa del tipo (panel que
+    devolvió una lista vacía o rota) no hace nada, y si la pasada dejara sin items activos
+    a un provider que tenía, se deshace y se loguea en vez de tomarse como normal.
+    """
+    membership, item_col = MEMBERSHIPS[model]
+    cat_type = CATEGORY_TYPES[model]
+    active_cats = db.execute(
+        select(Category.id)
+        .where(Category.provider_id == provider_id, Category.cat_type == cat_type, Category.is_active == True)
+        .limit(1)
+    ).first()
+    if active_cats is None:
+        log.warning("deactivate_orphans skipped provider_id=%s type=%s: no active categories", provider_id, cat_type)
+        return 0
+
+    table = model.__table__.name
+    active = int(db.execute(
+        text(f"SELECT count(*) FROM {table} WHERE provider_id = :provider_id AND is_active"),
+        {"provider_id": provider_id},
+    ).scalar())
+
+    savepoint = db.begin_nested()
+    prune_inactive_memberships(db, model, provider_id)
+    res = db.execute(
+        text(f"""
+            UPDATE {model.__table__.name} AS t
+            SET is_active = false, updated_at = :now
+            WHERE t.provider_id = :provider_id
+              AND t.is_active
+              AND NOT EXISTS (
+                  SELECT 1 FROM {membership.__table__.name} m WHERE m.{item_col} = t.id
+              )
+        """),
+        {"now": now, "provider_id": provider_id},
+    )
+    deactivated = int(res.rowcount or 0)
+    if active and deactivated >= active:
+        savepoint.rollback()
+        log.warning(
+            "deactivate_orphans would deactivate all %s active %s items of provider_id=%s; skipped",
+            active, cat_type, provider_id,
+        )
+        return 0
+    savepoint.commit()
+    return deactivated
+
+
+def rehome_primary_category(db: Session, model, provider_id, now: datetime) -> int:
+    """
+    category_id (principal) de los items que salieron de esa categoría pasa a una de sus
+    membresías actuales. Solo toca items que de verdad se movieron.
+    """
+    membership, item_col = MEMBERSHIPS[model]
+    mtable = membership.__table__.name
+    table = model.__table__.name
+    res = db.execute(
+        text(f"""
+            UPDATE {table} AS t
+            SET category_id = x.category_id, updated_at = :now
+            FROM (
+                SELECT DISTINCT ON (m.{item_col}) m.{item_col} AS item_id, m.category_id
+                FROM {mtable} m
+                JOIN {table} s ON s.id = m.{item_col}
+                WHERE s.provider_id = :provider_id
+                  AND NOT EXISTS (
+                      SELECT 1 FROM {mtable} p
+                      WHERE p.{item_col} = s.id AND p.category_id = s.category_id
+                  )
+                ORDER BY m.{item_col}, m.category_id
+            ) AS x
+            WHERE t.id = x.item_id
+        """),
+        {"now": now, "provider_id": provider_id},
+    )
+    return int(res.rowcount or 0)
+
+
+# Metadata TMDB que hereda la fila ganadora de un duplicado synced (tmdb_error va a NULL y
+# el status a synced, igual que el copiado campo a campo de tmdb_sync)
+_VOD_TMDB_COPY_FIELDS = (
+    "tmdb_id",
+    "tmdb_last_sync",
+    "tmdb_title",
+    "tmdb_overview",
+    "tmdb_release_date",
+    "tmdb_genres",
+    "tmdb_vote_average",
+    "tmdb_poster_path",
+    "tmdb_backdrop_path",
+    "tmdb_raw",
+)
+
+_VOD_DEDUPE_SQL = """
+    WITH ranked AS (
+        SELECT v.*,
+               row_number() OVER (
+                   PARTITION BY v.provider_stream_id
+                   ORDER BY v.created_at DESC, v.id DESC
+               ) AS rn
+        FROM vod_streams v
+        WHERE v.provider_id = :provider_id
+          AND v.provider_stream_id = ANY(CAST(:seen AS integer[]))
+    ),
+    deleted AS (
+        DELETE FROM vod_streams t
+        USING ranked r
+        WHERE t.id = r.id AND r.rn > 1
+        RETURNING r.*
+    ),
+    donor AS (
+        -- primer duplicado con TMDB synced en el orden del grupo
+        SELECT DISTINCT ON (provider_stream_id) *
+        FROM deleted
+        WHERE tmdb_status = 'synced'
+        ORDER BY provider_stream_id, rn
+    ),
+    copied AS (
+        UPDATE vod_streams w
+        SET {copy_set},
+            tmdb_status = 'synced',
+            tmdb_error = NULL,
+            updated_at = :now
+        FROM ranked r
+        JOIN donor d ON d.provider_stream_id = r.provider_stream_id
+        WHERE w.id = r.id
+          AND r.rn = 1
+          AND r.tmdb_status IS DISTINCT FROM 'synced'
+        RETURNING w.id
+    )
+    SELECT (SELECT count(*) FROM deleted) + (SELECT count(*) FROM copied)
+""".format(copy_set=",\n            ".join(f"{f} = d.{f}" for f in _VOD_TMDB_COPY_FIELDS))
+
+
+def dedupe_vod_streams(db: Session, provider_id, seen, now: datetime) -> int:
+    """
+    Para cada provider_stream_id visto con más de una fila: queda la más nueva
+    (created_at DESC, id DESC) y se borran las demás. Si la ganadora no tiene TMDB synced
+    y algún duplicado sí, hereda la metadata del primero de ellos antes del borrado.
+
+    Devuelve filas borradas + ganadoras actualizadas (lo mismo que contaba el pase ORM).
+    """
+    if not seen:
+        return 0
+    return int(db.execute(
+        text(_VOD_DEDUPE_SQL),
+        {"provider_id": provider_id, "seen": list(seen), "now": now},
+    ).scalar() or 0)
+
+
+def upsert_categories(db: Session, provider_id, cat_type: str, raw: list[dict]) -> int:
+    """Upsert + desactivación de las categorías que ya no vienen. Devuelve filas cambiadas."""
+    now = datetime.now(timezone.utc)
+    rows: dict[int, str] = {}
+    for item in raw or []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            ext_id = int(item.get("category_id"))
+        except Exception:
+            continue
+        rows[ext_id] = (item.get("category_name") or "").strip() or f"Category {ext_id}"
+
+    table = Category.__table__
+    changed = 0
+    items = list(rows.items())
+    for i in range(0, len(items), UPSERT_CHUNK_ROWS):
+        stmt = insert(table).values([
+            {
+                "id": uuid.uuid4(),
+                "provider_id": provider_id,
+                "cat_type": cat_type,
+                "provider_category_id": ext_id,
+                "name": name,
+                "is_active": True,
+                "updated_at": now,
+                "created_at": now,
+            }
+            for ext_id, name in items[i:i + UPSERT_CHUNK_ROWS]
+        ])
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_categories_provider_type_extid",
+            set_={"name": stmt.excluded.name, "is_active": True, "updated_at": stmt.excluded.updated_at},
+            where=or_(table.c.is_active == False, table.c.name.is_distinct_from(stmt.excluded.name)),
+        ).returning(table.c.id)
+        changed += len(db.execute(stmt).all())
+
+    if not rows:
+        # lista vacía o sin ninguna categoría válida: casi seguro un panel con problemas,
+        # no un catálogo vacío; no se desactiva nada
+        log.warning("upsert_categories provider_id=%s type=%s: no valid categories, nothing deactivated", provider_id, cat_type)
+        return changed
+
+    # desactiva las que ya no vienen
+    res = db.execute(
+        update(Category)
+        .where(
+            Category.provider_id == provider_id,
+            Category.cat_type == cat_type,
+            Category.is_active == True,
+            Category.provider_category_id.not_in(list(rows)),
+        )
+        .values(is_active=False, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    changed += int(res.rowcount or 0)
+    return changed
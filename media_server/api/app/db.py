@@ -7,7 +7,25 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL no está definido. Revisa tu .env")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Conexiones que pueden tener tomadas a la vez los threads de fondo: auto-sync de providers
+# (Session + lock), sync de EPG (Session + lock), workers de jobs (Session + lock +
+# heartbeat) y un thread por loop de main.py. Se suman a las del default para los requests,
+# así un sync largo no deja a la API esperando el pool.
+_BACKGROUND_CONNECTIONS = (
+    2 * max(1, int(os.getenv("PROVIDER_AUTO_SYNC_WORKERS", "4")))
+    + 2 * max(1, int(os.getenv("EPG_SYNC_WORKERS", "3")))
+    + 3 * max(1, int(os.getenv("SYNC_JOB_WORKERS", "1")))
+    + 7
+)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(5 + _BACKGROUND_CONNECTIONS)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+engine = create_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
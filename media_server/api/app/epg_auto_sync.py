@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.db import SessionLocal
+from app.models import EpgSource
+
+
+log = logging.getLogger("mini_media_server")
+
+# Fuentes EPG sincronizadas a la vez. Cada una usa 2 conexiones (Session + lock).
+EPG_SYNC_WORKERS = int(os.getenv("EPG_SYNC_WORKERS", "3"))
+
+
+def active_epg_source_ids() -> list[str]:
+    db = SessionLocal()
+    try:
+        return [
+            str(x) for x in db.execute(select(EpgSource.id).where(EpgSource.is_active == True)).scalars().all()
+        ]
+    finally:
+        db.close()
+
+
+def _sync_one_source(source_id: str, hours: int, mode: str) -> dict:
+    """Sync de una fuente en su propia Session (el lock por fuente lo toma sync_epg_for_source_id)."""
+    # Import here to avoid circular import
+    from app.routers.epg import sync_epg_for_source_id
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        try:
+            r = sync_epg_for_source_id(db, source_id=source_id, hours=hours, purge_all_programs=True, mode=mode)
+            return {
+                "source_id": source_id,
+                "ok": True,
+                "outcome": r.get("outcome"),
+                "programs": r.get("programs"),
+                "timing": r.get("timing"),
+            }
+        except HTTPException as e:
+            db.rollback()
+            if e.status_code == 409:
+                # otro worker / proceso ya está sincronizando esta fuente
+                return {"source_id": source_id, "ok": True, "skipped": "locked"}
+            log.warning("EPG auto-sync failed for source_id=%s: %s", source_id, e.detail)
+            error = e.detail
+        except Exception as e:
+            db.rollback()
+            log.exception("EPG auto-sync failed for source_id=%s: %s", source_id, e)
+            error = str(e)
+        return {
+            "source_id": source_id,
+            "ok": False,
+            "error": error,
+            "timing": {"total_s": round(time.perf_counter() - started, 2)},
+        }
+    finally:
+        db.close()
+
+
+def run_epg_auto_sync(hours: int, mode: str, source_ids: list[str] | None = None) -> dict:
+    """
+    Sincroniza las fuentes activas en paralelo (hasta EPG_SYNC_WORKERS a la vez) y espera
+    a que terminen todas.
+
+    Returns:
+        resultados por fuente (outcome, conteos, timing) y el tiempo total de la pasada
+    """
+    started = time.perf_counter()
+    ids = active_epg_source_ids() if source_ids is None else source_ids
+    if not ids:
+        return {"sources": 0, "results": [], "elapsed_s": 0.0}
+
+    workers = max(1, min(EPG_SYNC_WORKERS, len(ids)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="epg-sync") as pool:
+        results = list(pool.map(lambda sid: _sync_one_source(sid, hours, mode), ids))
+
+    return {"sources": len(ids), "results": results, "elapsed_s": round(time.perf_counter() - started, 2)}
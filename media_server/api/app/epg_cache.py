@@ -0,0 +1,76 @@
+"""
+Cache en proceso de respuestas de /epg/grid.
+
+La clave lleva el bucket de 5 minutos (la grilla se arma con el inicio del bucket como
+"ahora"), así que una entrada vale como mucho un bucket aunque nadie invalide. Un sync de
+EPG o un cambio de mapeo de canales llaman a invalidate_epg_cache().
+
+Es por proceso: en otro worker la invalidación no llega y el bucket acota lo viejo.
+Los índices en memoria (epg_now) miran epg_cache_generation() para saber si tienen que
+reconstruirse.
+"""
+from collections import OrderedDict
+from datetime import datetime, timezone
+import os
+import threading
+
+
+EPG_GRID_CACHE = os.getenv("EPG_GRID_CACHE", "1").strip().lower() not in {"0", "false", "no", "off"}
+EPG_GRID_CACHE_SIZE = int(os.getenv("EPG_GRID_CACHE_SIZE", "256"))
+EPG_GRID_BUCKET_SECONDS = 300
+
+_lock = threading.Lock()
+_entries: "OrderedDict[tuple, dict]" = OrderedDict()
+_generation = 0
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def grid_bucket(now: datetime | None = None) -> datetime:
+    """Inicio del bucket de 5 minutos de `now` (UTC)."""
+    ts = int((now or datetime.now(timezone.utc)).timestamp())
+    return datetime.fromtimestamp(ts - ts % EPG_GRID_BUCKET_SECONDS, tz=timezone.utc)
+
+
+def grid_cache_get(key: tuple) -> tuple[dict | None, int]:
+    """
+    Returns:
+        (respuesta cacheada o None, generación actual para pasarle a grid_cache_put)
+    """
+    with _lock:
+        hit = _entries.get(key) if EPG_GRID_CACHE else None
+        if hit is not None:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+        return hit, _generation
+
+
+def grid_cache_put(key: tuple, value: dict, generation: int) -> None:
+    """Guarda, salvo que haya habido una invalidación mientras se armaba la respuesta."""
+    if not EPG_GRID_CACHE:
+        return
+    with _lock:
+        if generation != _generation:
+            return
+        _entries[key] = value
+        _entries.move_to_end(key)
+        while len(_entries) > EPG_GRID_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def invalidate_epg_cache() -> None:
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+        _stats["invalidations"] += 1
+
+
+def epg_cache_generation() -> int:
+    return _generation
+
+
+def epg_cache_stats() -> dict:
+    with _lock:
+        return {"entries": len(_entries), "generation": _generation, **_stats}
@@ -0,0 +1,290 @@
+"""
+Índice en memoria de la ventana activa de la guía (now - 6h .. now + 36h).
+
+Por fuente y canal: arrays ordenados de start / end (epoch, array('q')) y, en paralelo,
+ids de strings internadas en una tabla por fuente (títulos, categorías y descripciones se
+repiten mucho). Las consultas de ventana son bisect sobre start.
+
+- Se carga por fuente: después de cada sync que ingirió (sync_epg_for_source_id) y desde
+  un loop de main.py que cada EPG_INDEX_CHECK_SECONDS mira epg_sources.last_ingest_at para
+  recargar lo que cambió en otro proceso o lo que quedó corto (la ventana avanza). Las
+  lecturas nunca cargan.
+- Si una consulta cae fuera de lo cargado (o la fuente no está cargada todavía) devuelve
+  None y el que llama va a Postgres.
+"""
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+import sys
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import EpgChannel, EpgProgram, EpgSource
+
+
+log = logging.getLogger("mini_media_server")
+
+EPG_INDEX = os.getenv("EPG_INDEX", "1").strip().lower() not in {"0", "false", "no", "off"}
+EPG_INDEX_PAST_HOURS = int(os.getenv("EPG_INDEX_PAST_HOURS", "6"))
+EPG_INDEX_FUTURE_HOURS = int(os.getenv("EPG_INDEX_FUTURE_HOURS", "36"))
+# Cada cuánto se mira epg_sources para recargar lo que cambió
+EPG_INDEX_CHECK_SECONDS = int(os.getenv("EPG_INDEX_CHECK_SECONDS", "60"))
+# Una fuente sin syncs nuevos se recarga igual pasado esto (la ventana avanza)
+EPG_INDEX_RELOAD_HOURS = int(os.getenv("EPG_INDEX_RELOAD_HOURS", "6"))
+
+_LOAD_BATCH = 5000
+
+
+class _Channel:
+    __slots__ = ("display_name", "starts", "ends", "titles", "categories", "descriptions", "max_len")
+
+    def __init__(self, display_name: str | None):
+        self.display_name = display_name
+        self.starts = array("q")
+        self.ends = array("q")
+        self.titles = array("I")
+        self.categories = array("I")
+        self.descriptions = array("I")
+        self.max_len = 0
+
+
+class _Source:
+    __slots__ = ("window_start", "window_end", "loaded_at", "marker", "strings", "channels")
+
+    def __init__(self, window_start: int, window_end: int, marker):
+        self.window_start = window_start
+        self.window_end = window_end
+        self.loaded_at = time.time()
+        self.marker = marker
+        self.strings: list[str | None] = [None]  # id 0 = NULL
+        self.channels: dict[str, _Channel] = {}
+
+
+_sources: dict[str, _Source] = {}
+_load_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "loads": 0, "load_seconds": 0.0}
+
+
+def _ts(dt: datetime) -> int:
+    return int(dt.timestamp())
+
+
+def _dt(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def _load_source(db: Session, source_id: str, marker) -> _Source:
+    now = datetime.now(timezone.utc)
+    window_start = now - timedelta(hours=EPG_INDEX_PAST_HOURS)
+    window_end = now + timedelta(hours=EPG_INDEX_FUTURE_HOURS)
+    src = _Source(_ts(window_start), _ts(window_end), marker)
+
+    by_id: dict = {}
+    for ch_id, xml_id, display_name in db.execute(
+        select(EpgChannel.id, EpgChannel.xmltv_id, EpgChannel.display_name)
+        .where(EpgChannel.epg_source_id == source_id)
+    ):
+        by_id[ch_id] = src.channels[xml_id] = _Channel(display_name)
+
+    ids: dict[str, int] = {}
+    strings = src.strings
+
+    def intern(value: str | None) -> int:
+        if value is None:
+            return 0
+        n = ids.get(value)
+        if n is None:
+            n = ids[value] = len(strings)
+            strings.append(value)
+        return n
+
+    rows = db.execute(
+        select(
+            EpgProgram.channel_id,
+            EpgProgram.start_time,
+            EpgProgram.end_time,
+            EpgProgram.title,
+            EpgProgram.category,
+            EpgProgram.description,
+        )
+        .where(
+            EpgProgram.epg_source_id == source_id,
+            EpgProgram.end_time > window_start,
+            EpgProgram.start_time < window_end,
+        )
+        .order_by(EpgProgram.channel_id, EpgProgram.start_time)
+        .execution_options(yield_per=_LOAD_BATCH)
+    )
+    for ch_id, start_time, end_time, title, category, description in rows:
+        ch = by_id.get(ch_id)
+        if ch is None:
+            continue
+        start, end = _ts(start_time), _ts(end_time)
+        ch.starts.append(start)
+        ch.ends.append(end)
+        ch.titles.append(intern(title))
+        ch.categories.append(intern(category))
+        ch.descriptions.append(intern(description))
+        ch.max_len = max(ch.max_len, end - start)
+    return src
+
+
+def reload_epg_source(db: Session, source_id: str) -> None:
+    """Recarga una fuente (tras un sync) y la reemplaza de una vez en el índice."""
+    if not EPG_INDEX:
+        return
+    key = str(source_id)
+    with _load_lock:
+        started = time.perf_counter()
+        marker = db.execute(select(EpgSource.last_ingest_at).where(EpgSource.id == source_id)).scalar_one_or_none()
+        src = _load_source(db, key, marker)
+        _sources[key] = src
+        _stats["loads"] += 1
+        _stats["load_seconds"] += time.perf_counter() - started
+    # la lectura no debe quedar dentro de una transacción abierta
+    db.commit()
+
+
+def refresh_epg_index(db: Session) -> int:
+    """
+    Carga las fuentes nuevas, las re-ingeridas en otro proceso y las cargadas hace más de
+    EPG_INDEX_RELOAD_HOURS; saca las borradas. Si hay un reload post-sync en curso, no
+    espera (lo hace la próxima pasada).
+
+    Returns:
+        cantidad de fuentes cargadas
+    """
+    if not EPG_INDEX or not _load_lock.acquire(blocking=False):
+        return 0
+    loaded = 0
+    try:
+        markers = {str(k): v for k, v in db.execute(select(EpgSource.id, EpgSource.last_ingest_at)).all()}
+        for gone in set(_sources) - set(markers):
+            _sources.pop(gone, None)
+        stale_before = time.time() - EPG_INDEX_RELOAD_HOURS * 3600
+        for key, marker in markers.items():
+            cur = _sources.get(key)
+            if cur is not None and cur.marker == marker and cur.loaded_at > stale_before:
+                continue
+            started = time.perf_counter()
+            try:
+                _sources[key] = _load_source(db, key, marker)
+            except Exception as e:
+                log.warning("EPG index load failed for source_id=%s: %s", key, e)
+                db.rollback()
+                continue
+            _stats["loads"] += 1
+            _stats["load_seconds"] += time.perf_counter() - started
+            loaded += 1
+        db.commit()
+    finally:
+        _load_lock.release()
+    return loaded
+
+
+def _covering(source_id: str, t0: int, t1: int) -> _Source | None:
+    src = _sources.get(source_id)
+    if src is None or t0 < src.window_start or t1 > src.window_end:
+        _stats["misses"] += 1
+        return None
+    _stats["hits"] += 1
+    return src
+
+
+def _slice(ch: _Channel, t0: int, t1: int) -> range:
+    """
+    Posiciones candidatas para [t0, t1): start < t1 y start >= t0 - el programa más largo
+    del canal (cualquiera que termine después de t0 arrancó después de eso). El que llama
+    filtra end > t0.
+    """
+    return range(bisect_left(ch.starts, t0 - ch.max_len), bisect_left(ch.starts, t1))
+
+
+def index_programs(source_id: str, xmltv_id: str, start: datetime, end: datetime) -> tuple | None:
+    """
+    Programas del canal que se solapan con [start, end).
+
+    Returns:
+        None si la ventana no está cargada; si no, (display_name,
+        [(start, end, title, category, description), ...]), o (None, None) si el canal no
+        existe en la fuente
+    """
+    t0, t1 = _ts(start), _ts(end)
+    src = _covering(str(source_id), t0, t1)
+    if src is None:
+        return None
+    ch = src.channels.get(xmltv_id)
+    if ch is None:
+        return None, None
+    s = src.strings
+    return ch.display_name, [
+        (_dt(ch.starts[i]), _dt(ch.ends[i]), s[ch.titles[i]], s[ch.categories[i]], s[ch.descriptions[i]])
+        for i in _slice(ch, t0, t1)
+        if ch.ends[i] > t0
+    ]
+
+
+def index_now_next(source_id: str, xmltv_id: str, now: datetime) -> tuple | None:
+    """
+    Returns:
+        None si no está cargada; si no, (display_name, actual, siguiente) con cada
+        programa como (start, end, title, category, description) o None
+    """
+    t = _ts(now)
+    src = _covering(str(source_id), t, t)
+    if src is None:
+        return None
+    ch = src.channels.get(xmltv_id)
+    if ch is None:
+        return None, None, None
+    s = src.strings
+
+    def prog(i):
+        return _dt(ch.starts[i]), _dt(ch.ends[i]), s[ch.titles[i]], s[ch.categories[i]], s[ch.descriptions[i]]
+
+    cur = nxt = None
+    i = bisect_left(ch.starts, t + 1)  # primero que arranca después de t
+    if i < len(ch.starts):
+        nxt = prog(i)
+    # el actual es el último que arrancó <= t, si todavía no terminó
+    if i > 0 and ch.ends[i - 1] > t:
+        cur = prog(i - 1)
+    return ch.display_name, cur, nxt
+
+
+def epg_index_stats() -> dict:
+    """Tamaño aproximado en memoria (arrays + strings + objetos) y contadores."""
+    sources = []
+    total = 0
+    for key, src in list(_sources.items()):
+        arrays = 0
+        programs = 0
+        for ch in src.channels.values():
+            programs += len(ch.starts)
+            arrays += sys.getsizeof(ch) + sum(
+                sys.getsizeof(a) for a in (ch.starts, ch.ends, ch.titles, ch.categories, ch.descriptions)
+            )
+        strings = sys.getsizeof(src.strings) + sum(sys.getsizeof(x) for x in src.strings if x is not None)
+        size = arrays + strings + sys.getsizeof(src.channels)
+        total += size
+        sources.append({
+            "source_id": key,
+            "channels": len(src.channels),
+            "programs": programs,
+            "strings": len(src.strings) - 1,
+            "bytes": size,
+            "window": {"start": _dt(src.window_start).isoformat(), "end": _dt(src.window_end).isoformat()},
+            "loaded_at": datetime.fromtimestamp(src.loaded_at, tz=timezone.utc).isoformat(),
+        })
+    return {
+        "enabled": EPG_INDEX,
+        "bytes": total,
+        "sources": sources,
+        **_stats,
+        "load_seconds": round(_stats["load_seconds"], 2),
+    }
@@ -0,0 +1,165 @@
+"""
+Ingesta de programas EPG en dos fases, para que los lectores nunca vean la guía vacía
+ni a medio cargar:
+
+1. Carga: lo parseado del XMLTV va por COPY a una tabla UNLOGGED (epg_program_staging),
+   bajo un run_id propio y con commits por chunk. epg_programs no se toca.
+2. Swap: una transacción corta aplica el run sobre epg_programs. Los lectores ven la
+   generación anterior completa hasta el commit y la nueva completa después.
+
+El swap puede ser "replace" (borra los programas de la fuente e inserta el run) o "diff"
+(clave channel_id + start_time):
+
+- UPDATE de los que cambiaron (fin, título, descripción, categoría)
+- INSERT de los nuevos
+- DELETE de los que ya no vienen en el feed
+
+Lo que no cambió no se toca: sin WAL ni tuplas muertas para el 95% de la guía.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.pg_copy import copy_records
+
+
+STAGING_TABLE = "epg_program_staging"
+STAGING_RETENTION = timedelta(hours=6)
+
+# (channel_id, start_time, end_time, title, description, category)
+STAGING_COLUMNS = ("run_id", "channel_id", "start_time", "end_time", "title", "description", "category")
+
+
+def stage_programs(db: Session, run_id, rows: list[tuple]) -> int:
+    """COPY de programas (channel_id, start, end, title, description, category) al run."""
+    return copy_records(db, STAGING_TABLE, STAGING_COLUMNS, ((run_id, *row) for row in rows))
+
+
+_RUN = f"(SELECT * FROM {STAGING_TABLE} WHERE run_id = :run_id)"
+
+_PURGE_SOURCE = "DELETE FROM epg_programs WHERE epg_source_id = :source_id"
+
+_INSERT_RUN = f"""
+    INSERT INTO epg_programs
+        (id, epg_source_id, provider_id, channel_id, start_time, end_time, title, description, category, created_at)
+    SELECT gen_random_uuid(), :source_id, :provider_id,
+           i.channel_id, i.start_time, i.end_time, i.title, i.description, i.category, :now
+    FROM {_RUN} AS i
+    ON CONFLICT (channel_id, start_time) DO NOTHING
+"""
+
+_UPDATE_CHANGED = f"""
+    UPDATE epg_programs AS p
+    SET end_time = i.end_time,
+        title = i.title,
+        description = i.description,
+        category = i.category
+    FROM {_RUN} AS i
+    WHERE p.channel_id = i.channel_id
+      AND p.start_time = i.start_time
+      AND p.epg_source_id = :source_id
+      AND (
+          p.end_time IS DISTINCT FROM i.end_time
+          OR p.title IS DISTINCT FROM i.title
+          OR p.description IS DISTINCT FROM i.description
+          OR p.category IS DISTINCT FROM i.category
+      )
+"""
+
+_INSERT_NEW = f"""
+    INSERT INTO epg_programs
+        (id, epg_source_id, provider_id, channel_id, start_time, end_time, title, description, category, created_at)
+    SELECT gen_random_uuid(), :source_id, :provider_id,
+           i.channel_id, i.start_time, i.end_time, i.title, i.description, i.category, :now
+    FROM {_RUN} AS i
+    WHERE NOT EXISTS (
+        SELECT 1 FROM epg_programs p
+        WHERE p.channel_id = i.channel_id AND p.start_time = i.start_time
+    )
+"""
+
+# Lo que ya terminó antes de la ventana no se toca: se va con su partición (epg_partitions).
+# Lo que quedó más allá del final de la ventana (de un sync con ventana más ancha) se
+# cuenta aparte como expired.
+_DELETE_VANISHED = f"""
+    DELETE FROM epg_programs AS p
+    WHERE p.epg_source_id = :source_id
+      AND p.end_time > :window_start
+      AND NOT EXISTS (
+          SELECT 1 FROM {STAGING_TABLE} i
+          WHERE i.run_id = :run_id AND i.channel_id = p.channel_id AND i.start_time = p.start_time
+      )
+    RETURNING p.start_time < :window_end AS in_window
+"""
+
+
+def run_bounds(db: Session, run_id) -> tuple[datetime | None, datetime | None]:
+    """Primer y último start_time del run (para crear las particiones antes del swap)."""
+    row = db.execute(text(f"SELECT min(start_time), max(start_time) FROM {_RUN} AS i"), {"run_id": run_id}).one()
+    return row[0], row[1]
+
+
+def apply_replace(db: Session, run_id, source_id, provider_id, now: datetime, purge: bool = True) -> dict:
+    """
+    Swap completo: borra los programas de la fuente (si purge) e inserta el run.
+
+    Returns:
+        conteos purged / inserted
+    """
+    params = {"run_id": run_id, "source_id": source_id, "provider_id": provider_id, "now": now}
+    purged = int(db.execute(text(_PURGE_SOURCE), params).rowcount or 0) if purge else 0
+    inserted = int(db.execute(text(_INSERT_RUN), params).rowcount or 0)
+    return {"purged": purged, "inserted": inserted}
+
+
+def apply_diff(
+    db: Session,
+    run_id,
+    source_id,
+    provider_id,
+    window_start: datetime,
+    window_end: datetime,
+    now: datetime,
+) -> dict:
+    """
+    Aplica el run sobre los programas de la fuente (en la transacción de la Session).
+
+    Returns:
+        conteos inserted / updated / deleted (dentro de la ventana) / expired (fuera) / unchanged
+    """
+    params = {
+        "run_id": run_id,
+        "source_id": source_id,
+        "provider_id": provider_id,
+        "window_start": window_start,
+        "window_end": window_end,
+        "now": now,
+    }
+    # el run recién cargado todavía no tiene estadísticas (autoanalyze llega tarde)
+    db.execute(text(f"ANALYZE {STAGING_TABLE}"))
+    staged = int(db.execute(text(f"SELECT count(*) FROM {_RUN} AS i"), params).scalar())
+
+    updated = int(db.execute(text(_UPDATE_CHANGED), params).rowcount or 0)
+    inserted = int(db.execute(text(_INSERT_NEW), params).rowcount or 0)
+    gone = db.execute(text(_DELETE_VANISHED), params).scalars().all()
+    deleted = sum(1 for in_window in gone if in_window)
+
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": deleted,
+        "expired": len(gone) - deleted,
+        "unchanged": staged - inserted - updated,
+    }
+
+
+def clear_epg_run(db: Session, run_id) -> None:
+    db.execute(text(f"DELETE FROM {STAGING_TABLE} WHERE run_id = :run_id"), {"run_id": run_id})
+
+
+def purge_stale_epg_staging(db: Session) -> int:
+    """Runs que murieron a mitad de carga (el proceso se cayó antes del swap)."""
+    cutoff = datetime.now(timezone.utc) - STAGING_RETENTION
+    res = db.execute(text(f"DELETE FROM {STAGING_TABLE} WHERE created_at < :cutoff"), {"cutoff": cutoff})
+    return int(res.rowcount or 0)
@@ -0,0 +1,231 @@
+"""
+Now/next en memoria para /epg/now.
+
+- live_id -> (provider, nombre, fuente, xmltv_id): UNA query IN (...) por request, sin
+  cache (renombres, cambios de mapeo o de proveedor hechos por otro worker o por el sync
+  de catálogo se ven enseguida). La misma query dice si el proveedor existe.
+- (epg_source_id, xmltv_id) -> (programa actual, siguiente): del índice de la ventana
+  (epg_index) si la fuente está cargada; si no, de un índice propio armado con una query
+  sobre toda la guía. Ese índice nunca se arma dentro de un request: lo rearma el loop de
+  main.py en el primer borde de programa (el fin de algún actual o el comienzo de algún
+  siguiente), sync_epg_for_source_id después de cada sync y, como mucho cada
+  EPG_NOW_INDEX_MAX_SECONDS, el mismo loop (syncs de otros workers).
+
+/epg/now hace siempre una sola query, para cualquier cantidad de live_ids.
+"""
+from datetime import datetime, timedelta, timezone
+import os
+import threading
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from app.epg_cache import epg_cache_generation
+from app.epg_index import index_now_next
+from app.epg_partitions import EPG_PARTITION_RETENTION_DAYS
+from app.models import EpgChannel, EpgProgram, LiveStream, Provider
+
+
+# Tope de vida del índice aunque no haya bordes (recoge syncs hechos en otro proceso)
+EPG_NOW_INDEX_MAX_SECONDS = int(os.getenv("EPG_NOW_INDEX_MAX_SECONDS", "900"))
+# Cada cuánto mira el loop si hubo un sync en este proceso (además de los bordes)
+EPG_NOW_CHECK_SECONDS = 30
+# "Siguiente" solo si arranca dentro de esto
+_NEXT_HORIZON = timedelta(hours=24)
+# poda de particiones: lo más viejo que puede quedar en la base (un programa que arrancó
+# antes ya no está, con o sin este filtro)
+_LOOKBACK = timedelta(days=EPG_PARTITION_RETENTION_DAYS + 1)
+
+_lock = threading.Lock()
+# valores: (display_name, actual, siguiente) con cada programa como
+# (start, end, title, category, description) o None, igual que epg_index.index_now_next
+_index: dict[tuple[str, str], tuple] = {}
+_valid_until: datetime | None = None
+_index_generation = -1
+_stats = {"builds": 0}
+
+
+def _program(start_time, end_time, title, description, category, display_name) -> dict:
+    return {
+        "title": title,
+        "start": start_time.isoformat(),
+        "end": end_time.isoformat(),
+        "description": description,
+        "category": category,
+        "channel_display": display_name,
+    }
+
+
+def _build(db: Session, now: datetime) -> None:
+    global _index, _valid_until, _index_generation
+    generation = epg_cache_generation()
+
+    ranked = (
+        select(
+            EpgProgram.channel_id,
+            EpgProgram.start_time,
+            EpgProgram.end_time,
+            EpgProgram.title,
+            EpgProgram.description,
+            EpgProgram.category,
+            func.row_number().over(
+                partition_by=EpgProgram.channel_id,
+                order_by=EpgProgram.start_time,
+            ).label("rn"),
+        )
+        .where(
+            EpgProgram.end_time > now,
+            EpgProgram.start_time < now + _NEXT_HORIZON,
+            EpgProgram.start_time > now - _LOOKBACK,
+        )
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            EpgChannel.epg_source_id,
+            EpgChannel.xmltv_id,
+            EpgChannel.display_name,
+            ranked.c.start_time,
+            ranked.c.end_time,
+            ranked.c.title,
+            ranked.c.description,
+            ranked.c.category,
+        )
+        .join(ranked, ranked.c.channel_id == EpgChannel.id)
+        .where(ranked.c.rn <= 2)
+        .order_by(EpgChannel.id, ranked.c.start_time)
+    ).all()
+
+    index: dict[tuple[str, str], list] = {}
+    valid_until = now + timedelta(seconds=EPG_NOW_INDEX_MAX_SECONDS)
+    for src_id, xml_id, display_name, start_time, end_time, title, description, category in rows:
+        slot = index.setdefault((str(src_id), xml_id), [display_name, None, None])
+        prog = (start_time, end_time, title, category, description)
+        if start_time <= now and slot[1] is None and slot[2] is None:
+            slot[1] = prog
+            valid_until = min(valid_until, end_time)
+        elif slot[2] is None and start_time > now:
+            slot[2] = prog
+            # al arrancar el siguiente cambia el actual (aunque el anterior no haya terminado)
+            valid_until = min(valid_until, start_time)
+
+    _index = {k: tuple(v) for k, v in index.items()}
+    _valid_until = valid_until
+    _index_generation = generation
+    _stats["builds"] += 1
+
+
+def refresh_epg_now(db: Session, force: bool = False) -> bool:
+    """
+    Rearma el índice si pasó un borde, hubo un sync en este proceso o se venció. Lo llaman
+    el loop de main.py y el sync; los requests solo leen.
+
+    Returns:
+        True si lo rearmó
+    """
+    now = datetime.now(timezone.utc)
+    with _lock:
+        if not force and _index_generation == epg_cache_generation() and _valid_until is not None and now < _valid_until:
+            return False
+        _build(db, now)
+    # la lectura no debe quedar dentro de una transacción abierta
+    db.commit()
+    return True
+
+
+def seconds_until_refresh() -> float:
+    """Cuánto puede dormir el loop: hasta el próximo borde, como mucho EPG_NOW_CHECK_SECONDS."""
+    if _valid_until is None:
+        return 0.0
+    wait = (_valid_until - datetime.now(timezone.utc)).total_seconds()
+    return max(0.0, min(wait, EPG_NOW_CHECK_SECONDS))
+
+
+def _current_next(entry: tuple, now: datetime) -> tuple:
+    """
+    (actual, siguiente) de una entrada al momento `now`. Entre un borde y el rearmado el
+    índice puede ir unos segundos atrasado: lo que ya terminó no sale como actual y un
+    siguiente que ya arrancó pasa a actual.
+    """
+    display_name, cur, nxt = entry
+    if cur is not None and cur[1] <= now:
+        cur = None
+    if nxt is not None and nxt[0] <= now:
+        cur, nxt = (nxt if nxt[1] > now else None), None
+    return (
+        _program(cur[0], cur[1], cur[2], cur[4], cur[3], display_name) if cur else None,
+        _program(nxt[0], nxt[1], nxt[2], nxt[4], nxt[3], display_name) if nxt else None,
+    )
+
+
+def _resolve_live(db: Session, provider_id: str, ids: list[str]) -> dict[str, tuple] | None:
+    """
+    live_id -> (nombre, fuente, xmltv_id) de los ids del proveedor (una query).
+
+    Returns:
+        None si el proveedor no existe
+    """
+    rows = db.execute(
+        select(
+            Provider.id,
+            LiveStream.id,
+            LiveStream.name,
+            LiveStream.epg_source_id,
+            LiveStream.epg_channel_id,
+        )
+        .select_from(Provider)
+        .outerjoin(LiveStream, and_(LiveStream.provider_id == Provider.id, LiveStream.id.in_(ids)))
+        .where(Provider.id == provider_id)
+    ).all()
+    if not rows:
+        return None
+    return {
+        str(live_id): (name, str(src_id) if src_id else None, (xml_id or "").strip() or None)
+        for _, live_id, name, src_id, xml_id in rows
+        if live_id is not None
+    }
+
+
+def now_next(db: Session, provider_id: str, live_ids: list[str]) -> list[dict] | None:
+    """
+    Programa actual + siguiente para los live_ids del proveedor (los de otro proveedor o
+    inexistentes no aparecen, como antes).
+
+    Returns:
+        None si el proveedor no existe
+    """
+    now = datetime.now(timezone.utc)
+    live = _resolve_live(db, provider_id, live_ids)
+    if live is None:
+        return None
+    index = _index
+
+    results = []
+    for live_id in live_ids:
+        info = live.get(live_id)
+        if not info:
+            continue
+        name, src_id, xml_id = info
+        entry = None
+        if src_id and xml_id:
+            entry = index_now_next(src_id, xml_id, now)
+            if entry is None:
+                entry = index.get((src_id, xml_id))
+        cur, nxt = _current_next(entry, now) if entry else (None, None)
+        extra = {"xmltv_id": xml_id, "epg_source_id": src_id}
+        results.append({
+            "live_id": live_id,
+            "name": name,
+            "epg": {**cur, **extra} if cur else None,
+            "next": {**nxt, **extra} if nxt else None,
+        })
+    return results
+
+
+def epg_now_stats() -> dict:
+    with _lock:
+        return {
+            "channels": len(_index),
+            "valid_until": _valid_until.isoformat() if _valid_until else None,
+            **_stats,
+        }
@@ -0,0 +1,106 @@
+"""
+Particiones diarias de epg_programs (RANGE sobre start_time, en UTC).
+
+Las particiones se crean por adelantado (loop de mantenimiento y antes de cada swap de
+EPG, para el rango de lo cargado) y la retención tira particiones enteras en vez de borrar
+filas: sin DELETE masivo, sin bloat, sin vacuum de por medio.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+import os
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.pg_locks import advisory_key
+
+
+# Días de partición que se crean por delante de hoy (cubre la ventana máxima de sync, 7 días)
+EPG_PARTITION_DAYS_AHEAD = int(os.getenv("EPG_PARTITION_DAYS_AHEAD", "8"))
+# Particiones cuyo día terminó hace más de esto se tiran enteras
+EPG_PARTITION_RETENTION_DAYS = int(os.getenv("EPG_PARTITION_RETENTION_DAYS", "2"))
+
+PARENT_TABLE = "epg_programs"
+_NAME_RE = re.compile(rf"^{PARENT_TABLE}_p(\d{{8}})$")
+
+# crear/tirar particiones toma locks fuertes sobre el padre: uno a la vez, y sin colas largas
+_DDL_LOCK_TIMEOUT = "5s"
+
+
+def partition_name(day: date) -> str:
+    return f"{PARENT_TABLE}_p{day:%Y%m%d}"
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def _lock_ddl(db: Session) -> None:
+    db.execute(text(f"SET LOCAL lock_timeout = '{_DDL_LOCK_TIMEOUT}'"))
+    db.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": advisory_key("epg_partitions", PARENT_TABLE)})
+
+
+def existing_partitions(db: Session) -> dict[date, str]:
+    rows = db.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:parent AS regclass)
+    """), {"parent": PARENT_TABLE}).scalars().all()
+    out = {}
+    for name in rows:
+        m = _NAME_RE.match(name)
+        if m:
+            out[datetime.strptime(m.group(1), "%Y%m%d").date()] = name
+    return out
+
+
+def ensure_epg_partitions(db: Session, start: datetime, end: datetime) -> list[str]:
+    """
+    Crea las particiones diarias que falten para [start, end] y commitea (transacción propia,
+    así el lock del padre no queda tomado durante el resto del trabajo).
+
+    Returns:
+        nombres de las particiones creadas
+    """
+    first = start.astimezone(timezone.utc).date()
+    last = end.astimezone(timezone.utc).date()
+    have = existing_partitions(db)
+    missing = [first + timedelta(days=n) for n in range((last - first).days + 1)]
+    missing = [d for d in missing if d not in have]
+    if not missing:
+        return []
+
+    _lock_ddl(db)
+    created = []
+    for day in missing:
+        name = partition_name(day)
+        db.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE}
+            FOR VALUES FROM ('{_day_start(day).isoformat()}') TO ('{_day_start(day + timedelta(days=1)).isoformat()}')
+        """))
+        created.append(name)
+    db.commit()
+    return created
+
+
+def drop_expired_epg_partitions(db: Session, retention_days: int = EPG_PARTITION_RETENTION_DAYS) -> list[str]:
+    """Tira las particiones cuyo día terminó hace más de retention_days."""
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=retention_days)
+    expired = [name for day, name in sorted(existing_partitions(db).items()) if day + timedelta(days=1) <= cutoff]
+    if not expired:
+        return []
+
+    _lock_ddl(db)
+    for name in expired:
+        db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    db.commit()
+    return expired
+
+
+def maintain_epg_partitions(db: Session) -> dict:
+    """Crea las de los próximos días y tira las vencidas."""
+    now = datetime.now(timezone.utc)
+    created = ensure_epg_partitions(db, now - timedelta(days=1), now + timedelta(days=EPG_PARTITION_DAYS_AHEAD))
+    dropped = drop_expired_epg_partitions(db)
+    return {"created": created, "dropped": dropped}
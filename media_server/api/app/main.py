@@ -8,10 +8,8 @@ from .routers.providers import router as providers_router
 import os
 import asyncio
 import logging
-from sqlalchemy import text, select
 from .db import engine, SessionLocal
-from .models import EpgSource
-from .routers.epg import sync_epg_for_source_id
+from .epg_auto_sync import EPG_SYNC_WORKERS, run_epg_auto_sync
 from .routers.vod import router as vod_router
 from .routers.series import router as series_router
 from .routers.tmdb import router as tmdb_router
@@ -25,7 +23,15 @@ from .routers.tmdb import (
 from .routers.settings import router as settings_router
 from .routers.provider_users import router as provider_users_router
 from .routers.user_data import router as user_data_router
-from .provider_auto_sync import run_provider_auto_sync
+from .routers.jobs import router as jobs_router
+from .routers.catalog import router as catalog_router
+from .catalog_changes import compact_catalog_changes
+from .epg_index import EPG_INDEX, EPG_INDEX_CHECK_SECONDS, refresh_epg_index
+from .epg_now import EPG_NOW_CHECK_SECONDS, refresh_epg_now, seconds_until_refresh
+from .epg_partitions import maintain_epg_partitions
+from .provider_auto_sync import run_provider_auto_sync, shutdown_provider_auto_sync
+from .sync_jobs import SYNC_JOB_POLL_SECONDS, SYNC_JOB_WORKERS, fail_stale_jobs, run_next_sync_job
+from .xtream_client import close_xtream_clients
 
 
 log = logging.getLogger("mini_media_server")
@@ -33,6 +39,8 @@ log = logging.getLogger("mini_media_server")
 EPG_AUTO_SYNC = os.getenv("EPG_AUTO_SYNC", "1").strip().lower() not in {"0", "false", "no", "off"}
 EPG_AUTO_SYNC_MINUTES = int(os.getenv("EPG_AUTO_SYNC_MINUTES", "30"))
 EPG_AUTO_SYNC_HOURS = int(os.getenv("EPG_AUTO_SYNC_HOURS", "36"))
+# diff: solo inserta / actualiza / borra lo que cambió; replace: purga y re-inserta todo
+EPG_AUTO_SYNC_MODE = os.getenv("EPG_AUTO_SYNC_MODE", "diff").strip().lower()
 TMDB_AUTO_SYNC = os.getenv("TMDB_AUTO_SYNC", "1").strip().lower() not in {"0", "false", "no", "off"}
 TMDB_AUTO_SYNC_MINUTES = int(os.getenv("TMDB_AUTO_SYNC_MINUTES", "5"))
 TMDB_AUTO_SYNC_BATCH_MOVIES = int(os.getenv("TMDB_AUTO_SYNC_BATCH_MOVIES", "5"))
@@ -40,6 +48,8 @@ TMDB_AUTO_SYNC_BATCH_SERIES = int(os.getenv("TMDB_AUTO_SYNC_BATCH_SERIES", "5"))
 TMDB_AUTO_SYNC_IDLE_MINUTES = int(os.getenv("TMDB_AUTO_SYNC_IDLE_MINUTES", "30"))
 COLLECTIONS_AUTO_REFRESH = os.getenv("COLLECTIONS_AUTO_REFRESH", "1").strip().lower() not in {"0", "false", "no", "off"}
 COLLECTIONS_AUTO_REFRESH_MINUTES = int(os.getenv("COLLECTIONS_AUTO_REFRESH_MINUTES", "10"))
+CATALOG_CHANGES_COMPACT_MINUTES = int(os.getenv("CATALOG_CHANGES_COMPACT_MINUTES", "60"))
+EPG_PARTITION_MAINTENANCE_MINUTES = int(os.getenv("EPG_PARTITION_MAINTENANCE_MINUTES", "60"))
 
 
 app = FastAPI(title="Mini Media Server (Local)")
@@ -59,17 +69,8 @@ def health():
     except Exception as e:
         return {"ok": False, "db": "down", "error": str(e)}
 
-def _sync_one_source_blocking(source_id: str):
-    db = SessionLocal()
-    try:
-        sync_epg_for_source_id(
-            db,
-            source_id=source_id,
-            hours=EPG_AUTO_SYNC_HOURS,
-            purge_all_programs=True,
-        )
-    finally:
-        db.close()
+def _sync_epg_sources_blocking():
+    return run_epg_auto_sync(hours=EPG_AUTO_SYNC_HOURS, mode=EPG_AUTO_SYNC_MODE)
 
 def _sync_tmdb_movies_blocking():
     db = SessionLocal()
@@ -101,27 +102,29 @@ async def _start_epg_auto_sync():
         return
 
     interval_s = max(60, EPG_AUTO_SYNC_MINUTES * 60)
-    log.info("EPG auto-sync: enabled (every %s min, window=%s h)", EPG_AUTO_SYNC_MINUTES, EPG_AUTO_SYNC_HOURS)
+    log.info(
+        "EPG auto-sync: enabled (every %s min, window=%s h, workers=%s)",
+        EPG_AUTO_SYNC_MINUTES,
+        EPG_AUTO_SYNC_HOURS,
+        EPG_SYNC_WORKERS,
+    )
 
     async def loop():
         await asyncio.sleep(2)
         while True:
             try:
-                db = SessionLocal()
-                try:
-                    sources = db.execute(
-                        select(EpgSource).where(EpgSource.is_active == True)
-                    ).scalars().all()
-                    source_ids = [str(s.id) for s in sources]
-                finally:
-                    db.close()
-
-                for sid in source_ids:
-                    try:
-                        await asyncio.to_thread(_sync_one_source_blocking, sid)
-                    except Exception as e:
-                        log.exception("EPG auto-sync failed for source_id=%s: %s", sid, e)
-
+                result = await asyncio.to_thread(_sync_epg_sources_blocking)
+                results = result.get("results", [])
+                if results:
+                    log.info(
+                        "EPG auto-sync: sources=%s ingested=%s not_modified=%s skipped=%s failures=%s elapsed=%ss",
+                        result.get("sources", 0),
+                        sum(1 for r in results if r.get("outcome") == "ingested"),
+                        sum(1 for r in results if r.get("outcome") == "not_modified"),
+                        sum(1 for r in results if r.get("skipped")),
+                        sum(1 for r in results if not r.get("ok")),
+                        result.get("elapsed_s"),
+                    )
             except Exception as e:
                 log.exception("EPG auto-sync loop error: %s", e)
 
@@ -235,11 +238,15 @@ async def _start_provider_auto_sync():
         while True:
             try:
                 result = await asyncio.to_thread(_run_provider_auto_sync_blocking)
-                log.info(
-                    "Provider auto-sync complete: providers=%s failures=%s",
-                    result.get("providers", 0),
-                    sum(1 for item in result.get("results", []) if not item.get("ok")),
-                )
+                if result.get("submitted") or result.get("results"):
+                    log.info(
+                        "Provider auto-sync: providers=%s submitted=%s running=%s finished=%s failures=%s",
+                        result.get("providers", 0),
+                        len(result.get("submitted", [])),
+                        len(result.get("running", [])),
+                        len(result.get("results", [])),
+                        sum(1 for item in result.get("results", []) if not item.get("ok")),
+                    )
             except Exception as e:
                 log.exception("Provider auto-sync loop error: %s", e)
 
@@ -248,9 +255,162 @@ async def _start_provider_auto_sync():
     asyncio.create_task(loop())
 
 
+def _fail_stale_sync_jobs_blocking():
+    db = SessionLocal()
+    try:
+        return fail_stale_jobs(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def _start_sync_job_workers():
+    async def worker(n: int):
+        await asyncio.sleep(2 + n)
+        while True:
+            try:
+                ran = await asyncio.to_thread(run_next_sync_job)
+            except Exception as e:
+                log.exception("Sync job worker %s error: %s", n, e)
+                ran = False
+            if not ran:
+                await asyncio.sleep(SYNC_JOB_POLL_SECONDS)
+
+    try:
+        stale = await asyncio.to_thread(_fail_stale_sync_jobs_blocking)
+        if stale:
+            log.warning("Marked %s stale sync jobs as failed", stale)
+    except Exception as e:
+        log.exception("Stale sync job check failed: %s", e)
+
+    for n in range(max(1, SYNC_JOB_WORKERS)):
+        asyncio.create_task(worker(n))
+
+
+def _compact_catalog_changes_blocking():
+    db = SessionLocal()
+    try:
+        return compact_catalog_changes(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def _start_catalog_changes_compaction():
+    interval_s = max(60, CATALOG_CHANGES_COMPACT_MINUTES * 60)
+
+    async def loop():
+        await asyncio.sleep(30)
+        while True:
+            try:
+                removed = await asyncio.to_thread(_compact_catalog_changes_blocking)
+                if removed:
+                    log.info("Catalog change log compacted: removed=%s", removed)
+            except Exception as e:
+                log.exception("Catalog change log compaction error: %s", e)
+            await asyncio.sleep(interval_s)
+
+    asyncio.create_task(loop())
+
+
+def _maintain_epg_partitions_blocking():
+    db = SessionLocal()
+    try:
+        return maintain_epg_partitions(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def _start_epg_partition_maintenance():
+    interval_s = max(60, EPG_PARTITION_MAINTENANCE_MINUTES * 60)
+
+    async def loop():
+        await asyncio.sleep(1)
+        while True:
+            try:
+                result = await asyncio.to_thread(_maintain_epg_partitions_blocking)
+                if result.get("created") or result.get("dropped"):
+                    log.info(
+                        "EPG partitions: created=%s dropped=%s",
+                        len(result.get("created", [])),
+                        len(result.get("dropped", [])),
+                    )
+            except Exception as e:
+                log.exception("EPG partition maintenance error: %s", e)
+            await asyncio.sleep(interval_s)
+
+    asyncio.create_task(loop())
+
+
+def _refresh_epg_index_blocking():
+    db = SessionLocal()
+    try:
+        return refresh_epg_index(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def _start_epg_index_refresh():
+    if not EPG_INDEX:
+        log.info("EPG memory index disabled (EPG_INDEX=0)")
+        return
+
+    interval_s = max(10, EPG_INDEX_CHECK_SECONDS)
+
+    async def loop():
+        await asyncio.sleep(1)
+        while True:
+            try:
+                loaded = await asyncio.to_thread(_refresh_epg_index_blocking)
+                if loaded:
+                    log.info("EPG memory index: %s source(s) loaded", loaded)
+            except Exception as e:
+                log.exception("EPG memory index refresh error: %s", e)
+            await asyncio.sleep(interval_s)
+
+    asyncio.create_task(loop())
+
+
+def _refresh_epg_now_blocking():
+    db = SessionLocal()
+    try:
+        return refresh_epg_now(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def _start_epg_now_refresh():
+    # rearma el índice now/next en cada borde de programa: /epg/now nunca lo arma
+    async def loop():
+        while True:
+            try:
+                await asyncio.to_thread(_refresh_epg_now_blocking)
+            except Exception as e:
+                log.exception("EPG now/next index refresh error: %s", e)
+                await asyncio.sleep(EPG_NOW_CHECK_SECONDS)
+            await asyncio.sleep(max(1.0, seconds_until_refresh()))
+
+    asyncio.create_task(loop())
+
+
+@app.on_event("shutdown")
+def _stop_provider_auto_sync():
+    shutdown_provider_auto_sync()
+
+
+@app.on_event("shutdown")
+def _close_xtream_clients():
+    close_xtream_clients()
+
+
 app.include_router(providers_router)
 app.include_router(provider_users_router)
 app.include_router(user_data_router)
+app.include_router(jobs_router)
+app.include_router(catalog_router)
 app.include_router(live_router)
 app.include_router(epg_router)
 app.include_router(vod_router)
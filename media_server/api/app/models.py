@@ -9,6 +9,7 @@ from sqlalchemy import Integer
 from sqlalchemy import String, DateTime, Boolean, ForeignKey, UniqueConstraint
 from sqlalchemy import Index
 from sqlalchemy import JSON
+from sqlalchemy import BigInteger
 
 from .db import Base
 
@@ -110,10 +111,71 @@ class ProviderAutoSyncConfig(Base):
     interval_minutes: Mapped[int] = mapped_column(Integer, default=60, nullable=False)
     last_run_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
+    # sync incremental de VOD: mayor `added` (epoch) visto y último sync completo
+    vod_added_watermark: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    vod_full_reconcile_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
+
+
+class SyncJob(Base):
+    """Sync de catálogo encolado (ver app/sync_jobs.py). El progreso lo escribe el worker."""
+    __tablename__ = "sync_jobs"
+    __table_args__ = (
+        Index("ix_sync_jobs_status_created", "status", "created_at"),
+        Index("ix_sync_jobs_provider_created", "provider_id", "created_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind: Mapped[str] = mapped_column(String(40), nullable=False)  # sync_all|sync_vod_streams
+    provider_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("providers.id", ondelete="CASCADE"), nullable=False
+    )
+    params: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+
+    status: Mapped[str] = mapped_column(String(20), default="queued", nullable=False)  # queued|running|succeeded|failed
+    phase: Mapped[str | None] = mapped_column(String(40), nullable=True)
+    categories_total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    categories_done: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    items_done: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    result: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    error: Mapped[str | None] = mapped_column(String(2000), nullable=True)
+
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
 
 
+class CatalogChange(Base):
+    """
+    Log append-only de cambios en live_streams / vod_streams / series_items y sus
+    membresías de categoría. Lo llenan triggers de Postgres (ver migraciones
+    add_catalog_changes y log_category_membership_changes), no la app.
+
+    version = id de la transacción que hizo el cambio (ver app/catalog_changes.py).
+    """
+    __tablename__ = "catalog_changes"
+    __table_args__ = (
+        Index("ix_catalog_changes_version", "version", "seq"),
+        Index("ix_catalog_changes_item", "item_id", "seq"),
+    )
+
+    seq: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    version: Mapped[int] = mapped_column(
+        BigInteger, server_default=text("(pg_current_xact_id()::text::bigint)"), nullable=False
+    )
+    content_type: Mapped[str] = mapped_column(String(10), nullable=False)  # live|vod|series
+    item_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    provider_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
+    op: Mapped[str] = mapped_column(String(12), nullable=False)  # insert|update|deactivate|delete|categories
+    changed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=text("now()"), nullable=False
+    )
+
+
 class TmdbCollection(Base):
     __tablename__ = "tmdb_collections"
     __table_args__ = (
@@ -364,6 +426,9 @@ class Category(Base):
     provider_category_id: Mapped[int] = mapped_column(Integer, nullable=False)  # category_id de Xtream
     name: Mapped[str] = mapped_column(String(255), nullable=False)
 
+    # sha256 de la última respuesta de streams/items sincronizada OK (ver providers._content_hasher)
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
@@ -429,6 +494,20 @@ class EpgSource(Base):
 
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
 
+    # all: guarda los programas de todos los canales del feed
+    # mapped: solo los de canales mapeados a algún LiveStream, más ingest_allow_list (xmltv ids)
+    ingest_filter: Mapped[str] = mapped_column(String(20), default="all", server_default="all", nullable=False)
+    ingest_allow_list: Mapped[list | None] = mapped_column(JSON, nullable=True)
+
+    # GET condicional / skip-if-unchanged del último ingest
+    http_etag: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    http_last_modified: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    content_digest: Mapped[str | None] = mapped_column(String(64), nullable=True)  # sha256 del XML
+    ingest_signature: Mapped[str | None] = mapped_column(String(64), nullable=True)  # filtro + ventana
+    last_ingest_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_sync_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_sync_outcome: Mapped[str | None] = mapped_column(String(20), nullable=True)  # ingested | not_modified | failed
+
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
 
@@ -466,6 +545,9 @@ class EpgProgram(Base):
     __table_args__ = (
         UniqueConstraint("channel_id", "start_time", name="uq_epg_programs_channel_start"),
         Index("ix_epg_programs_channel_time", "channel_id", "start_time", "end_time"),
+        Index("ix_epg_programs_source_start", "epg_source_id", "start_time"),
+        # particiones diarias (app/epg_partitions.py); la PK incluye start_time por eso
+        {"postgresql_partition_by": "RANGE (start_time)"},
     )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -480,7 +562,7 @@ class EpgProgram(Base):
     channel_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("epg_channels.id"), nullable=False)
     channel = relationship("EpgChannel", lazy="joined")
 
-    start_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)  # UTC
+    start_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)  # UTC
     end_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)    # UTC
 
     title: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -601,6 +683,45 @@ class SeriesItem(Base):
     tmdb_raw: Mapped[dict | None] = mapped_column(JSON, nullable=True)
 
 
+class LiveStreamCategory(Base):
+    """Membresía stream × categoría (un canal puede estar en varias categorías del panel)."""
+    __tablename__ = "live_stream_categories"
+    __table_args__ = (Index("ix_live_stream_categories_category", "category_id"),)
+
+    stream_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("live_streams.id", ondelete="CASCADE"), primary_key=True
+    )
+    category_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+    )
+
+
+class VodStreamCategory(Base):
+    """Membresía VOD × categoría."""
+    __tablename__ = "vod_stream_categories"
+    __table_args__ = (Index("ix_vod_stream_categories_category", "category_id"),)
+
+    stream_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("vod_streams.id", ondelete="CASCADE"), primary_key=True
+    )
+    category_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+    )
+
+
+class SeriesItemCategory(Base):
+    """Membresía serie × categoría."""
+    __tablename__ = "series_item_categories"
+    __table_args__ = (Index("ix_series_item_categories_category", "category_id"),)
+
+    series_item_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("series_items.id", ondelete="CASCADE"), primary_key=True
+    )
+    category_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+    )
+
+
 class Season(Base):
     __tablename__ = "seasons"
     __table_args__ = (UniqueConstraint("series_id", "season_number", name="uq_seasons_series_season"),)
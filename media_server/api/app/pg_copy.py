@@ -0,0 +1,35 @@
+import csv
+import io
+from typing import Iterable, Sequence
+
+from sqlalchemy.orm import Session
+
+
+def copy_records(db: Session, table: str, columns: Sequence[str], records: Iterable[tuple]) -> int:
+    """
+    COPY FROM STDIN de tuplas (en el orden de `columns`) sobre la transacción de la Session:
+    el COPY entra en el mismo commit/rollback que el resto del trabajo.
+    """
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    dbapi_conn = db.connection().connection.dbapi_connection
+    cur = dbapi_conn.cursor()
+    n = 0
+    try:
+        if hasattr(cur, "copy"):
+            # psycopg 3
+            with cur.copy(sql) as cp:
+                for rec in records:
+                    cp.write_row(rec)
+                    n += 1
+        else:
+            # psycopg2: CSV en memoria (unquoted vacío = NULL)
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for rec in records:
+                writer.writerow(["" if v is None else v for v in rec])
+                n += 1
+            buf.seek(0)
+            cur.copy_expert(f"{sql} WITH (FORMAT csv)", buf)
+    finally:
+        cur.close()
+    return n
@@ -0,0 +1,38 @@
+import hashlib
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+from app.db import engine
+
+
+def advisory_key(namespace: str, key) -> int:
+    """bigint estable para pg_advisory_lock a partir de (namespace, id)."""
+    digest = hashlib.sha1(f"{namespace}:{key}".encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+@contextmanager
+def advisory_lock(namespace: str, key, wait: bool = False):
+    """
+    Lock de sesión de Postgres en una conexión propia: sobrevive a los commits/rollbacks
+    de la Session que hace el trabajo, y lo libera Postgres solo si el proceso muere.
+
+    Yields:
+        True si se obtuvo el lock; False si wait=False y lo tiene otro.
+    """
+    lock_id = advisory_key(namespace, key)
+    with engine.connect() as conn:
+        if wait:
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": lock_id})
+            acquired = True
+        else:
+            acquired = bool(conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": lock_id}).scalar())
+        # no dejar la conexión "idle in transaction" mientras dura el trabajo
+        conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": lock_id})
+                conn.commit()
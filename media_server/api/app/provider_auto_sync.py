@@ -1,15 +1,36 @@
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 import logging
+import os
+import threading
 
 from fastapi import HTTPException
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.db import SessionLocal
 from app.models import Provider, ProviderAutoSyncConfig
+from app.pg_locks import advisory_lock
 
 
 log = logging.getLogger("mini_media_server")
 
+# Providers sincronizados a la vez. Cada uno usa 2 conexiones (Session + lock); el pool de
+# app/db.py se dimensiona con esto.
+PROVIDER_AUTO_SYNC_WORKERS = int(os.getenv("PROVIDER_AUTO_SYNC_WORKERS", "4"))
+
+PROVIDER_SYNC_LOCK = "provider_sync"
+
+# vod_mode="auto": incremental por watermark de `added`, salvo que el último sync completo
+# de VOD sea más viejo que esto (ahí corre completo, con finish/dedupe y content hash)
+VOD_FULL_RECONCILE_HOURS = int(os.getenv("VOD_FULL_RECONCILE_HOURS", "24"))
+
+VOD_MODES = ("full", "incremental", "auto")
+
+_executor: ThreadPoolExecutor | None = None
+_in_flight: dict[str, Future] = {}
+_in_flight_lock = threading.Lock()
+
 
 def get_or_create_provider_auto_sync(db: Session, provider_id) -> ProviderAutoSyncConfig:
     cfg = db.execute(
@@ -34,39 +55,113 @@ def update_provider_auto_sync(db: Session, provider_id, interval_minutes: int) -
     return cfg
 
 
-def run_provider_auto_sync(db: Session) -> dict:
+def resolve_vod_mode(cfg: ProviderAutoSyncConfig, vod_mode: str) -> str:
+    """full | incremental a partir del vod_mode pedido (auto decide por la cadencia)."""
+    if vod_mode != "auto":
+        return vod_mode
+    if cfg.vod_added_watermark is None or cfg.vod_full_reconcile_at is None:
+        return "full"
+    if cfg.vod_full_reconcile_at + timedelta(hours=VOD_FULL_RECONCILE_HOURS) <= datetime.now(timezone.utc):
+        return "full"
+    return "incremental"
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max(1, PROVIDER_AUTO_SYNC_WORKERS),
+            thread_name_prefix="provider-auto-sync",
+        )
+    return _executor
+
+
+def shutdown_provider_auto_sync() -> None:
+    """
+    Apagado: cancela los providers que esperan en la cola y no espera a los que corren
+    (esos terminan solos, acotados por los timeouts HTTP del sync).
+    """
+    global _executor
+    with _in_flight_lock:
+        executor, _executor = _executor, None
+        _in_flight.clear()
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _auto_sync_one_provider(provider_id: str, started: datetime) -> dict:
+    """Sync completo de un provider en su propia Session, bajo el advisory lock del provider."""
     # Import here to avoid circular import
-    from app.routers.providers import sync_all, sync_categories
+    from app.routers.providers import run_sync_all, sync_categories
+
+    with advisory_lock(PROVIDER_SYNC_LOCK, provider_id) as acquired:
+        if not acquired:
+            # otro proceso (o un job manual) ya está sincronizando este provider
+            return {"provider_id": provider_id, "ok": True, "skipped": "locked"}
 
+        db = SessionLocal()
+        try:
+            try:
+                sync_categories(provider_id, db=db)
+                run_sync_all(db, provider_id, include_inactive_categories=False, vod_mode="auto")
+                result = {"provider_id": provider_id, "ok": True}
+            except HTTPException as e:
+                db.rollback()
+                log.warning("Provider auto-sync failed for provider_id=%s: %s", provider_id, e.detail)
+                result = {"provider_id": provider_id, "ok": False, "error": e.detail}
+            except Exception as e:
+                db.rollback()
+                log.exception("Provider auto-sync failed for provider_id=%s: %s", provider_id, e)
+                result = {"provider_id": provider_id, "ok": False, "error": str(e)}
+
+            cfg = get_or_create_provider_auto_sync(db, provider_id)
+            cfg.last_run_at = started
+            cfg.updated_at = datetime.now(timezone.utc)
+            db.commit()
+            return result
+        finally:
+            db.close()
+
+
+def run_provider_auto_sync(db: Session) -> dict:
+    """
+    Lanza en el pool los providers que ya toca sincronizar y vuelve sin esperarlos: un panel
+    lento o colgado solo ocupa su worker, los demás siguen con su intervalo.
+
+    Returns:
+        providers activos, los recién lanzados, los que siguen corriendo y los resultados
+        de los que terminaron desde la llamada anterior.
+    """
     providers = db.execute(
         select(Provider).where(Provider.is_active == True)
     ).scalars().all()
 
     results = []
+    submitted = []
     now = datetime.now(timezone.utc)
-    for provider in providers:
-        provider_id = str(provider.id)
-        cfg = get_or_create_provider_auto_sync(db, provider.id)
-        interval_minutes = int(cfg.interval_minutes or 0)
-        if interval_minutes <= 0:
-            continue
-        if cfg.last_run_at and cfg.last_run_at + timedelta(minutes=interval_minutes) > now:
-            continue
-        try:
-            sync_categories(provider_id, db=db)
-            sync_all(provider_id, include_inactive_categories=False, db=db)
-            results.append({"provider_id": provider_id, "ok": True})
-        except HTTPException as e:
-            db.rollback()
-            log.warning("Provider auto-sync failed for provider_id=%s: %s", provider_id, e.detail)
-            results.append({"provider_id": provider_id, "ok": False, "error": e.detail})
-        except Exception as e:
-            db.rollback()
-            log.exception("Provider auto-sync failed for provider_id=%s: %s", provider_id, e)
-            results.append({"provider_id": provider_id, "ok": False, "error": str(e)})
-        finally:
-            cfg.last_run_at = now
-            cfg.updated_at = now
-            db.commit()
 
-    return {"providers": len(providers), "results": results}
+    with _in_flight_lock:
+        for provider_id, future in list(_in_flight.items()):
+            if future.done():
+                del _in_flight[provider_id]
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append({"provider_id": provider_id, "ok": False, "error": str(e)})
+
+        for provider in providers:
+            provider_id = str(provider.id)
+            if provider_id in _in_flight:
+                continue
+            cfg = get_or_create_provider_auto_sync(db, provider.id)
+            interval_minutes = int(cfg.interval_minutes or 0)
+            if interval_minutes <= 0:
+                continue
+            if cfg.last_run_at and cfg.last_run_at + timedelta(minutes=interval_minutes) > now:
+                continue
+            _in_flight[provider_id] = _get_executor().submit(_auto_sync_one_provider, provider_id, now)
+            submitted.append(provider_id)
+
+        running = list(_in_flight)
+
+    return {"providers": len(providers), "submitted": submitted, "running": running, "results": results}
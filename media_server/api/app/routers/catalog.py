@@ -0,0 +1,49 @@
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.catalog_changes import CONTENT_TYPES, changes_since
+from app.deps import get_db
+
+
+router = APIRouter(prefix="/catalog", tags=["catalog"])
+
+MAX_CHANGES_LIMIT = 20000
+
+
+@router.get("/changes")
+def get_catalog_changes(
+    since: int = 0,
+    limit: int = 5000,
+    provider_id: str | None = None,
+    types: str | None = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Deltas de live / vod / series desde `since` para mantener un espejo local.
+
+    - primera vez: since=0 (o descargar las listas completas y guardar el `version` de
+      una llamada a este endpoint hecha ANTES de la descarga)
+    - después: since=<version de la respuesta anterior>, mientras has_more=true
+    - reset=true: el cursor no es de esta base, recargar todo
+    types: "live,vod,series" (default: todos)
+    """
+    if since < 0:
+        raise HTTPException(status_code=400, detail="since must be >= 0")
+
+    wanted = CONTENT_TYPES
+    if types:
+        wanted = tuple(t.strip() for t in types.split(",") if t.strip())
+        unknown = [t for t in wanted if t not in CONTENT_TYPES]
+        if unknown or not wanted:
+            raise HTTPException(status_code=400, detail=f"types must be a subset of {', '.join(CONTENT_TYPES)}")
+
+    pid = None
+    if provider_id:
+        try:
+            pid = UUID(provider_id)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="Invalid provider_id") from exc
+
+    return changes_since(db, since, max(1, min(limit, MAX_CHANGES_LIMIT)), provider_id=pid, types=wanted)
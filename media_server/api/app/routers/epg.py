@@ -1,30 +1,41 @@
 from datetime import datetime, timezone, timedelta
-import threading
 from app.models import VodStream, SeriesItem
 from app.tmdb_client import _clean_title_and_year
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import select, delete
-from sqlalchemy import func
-import os, asyncio, logging
+from sqlalchemy import select
+from sqlalchemy import func, and_, tuple_
+import os, asyncio, hashlib, logging, time, uuid
 from sqlalchemy import select
 from app.db import SessionLocal
 from app.models import EpgSource
 from app.epg_match import best_match
 from app.deps import get_db
-from app.schemas import EpgSourceCreate
-from app.models import Provider, LiveStream, Category, EpgSource, EpgChannel, EpgProgram
-from app.xmltv import download_xmltv_to_file, iter_xmltv, parse_xmltv_datetime
+from app.schemas import EpgSourceCreate, EpgSourceUpdate
+from app.models import Provider, LiveStream, Category, EpgSource, EpgChannel, EpgProgram, LiveStreamCategory
+from app.epg_cache import epg_cache_stats, grid_bucket, grid_cache_get, grid_cache_put, invalidate_epg_cache
+from app.epg_index import epg_index_stats, index_programs, reload_epg_source
+from app.epg_now import epg_now_stats, now_next, refresh_epg_now
+from app.epg_ingest import apply_diff, apply_replace, clear_epg_run, purge_stale_epg_staging, run_bounds, stage_programs
+from app.epg_partitions import ensure_epg_partitions
+from app.pg_locks import advisory_lock
+from app.xmltv import fetch_xmltv, iter_xmltv, parse_xmltv_datetime
 
 log = logging.getLogger("mini_media_server")
-_SYNC_LOCK = threading.Lock()
 
 EPG_AUTO_SYNC = os.getenv("EPG_AUTO_SYNC", "1").strip().lower() not in {"0","false","no","off"}
 EPG_AUTO_SYNC_MINUTES = int(os.getenv("EPG_AUTO_SYNC_MINUTES", "60"))
 EPG_AUTO_SYNC_HOURS = int(os.getenv("EPG_AUTO_SYNC_HOURS", "36"))
 EPG_ENRICH_MISSING_DESC = os.getenv("EPG_ENRICH_MISSING_DESC", "1").strip().lower() not in {"0","false","no","off"}
 EPG_ENRICH_MAX_DESC_LEN = int(os.getenv("EPG_ENRICH_MAX_DESC_LEN", "1900"))
+EPG_SYNC_MODES = ("replace", "diff")
+EPG_SYNC_LOCK = "epg_sync"
+# Feed sin cambios: se saltea el ingest, salvo que el último tenga más de esto (la ventana
+# avanza y hay que cargar las horas nuevas aunque el XML sea el mismo)
+EPG_UNCHANGED_MAX_HOURS = int(os.getenv("EPG_UNCHANGED_MAX_HOURS", "6"))
+# Programas por COPY a staging; cada chunk se manda al server, se commitea y se suelta de memoria
+EPG_INSERT_CHUNK = int(os.getenv("EPG_INSERT_CHUNK", "5000"))
 
 
 router = APIRouter(prefix="/epg", tags=["epg"])
@@ -66,6 +77,46 @@ def _build_library_desc_map(db: Session) -> dict[str, str]:
     return out
 
 
+def _ingest_xmltv_ids(db: Session, src: EpgSource) -> set[str] | None:
+    """
+    xmltv ids cuyos programas se guardan según el filtro de la fuente (None = todos):
+    los mapeados a algún LiveStream (epg_source_id + epg_channel_id) más la allow-list.
+    """
+    if (src.ingest_filter or "all") != "mapped":
+        return None
+
+    mapped = db.execute(
+        select(LiveStream.epg_channel_id).where(
+            LiveStream.epg_source_id == src.id,
+            LiveStream.epg_channel_id != None,
+        ).distinct()
+    ).scalars().all()
+    wanted = {x.strip() for x in mapped if x and x.strip()}
+    wanted.update(x.strip() for x in (src.ingest_allow_list or []) if x and x.strip())
+    return wanted
+
+
+def _ingest_signature(ingest_filter: str, wanted_xmltv_ids: set[str] | None, hours: int) -> str:
+    """Huella de lo que determina qué se guarda del feed (filtro + ventana)."""
+    wanted = ",".join(sorted(wanted_xmltv_ids)) if wanted_xmltv_ids is not None else "*"
+    return hashlib.sha256(f"{ingest_filter}|{hours}|{wanted}".encode()).hexdigest()
+
+
+def _stage_chunk(db: Session, run_id, rows: list[tuple]) -> int:
+    """
+    COPY de un chunk de programas al staging del run y commit (la carga no deja una
+    transacción larga abierta). Vacía `rows`.
+    """
+    if not rows:
+        return 0
+    # los canales nuevos van en el mismo flush (un INSERT multi-fila)
+    db.flush()
+    n = stage_programs(db, run_id, rows)
+    db.commit()
+    rows.clear()
+    return n
+
+
 def sync_epg_for_source_id(
     db: Session,
     source_id: str,
@@ -74,15 +125,87 @@ def sync_epg_for_source_id(
     auto_map_provider_id: str | None = None,
     auto_map_approved_only: bool = True,
     auto_map_min_score: float = 0.72,
+    mode: str = "replace",
+    force: bool = False,
+    wait_lock: bool = False,
 ):
     """
     Core sync que puede llamarse desde el endpoint o desde un job automático.
 
+    Corre bajo un advisory lock de Postgres por fuente: fuentes distintas se sincronizan
+    en paralelo (también entre workers / procesos), la misma nunca dos veces a la vez.
+    Si está tomado: 409, o espera con wait_lock=True.
+
+    Si el feed no cambió desde el último ingest (304 al GET condicional con ETag /
+    Last-Modified, o mismo sha256 del XML) no se parsea ni se toca la base: el resultado
+    sale con outcome="not_modified". force=True baja y re-ingiere igual.
+
     Args:
+        mode: "replace" borra los programas de la fuente (si purge_all_programs) y re-inserta
+            todo; "diff" inserta / actualiza / borra solo lo que cambió (clave channel_id + start_time)
         auto_map_provider_id: Si se especifica, ejecuta automapeo para este provider después de sincronizar
         auto_map_approved_only: Si es True, solo automapea canales aprobados
         auto_map_min_score: Score mínimo para el automapeo (default 0.72)
     """
+    try:
+        source_key = str(uuid.UUID(str(source_id)))
+    except ValueError:
+        raise HTTPException(status_code=404, detail="EPG source not found")
+
+    started = time.perf_counter()
+    with advisory_lock(EPG_SYNC_LOCK, source_key, wait=wait_lock) as acquired:
+        if not acquired:
+            raise HTTPException(status_code=409, detail="EPG sync already running for this source")
+        lock_wait = time.perf_counter() - started
+        result = _sync_epg_source_locked(
+            db,
+            source_id,
+            hours=hours,
+            purge_all_programs=purge_all_programs,
+            auto_map_provider_id=auto_map_provider_id,
+            auto_map_approved_only=auto_map_approved_only,
+            auto_map_min_score=auto_map_min_score,
+            mode=mode,
+            force=force,
+        )
+
+    timing = result.setdefault("timing", {})
+    timing["lock_wait_s"] = round(lock_wait, 2)
+
+    if result.get("outcome") == "ingested":
+        # recarga incremental: solo esta fuente, ya commiteada
+        t_index = time.perf_counter()
+        try:
+            reload_epg_source(db, source_key)
+        except Exception as e:
+            db.rollback()
+            log.warning("EPG index reload failed for source_id=%s: %s", source_key, e)
+        try:
+            refresh_epg_now(db, force=True)
+        except Exception as e:
+            db.rollback()
+            log.warning("EPG now/next index rebuild failed after source_id=%s: %s", source_key, e)
+        timing["index_reload_s"] = round(time.perf_counter() - t_index, 2)
+    timing["total_s"] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def _sync_epg_source_locked(
+    db: Session,
+    source_id: str,
+    hours: int,
+    purge_all_programs: bool,
+    auto_map_provider_id: str | None,
+    auto_map_approved_only: bool,
+    auto_map_min_score: float,
+    mode: str,
+    force: bool,
+):
+    """Cuerpo de sync_epg_for_source_id; el llamador ya tiene el lock de la fuente."""
+    if mode not in EPG_SYNC_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(EPG_SYNC_MODES)}")
+    diff = mode == "diff"
+
     src = db.get(EpgSource, source_id)
     if not src:
         raise HTTPException(status_code=404, detail="EPG source not found")
@@ -90,14 +213,61 @@ def sync_epg_for_source_id(
     url = src.xmltv_url
     provider_for_legacy = db.get(Provider, auto_map_provider_id) if auto_map_provider_id else None
 
+    now = datetime.now(timezone.utc)
+    window_start = now - timedelta(hours=6)
+    window_end = now + timedelta(hours=max(1, min(hours, 168)))  # max 7 días
+
+    # filtro de ingesta: los canales se guardan siempre (hacen falta para mapear), los
+    # programas solo de los xmltv ids que interesan
+    ingest_filter = src.ingest_filter or "all"
+    wanted_xmltv_ids = _ingest_xmltv_ids(db, src)
+
+    # Si lo guardado salió de este mismo feed con el mismo filtro / ventana y no es muy
+    # viejo, alcanza con un GET condicional: 304 (o mismo digest) = no hay nada que hacer
+    signature = _ingest_signature(ingest_filter, wanted_xmltv_ids, hours)
+    reusable = (
+        not force
+        and src.content_digest is not None
+        and src.ingest_signature == signature
+        and src.last_ingest_at is not None
+        and src.last_ingest_at + timedelta(hours=EPG_UNCHANGED_MAX_HOURS) > now
+    )
+
+    t_download = time.perf_counter()
     try:
-        path = download_xmltv_to_file(url)
+        fetched = fetch_xmltv(
+            url,
+            etag=src.http_etag if reusable else None,
+            last_modified=src.http_last_modified if reusable else None,
+        )
     except Exception as e:
+        src.last_sync_at = now
+        src.last_sync_outcome = "failed"
+        db.commit()
         raise HTTPException(status_code=400, detail=f"XMLTV download failed: {e}")
+    download_s = time.perf_counter() - t_download
+
+    if reusable and (fetched.not_modified or fetched.digest == src.content_digest):
+        if fetched.path:
+            os.remove(fetched.path)
+        if not fetched.not_modified:
+            src.http_etag = fetched.etag
+            src.http_last_modified = fetched.last_modified
+        src.last_sync_at = now
+        src.last_sync_outcome = "not_modified"
+        db.commit()
+        return {
+            "ok": True,
+            "source_id": source_id,
+            "xmltv_url": url,
+            "outcome": "not_modified",
+            "http_status": 304 if fetched.not_modified else 200,
+            "last_ingest_at": src.last_ingest_at.isoformat(),
+            "timing": {"download_s": round(download_s, 2)},
+            "auto_map": None,
+        }
 
-    now = datetime.now(timezone.utc)
-    window_start = now - timedelta(hours=6)
-    window_end = now + timedelta(hours=max(1, min(hours, 168)))  # max 7 días
+    path = fetched.path
 
     # Cache de channels en memoria (xmltv_id -> EpgChannel)
     channel_map: dict[str, EpgChannel] = {}
@@ -107,140 +277,185 @@ def sync_epg_for_source_id(
     ).scalars().all()
     for c in existing_channels:
         channel_map[c.xmltv_id] = c
+    # xmltv_id -> id: los programas no tocan los objetos ORM (que expiran en cada commit)
+    channel_ids = {x: c.id for x, c in channel_map.items()}
+    src_id = src.id
+    skipped_programs = 0
 
     new_channels = 0
     up_channels = 0
-    new_programs = 0
-    purged_programs = 0
+    parsed_programs = 0
+    run_id = uuid.uuid4()
+    started = time.perf_counter()
 
     try:
-        with _SYNC_LOCK:
-            # ✅ Lo que tú quieres: no mezclar jamás. Borramos TODO lo viejo de esta fuente.
-            if purge_all_programs:
-                res = db.execute(delete(EpgProgram).where(EpgProgram.epg_source_id == src.id))
-                purged_programs = int(getattr(res, "rowcount", 0) or 0)
-
-            # Para evitar violación del unique (channel_id, start_time) si el XML viene con duplicados raros
-            seen_prog_keys: set[tuple[str, str]] = set()
-
-            library_desc = _build_library_desc_map(db) if EPG_ENRICH_MISSING_DESC else {}
-
-            for kind, elem in iter_xmltv(path):
-                if kind == "channel":
-                    xml_id = elem.get("id") or ""
-                    if not xml_id:
-                        continue
-
-                    names = elem.findall("display-name")
-                    display = (names[0].text if names and names[0].text else xml_id).strip()
-
-                    icon = elem.find("icon")
-                    icon_url = icon.get("src") if icon is not None else None
-
-                    existing = channel_map.get(xml_id)
-                    if existing:
-                        if existing.display_name != display or existing.icon_url != icon_url:
-                            existing.display_name = display
-                            existing.icon_url = icon_url
-                            existing.updated_at = datetime.now(timezone.utc)
-                            up_channels += 1
-                        if provider_for_legacy and existing.provider_id is None:
-                            existing.provider_id = provider_for_legacy.id
-                    else:
-                        ch = EpgChannel(
-                            epg_source_id=src.id,
-                            provider_id=provider_for_legacy.id if provider_for_legacy else None,
-                            xmltv_id=xml_id,
-                            display_name=display,
-                            icon_url=icon_url,
-                            updated_at=datetime.now(timezone.utc),
-                        )
-                        db.add(ch)
-                        db.flush()
-                        channel_map[xml_id] = ch
-                        new_channels += 1
-
-                elif kind == "programme":
-                    xml_id = elem.get("channel") or ""
-                    if not xml_id:
-                        continue
-
-                    start_s = elem.get("start") or ""
-                    stop_s = elem.get("stop") or ""
-
-                    try:
-                        start = parse_xmltv_datetime(start_s)
-                        stop = parse_xmltv_datetime(stop_s) if stop_s else None
-                    except Exception:
-                        continue
-
-                    if not stop or stop <= start:
-                        continue
-
-                    # ventana
-                    if stop <= window_start or start >= window_end:
-                        continue
-
-                    title_el = elem.find("title")
-                    desc_el = elem.find("desc")
-                    cat_el = elem.find("category")
-
-                    title = (title_el.text if title_el is not None and title_el.text else "Untitled").strip()
-                    desc = (desc_el.text if desc_el is not None and desc_el.text else None)
-                    cat = (cat_el.text if cat_el is not None and cat_el.text else None)
-
-                    ch = channel_map.get(xml_id)
-
-                    # Si el XML no trae desc, intenta enriquecer desde tu librería local
-                    if EPG_ENRICH_MISSING_DESC and (desc is None or not str(desc).strip()):
-                        ktitle = _title_key_for_library_match(title)
-                        found = library_desc.get(ktitle)
-                        if found:
-                            desc = found
-
-                    if not ch:
-                        ch = EpgChannel(
-                            epg_source_id=src.id,
-                            provider_id=provider_for_legacy.id if provider_for_legacy else None,
-                            xmltv_id=xml_id,
-                            display_name=xml_id,
-                            icon_url=None,
-                            updated_at=datetime.now(timezone.utc),
-                        )
-                        db.add(ch)
-                        db.flush()
-                        channel_map[xml_id] = ch
-                        new_channels += 1
-
-                    k = (str(ch.id), start.isoformat())
-                    if k in seen_prog_keys:
-                        continue
-                    seen_prog_keys.add(k)
-
-                    # ✅ Como ya purgamos, solo insertamos. Nada de “mezclas”.
-                    db.add(EpgProgram(
+        purge_stale_epg_staging(db)
+
+        # Para evitar violación del unique (channel_id, start_time) si el XML viene con duplicados raros
+        seen_prog_keys: set[tuple] = set()
+        pending: list[tuple] = []
+        legacy_provider_id = provider_for_legacy.id if provider_for_legacy else None
+
+        library_desc = _build_library_desc_map(db) if EPG_ENRICH_MISSING_DESC else {}
+
+        for kind, elem in iter_xmltv(path):
+            if kind == "channel":
+                xml_id = elem.get("id") or ""
+                if not xml_id:
+                    continue
+
+                names = elem.findall("display-name")
+                display = (names[0].text if names and names[0].text else xml_id).strip()
+
+                icon = elem.find("icon")
+                icon_url = icon.get("src") if icon is not None else None
+
+                existing = channel_map.get(xml_id)
+                if existing:
+                    if existing.display_name != display or existing.icon_url != icon_url:
+                        existing.display_name = display
+                        existing.icon_url = icon_url
+                        existing.updated_at = datetime.now(timezone.utc)
+                        up_channels += 1
+                    if provider_for_legacy and existing.provider_id is None:
+                        existing.provider_id = provider_for_legacy.id
+                else:
+                    ch = EpgChannel(
+                        id=uuid.uuid4(),
                         epg_source_id=src.id,
-                        provider_id=provider_for_legacy.id if provider_for_legacy else None,
-                        channel_id=ch.id,
-                        start_time=start,
-                        end_time=stop,
-                        title=title,
-                        description=desc,
-                        category=cat,
-                    ))
-                    new_programs += 1
-
-            src.updated_at = datetime.now(timezone.utc)
-            db.commit()
+                        provider_id=legacy_provider_id,
+                        xmltv_id=xml_id,
+                        display_name=display,
+                        icon_url=icon_url,
+                        updated_at=datetime.now(timezone.utc),
+                    )
+                    db.add(ch)
+                    channel_map[xml_id] = ch
+                    channel_ids[xml_id] = ch.id
+                    new_channels += 1
+
+            elif kind == "programme":
+                xml_id = elem.get("channel") or ""
+                if not xml_id:
+                    continue
+                if wanted_xmltv_ids is not None and xml_id not in wanted_xmltv_ids:
+                    skipped_programs += 1
+                    continue
+
+                start_s = elem.get("start") or ""
+                stop_s = elem.get("stop") or ""
+
+                try:
+                    start = parse_xmltv_datetime(start_s)
+                    stop = parse_xmltv_datetime(stop_s) if stop_s else None
+                except Exception:
+                    continue
+
+                if not stop or stop <= start:
+                    continue
+
+                # ventana
+                if stop <= window_start or start >= window_end:
+                    continue
+
+                title_el = elem.find("title")
+                desc_el = elem.find("desc")
+                cat_el = elem.find("category")
+
+                title = (title_el.text if title_el is not None and title_el.text else "Untitled").strip()
+                desc = (desc_el.text if desc_el is not None and desc_el.text else None)
+                cat = (cat_el.text if cat_el is not None and cat_el.text else None)
+
+                ch_id = channel_ids.get(xml_id)
+
+                # Si el XML no trae desc, intenta enriquecer desde tu librería local
+                if EPG_ENRICH_MISSING_DESC and (desc is None or not str(desc).strip()):
+                    ktitle = _title_key_for_library_match(title)
+                    found = library_desc.get(ktitle)
+                    if found:
+                        desc = found
+
+                if not ch_id:
+                    ch = EpgChannel(
+                        id=uuid.uuid4(),
+                        epg_source_id=src_id,
+                        provider_id=legacy_provider_id,
+                        xmltv_id=xml_id,
+                        display_name=xml_id,
+                        icon_url=None,
+                        updated_at=datetime.now(timezone.utc),
+                    )
+                    db.add(ch)
+                    channel_map[xml_id] = ch
+                    ch_id = channel_ids[xml_id] = ch.id
+                    new_channels += 1
+
+                k = (ch_id, start)
+                if k in seen_prog_keys:
+                    continue
+                seen_prog_keys.add(k)
+
+                pending.append((ch_id, start, stop, title, desc, cat))
+                if len(pending) >= EPG_INSERT_CHUNK:
+                    parsed_programs += _stage_chunk(db, run_id, pending)
+
+        parsed_programs += _stage_chunk(db, run_id, pending)
+
+        # particiones diarias del rango cargado (DDL en su propia transacción, antes del swap)
+        first_start, last_start = run_bounds(db, run_id)
+        if first_start:
+            ensure_epg_partitions(db, first_start, last_start)
+
+        load_s = time.perf_counter() - started
+        t_swap = time.perf_counter()
+
+        # ✅ Swap: una sola transacción corta. Hasta el commit los lectores ven la guía
+        # anterior completa; después, la nueva completa. Nunca vacía ni a medias.
+        if diff:
+            counts = apply_diff(db, run_id, src_id, legacy_provider_id, window_start, window_end, now)
+        else:
+            counts = apply_replace(db, run_id, src_id, legacy_provider_id, now, purge=purge_all_programs)
+        src.updated_at = datetime.now(timezone.utc)
+        src.http_etag = fetched.etag
+        src.http_last_modified = fetched.last_modified
+        src.content_digest = fetched.digest
+        src.ingest_signature = signature
+        src.last_ingest_at = now
+        src.last_sync_at = now
+        src.last_sync_outcome = "ingested"
+        db.commit()
+        invalidate_epg_cache()
+
+        swap_s = time.perf_counter() - t_swap
+
+        # la generación cargada ya no hace falta
+        clear_epg_run(db, run_id)
+        db.commit()
+
+        elapsed = time.perf_counter() - started
 
         result = {
             "ok": True,
             "source_id": source_id,
             "xmltv_url": url,
+            "outcome": "ingested",
             "window": {"start": window_start.isoformat(), "end": window_end.isoformat()},
-            "purged_programs": purged_programs,
+            "purged_programs": counts.get("purged", 0),
             "channels": {"new": new_channels, "updated": up_channels},
-            "programs": {"new": new_programs},
+            "mode": mode,
+            "ingest_filter": {
+                "mode": ingest_filter,
+                "channels": len(wanted_xmltv_ids) if wanted_xmltv_ids is not None else None,
+                "skipped_programs": skipped_programs,
+            },
+            "programs": {"parsed": parsed_programs, **counts} if diff else {"new": counts["inserted"]},
+            "elapsed_seconds": round(elapsed, 2),
+            "programs_per_s": round(parsed_programs / elapsed, 1) if elapsed > 0 else None,
+            "timing": {
+                "download_s": round(download_s, 2),
+                "load_s": round(load_s, 2),
+                "swap_s": round(swap_s, 2),
+            },
             "auto_map": None,
         }
 
@@ -289,6 +504,7 @@ def sync_epg_for_source_id(
                         changed += 1
 
                     db.commit()
+                    invalidate_epg_cache()
 
                     result["auto_map"] = {
                         "executed": True,
@@ -305,9 +521,16 @@ def sync_epg_for_source_id(
                 result["auto_map"] = {"executed": False, "error": str(e)}
 
         return result
+    except Exception:
+        # que el run a medio cargar no quede en staging
+        db.rollback()
+        clear_epg_run(db, run_id)
+        src.last_sync_at = now
+        src.last_sync_outcome = "failed"
+        db.commit()
+        raise
     finally:
         try:
-            import os
             os.remove(path)
         except Exception:
             pass
@@ -316,10 +539,28 @@ def sync_epg_for_source_id(
 @router.get("/sources")
 def list_sources(db: Session = Depends(get_db)):
     rows = db.execute(select(EpgSource).order_by(EpgSource.name.asc())).scalars().all()
-    return {"ok": True, "items": [
-        {"id": str(x.id), "name": x.name, "xmltv_url": x.xmltv_url, "is_active": x.is_active}
-        for x in rows
-    ]}
+    return {"ok": True, "items": [_source_out(x) for x in rows]}
+
+
+def _source_out(x: EpgSource) -> dict:
+    return {
+        "id": str(x.id),
+        "name": x.name,
+        "xmltv_url": x.xmltv_url,
+        "is_active": x.is_active,
+        "ingest_filter": x.ingest_filter,
+        "ingest_allow_list": x.ingest_allow_list,
+        "last_sync_at": x.last_sync_at.isoformat() if x.last_sync_at else None,
+        "last_sync_outcome": x.last_sync_outcome,
+        "last_ingest_at": x.last_ingest_at.isoformat() if x.last_ingest_at else None,
+    }
+
+
+def _clean_allow_list(values: list[str] | None) -> list[str] | None:
+    if values is None:
+        return None
+    out = sorted({v.strip() for v in values if v and v.strip()})
+    return out or None
 
 @router.post("/sources")
 def create_source(payload: EpgSourceCreate, db: Session = Depends(get_db)):
@@ -327,6 +568,8 @@ def create_source(payload: EpgSourceCreate, db: Session = Depends(get_db)):
         name=payload.name.strip(),
         xmltv_url=str(payload.xmltv_url).strip(),
         is_active=True,
+        ingest_filter=payload.ingest_filter,
+        ingest_allow_list=_clean_allow_list(payload.ingest_allow_list),
         updated_at=datetime.now(timezone.utc),
     )
     db.add(s)
@@ -334,6 +577,34 @@ def create_source(payload: EpgSourceCreate, db: Session = Depends(get_db)):
     db.refresh(s)
     return {"ok": True, "id": str(s.id)}
 
+
+@router.patch("/sources/{source_id}")
+def update_source(source_id: str, payload: EpgSourceUpdate, db: Session = Depends(get_db)):
+    """
+    Edita la fuente. ingest_filter=mapped guarda solo programas de canales mapeados
+    (+ ingest_allow_list); aplica desde el próximo sync.
+    """
+    s = db.get(EpgSource, source_id)
+    if not s:
+        raise HTTPException(status_code=404, detail="EPG source not found")
+
+    data = payload.dict(exclude_unset=True)
+    if data.get("name") is not None:
+        s.name = data["name"].strip()
+    if data.get("xmltv_url") is not None:
+        s.xmltv_url = str(data["xmltv_url"]).strip()
+    if data.get("is_active") is not None:
+        s.is_active = data["is_active"]
+    if data.get("ingest_filter") is not None:
+        s.ingest_filter = data["ingest_filter"]
+    if "ingest_allow_list" in data:
+        s.ingest_allow_list = _clean_allow_list(data["ingest_allow_list"])
+
+    s.updated_at = datetime.now(timezone.utc)
+    db.commit()
+    db.refresh(s)
+    return {"ok": True, "item": _source_out(s)}
+
 @router.get("/channels")
 def list_epg_channels(
     source_id: str,
@@ -390,10 +661,14 @@ def sync_epg(
     auto_map_provider_id: str | None = None,
     auto_map_approved_only: bool = True,
     auto_map_min_score: float = 0.72,
+    mode: str = "replace",
+    force: bool = False,
     db: Session = Depends(get_db),
 ):
     """
-    Endpoint de sync manual. Por defecto purga TODO lo viejo para nunca mezclar.
+    Endpoint de sync manual. Por defecto purga TODO lo viejo para nunca mezclar
+    (mode=diff: solo aplica lo que cambió). Si el feed no cambió desde el último ingest
+    devuelve outcome=not_modified sin tocar nada; force=true re-ingiere igual.
 
     Args:
         auto_map_provider_id: Si se especifica, ejecuta automapeo para este provider después de sincronizar
@@ -408,6 +683,8 @@ def sync_epg(
         auto_map_provider_id=auto_map_provider_id,
         auto_map_approved_only=auto_map_approved_only,
         auto_map_min_score=auto_map_min_score,
+        mode=mode,
+        force=force,
     )
 
 
@@ -417,67 +694,22 @@ def epg_now(provider_id: str, live_ids: str, db: Session = Depends(get_db)):
     """
     live_ids: CSV de UUIDs de LiveStream.
     Usa live_stream.epg_source_id + live_stream.epg_channel_id (xmltv_id).
-    """
-    p = db.get(Provider, provider_id)
-    if not p:
-        raise HTTPException(status_code=404, detail="Provider not found")
 
-    ids = [x.strip() for x in live_ids.split(",") if x.strip()]
+    Una sola query (live_ids del proveedor + si el proveedor existe); los programas salen
+    de los índices en memoria (epg_index / epg_now), que se arman fuera del request. Cada
+    item trae también "next".
+    """
+    try:
+        pid = str(uuid.UUID(provider_id))
+        ids = list(dict.fromkeys(str(uuid.UUID(x.strip())) for x in live_ids.split(",") if x.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid provider_id or live_ids")
     if not ids:
         raise HTTPException(status_code=400, detail="live_ids required")
 
-    streams = db.execute(
-        select(LiveStream).where(LiveStream.provider_id == p.id, LiveStream.id.in_(ids))
-    ).scalars().all()
-
-    now = datetime.now(timezone.utc)
-
-    results = []
-    for s in streams:
-        src_id = s.epg_source_id
-        xml_id = (s.epg_channel_id or "").strip()
-
-        if not src_id or not xml_id:
-            results.append({"live_id": str(s.id), "name": s.name, "epg": None})
-            continue
-
-        ch = db.execute(
-            select(EpgChannel).where(
-                EpgChannel.epg_source_id == src_id,
-                EpgChannel.xmltv_id == xml_id,
-            )
-        ).scalar_one_or_none()
-
-        if not ch:
-            results.append({"live_id": str(s.id), "name": s.name, "epg": None})
-            continue
-
-        prog = db.execute(
-            select(EpgProgram).where(
-                EpgProgram.channel_id == ch.id,
-                EpgProgram.start_time <= now,
-                EpgProgram.end_time > now,
-            ).order_by(EpgProgram.start_time.desc())
-        ).scalar_one_or_none()
-
-        if not prog:
-            results.append({"live_id": str(s.id), "name": s.name, "epg": None})
-            continue
-
-        results.append({
-            "live_id": str(s.id),
-            "name": s.name,
-            "epg": {
-                "title": prog.title,
-                "start": prog.start_time.isoformat(),
-                "end": prog.end_time.isoformat(),
-                "description": prog.description,
-                "category": prog.category,
-                "channel_display": ch.display_name,
-                "xmltv_id": ch.xmltv_id,
-                "epg_source_id": str(src_id),
-            }
-        })
+    results = now_next(db, pid, ids)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Provider not found")
 
     return {"ok": True, "count": len(results), "items": results}
 
@@ -588,6 +820,7 @@ def epg_auto_map(
 
     if not dry_run:
         db.commit()
+        invalidate_epg_cache()
 
     return {
         "ok": True,
@@ -632,6 +865,82 @@ def epg_auto_map_approved(
     )
 
 
+def _window_programs(db: Session, pairs, start: datetime, end: datetime) -> dict:
+    """
+    Canal + programas en [start, end) para cada (epg_source_id, xmltv_id).
+
+    Sale del índice en memoria (epg_index) lo que está cargado; el resto va en UNA query
+    (LEFT JOIN, así también vienen los canales sin programas) agrupada en memoria.
+
+    Returns:
+        (source_uuid, xmltv_id) -> {"name": display_name, "programs": [(start, end, title, category, description)]}
+    """
+    epg_ch = {}
+    missing = []
+    for src_id, xml_id in pairs:
+        hit = index_programs(src_id, xml_id, start, end)
+        if hit is None:
+            missing.append((src_id, xml_id))
+        elif hit[1] is not None:
+            epg_ch[(src_id, xml_id)] = {"name": hit[0], "programs": hit[1]}
+
+    if missing:
+        rows = db.execute(
+            select(
+                EpgChannel.epg_source_id,
+                EpgChannel.xmltv_id,
+                EpgChannel.display_name,
+                EpgProgram.start_time,
+                EpgProgram.end_time,
+                EpgProgram.title,
+                EpgProgram.category,
+                EpgProgram.description,
+            )
+            .select_from(EpgChannel)
+            .outerjoin(EpgProgram, and_(
+                EpgProgram.channel_id == EpgChannel.id,
+                EpgProgram.end_time > start,
+                EpgProgram.start_time < end,
+            ))
+            .where(tuple_(EpgChannel.epg_source_id, EpgChannel.xmltv_id).in_(missing))
+            .order_by(EpgChannel.id, EpgProgram.start_time.asc())
+        ).all()
+
+        for src_id, xml_id, display_name, start_time, end_time, title, category, description in rows:
+            ch = epg_ch.setdefault((src_id, xml_id), {"name": display_name, "programs": []})
+            if start_time is not None:
+                ch["programs"].append((start_time, end_time, title, category, description))
+
+    return epg_ch
+
+
+def _grid_item(s: LiveStream, epg_ch: dict) -> dict:
+    xml_id = (s.epg_channel_id or "").strip()
+    ch = epg_ch.get((s.epg_source_id, xml_id)) if (s.epg_source_id and xml_id) else None
+
+    # Apply time offset to program times if configured (in minutes)
+    offset_delta = timedelta(minutes=s.epg_time_offset or 0)
+    programs = [{
+        "title": title,
+        "start": (start_time + offset_delta).isoformat(),
+        "end": (end_time + offset_delta).isoformat(),
+        "category": category,
+        "description": description,
+    } for start_time, end_time, title, category, description in (ch["programs"] if ch else ())]
+
+    return {
+        "live_id": str(s.id),
+        "name": s.name,
+        "logo": s.custom_logo_url,
+        "channel_number": s.channel_number,
+        "epg_source_id": str(s.epg_source_id) if s.epg_source_id else None,
+        "epg_channel_id": xml_id or None,
+        "epg_channel_name": ch["name"] if ch else None,
+        "epg_time_offset": s.epg_time_offset,
+        "programs": programs,
+    }
+
+
 @router.get("/grid")
 def epg_grid(
     provider_id: str,
@@ -644,14 +953,24 @@ def epg_grid(
 ):
 
     """
-    Devuelve canales + programas en ventana [now, now+hours]
+    Devuelve canales + programas en ventana [now, now+hours].
+
+    "now" es el inicio del bucket de 5 minutos (epg_cache): la respuesta se cachea por
+    bucket y se invalida con cada sync de EPG o cambio de mapeo.
     """
+    hours = max(1, min(hours, 24))
+    limit_channels = min(limit_channels, 200)
+    now = grid_bucket()
+    key = (provider_id, category_ext_id, limit_channels, offset_channels, approved_only, hours, now)
+    cached, generation = grid_cache_get(key)
+    if cached is not None:
+        return cached
+
     p = db.get(Provider, provider_id)
     if not p:
         raise HTTPException(status_code=404, detail="Provider not found")
 
-    now = datetime.now(timezone.utc)
-    end = now + timedelta(hours=max(1, min(hours, 24)))
+    end = now + timedelta(hours=hours)
 
     # canales a mostrar
     stmt = select(LiveStream).where(
@@ -672,88 +991,98 @@ def epg_grid(
         ).scalar_one_or_none()
         if not cat:
             raise HTTPException(status_code=404, detail="Category not found")
-        stmt = stmt.where(LiveStream.category_id == cat.id)
+        # por membresía: el item puede estar en varias categorías del panel
+        stmt = stmt.where(LiveStream.id.in_(
+            select(LiveStreamCategory.stream_id).where(LiveStreamCategory.category_id == cat.id)
+        ))
 
     streams = db.execute(
         stmt.order_by(LiveStream.name.asc())
-        .limit(min(limit_channels, 200))
+        .limit(limit_channels)
         .offset(offset_channels)
     ).scalars().all()
 
-    # Pre-carga channels xmltv
-    # Pre-carga channels xmltv por fuente (epg_source_id + xmltv_id)
-    epg_ch = {}  # key: (source_uuid, xmltv_id) -> EpgChannel
-    xml_by_source = {}
+    # canales xmltv de la página (epg_source_id + xmltv_id)
+    pairs = {
+        (s.epg_source_id, (s.epg_channel_id or "").strip())
+        for s in streams
+        if s.epg_source_id and (s.epg_channel_id or "").strip()
+    }
 
-    for s in streams:
-        if s.epg_source_id and s.epg_channel_id:
-            xml = (s.epg_channel_id or "").strip()
-            if not xml:
-                continue
-            xml_by_source.setdefault(s.epg_source_id, set()).add(xml)
+    epg_ch = _window_programs(db, pairs, now, end)
+    items = [_grid_item(s, epg_ch) for s in streams]
 
-    for src_id, xml_ids in xml_by_source.items():
-        rows = db.execute(
-            select(EpgChannel).where(
-                EpgChannel.epg_source_id == src_id,
-                EpgChannel.xmltv_id.in_(list(xml_ids)),
-            )
-        ).scalars().all()
+    out = {
+        "ok": True,
+        "window": {"start": now.isoformat(), "end": end.isoformat()},
+        "count": len(items),
+        "items": items,
+    }
+    grid_cache_put(key, out, generation)
+    return out
 
-        for c in rows:
-            epg_ch[(c.epg_source_id, c.xmltv_id)] = c
 
-    items = []
-    for s in streams:
-        xml_id = (s.epg_channel_id or "").strip()
-        ch = epg_ch.get((s.epg_source_id, xml_id)) if (s.epg_source_id and xml_id) else None
-
-        # Get time offset for this channel (in minutes)
-        time_offset_minutes = s.epg_time_offset or 0
-
-        programs = []
-        if ch:
-            prows = db.execute(
-                select(EpgProgram)
-                .where(EpgProgram.channel_id == ch.id)
-                .where(EpgProgram.end_time > now, EpgProgram.start_time < end)
-                .order_by(EpgProgram.start_time.asc())
-            ).scalars().all()
-
-            # Apply time offset to program times if configured
-            if time_offset_minutes != 0:
-                offset_delta = timedelta(minutes=time_offset_minutes)
-                programs = [{
-                    "title": pr.title,
-                    "start": (pr.start_time + offset_delta).isoformat(),
-                    "end": (pr.end_time + offset_delta).isoformat(),
-                    "category": pr.category,
-                    "description": pr.description,
-                } for pr in prows]
-            else:
-                programs = [{
-                    "title": pr.title,
-                    "start": pr.start_time.isoformat(),
-                    "end": pr.end_time.isoformat(),
-                    "category": pr.category,
-                    "description": pr.description,
-                } for pr in prows]
-
-        items.append({
-            "live_id": str(s.id),
-            "name": s.name,
-            "logo": s.custom_logo_url,
-            "channel_number": s.channel_number,
-            "epg_source_id": str(s.epg_source_id) if s.epg_source_id else None,
-            "epg_channel_id": xml_id or None,
-            "epg_channel_name": ch.display_name if ch else None,
-            "epg_time_offset": s.epg_time_offset,
-            "programs": programs,
-        })
+@router.get("/range")
+def epg_range(
+    provider_id: str,
+    live_ids: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Programas de los live_ids (CSV de UUIDs de LiveStream) que se solapan con [start, end).
+    start: default now; end: default start + 6h; como mucho 24h.
+    Mismo formato de item que /grid. Sale del índice en memoria si la ventana está cargada.
+    """
+    try:
+        ids = list(dict.fromkeys(str(uuid.UUID(x.strip())) for x in live_ids.split(",") if x.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid live_ids")
+    if not ids:
+        raise HTTPException(status_code=400, detail="live_ids required")
+
+    start = start or datetime.now(timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    end = end or start + timedelta(hours=6)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    end = min(end, start + timedelta(hours=24))
+
+    p = db.get(Provider, provider_id)
+    if not p:
+        raise HTTPException(status_code=404, detail="Provider not found")
+
+    streams = db.execute(
+        select(LiveStream).where(LiveStream.provider_id == p.id, LiveStream.id.in_(ids))
+    ).scalars().all()
+
+    pairs = {
+        (s.epg_source_id, (s.epg_channel_id or "").strip())
+        for s in streams
+        if s.epg_source_id and (s.epg_channel_id or "").strip()
+    }
+    epg_ch = _window_programs(db, pairs, start, end)
+    by_id = {str(s.id): s for s in streams}
+    items = [_grid_item(by_id[x], epg_ch) for x in ids if x in by_id]
 
     return {
         "ok": True,
-        "window": {"start": now.isoformat(), "end": end.isoformat()},
+        "window": {"start": start.isoformat(), "end": end.isoformat()},
         "count": len(items),
         "items": items,
     }
+
+
+@router.get("/index/stats")
+def epg_index_status():
+    """Memoria y contadores del índice en memoria, del índice now/next y del cache de /grid."""
+    return {
+        "ok": True,
+        "index": epg_index_stats(),
+        "now": epg_now_stats(),
+        "grid_cache": epg_cache_stats(),
+    }
@@ -0,0 +1,41 @@
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.deps import get_db
+from app.models import SyncJob
+from app.sync_jobs import job_out
+
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("")
+def list_jobs(provider_id: str | None = None, limit: int = 20, db: Session = Depends(get_db)):
+    """Últimos jobs (sin el result completo)."""
+    q = select(SyncJob).order_by(SyncJob.created_at.desc()).limit(max(1, min(limit, 100)))
+    if provider_id:
+        try:
+            q = q.where(SyncJob.provider_id == UUID(provider_id))
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="Invalid provider_id") from exc
+
+    out = []
+    for job in db.execute(q).scalars().all():
+        item = job_out(job)
+        item.pop("result", None)
+        out.append(item)
+    return out
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    try:
+        job = db.get(SyncJob, UUID(job_id))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid job_id") from exc
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_out(job)
@@ -3,7 +3,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select, func, or_
 from app.schemas import LiveStreamUpdate
 from app.deps import get_db
-from app.models import Provider, Category, LiveStream, ProviderUser
+from app.epg_cache import invalidate_epg_cache
+from app.models import Provider, Category, LiveStream, ProviderUser, LiveStreamCategory
 from app.vlc import launch_vlc
 from sqlalchemy.exc import IntegrityError
 import os
@@ -122,7 +123,10 @@ def list_live_streams(
         ).scalar_one_or_none()
         if not cat:
             raise HTTPException(status_code=404, detail="Category not found for this provider")
-        stmt = stmt.where(LiveStream.category_id == cat.id)
+        # por membresía: el item puede estar en varias categorías del panel
+        stmt = stmt.where(LiveStream.id.in_(
+            select(LiveStreamCategory.stream_id).where(LiveStreamCategory.category_id == cat.id)
+        ))
 
     if q:
         qq = f"%{q.strip()}%"
@@ -353,6 +357,9 @@ def update_live_stream(
         db.rollback()
         raise HTTPException(status_code=409, detail="Integrity error")
 
+    # mapeo EPG / approved / número / logo: la grilla cacheada ya no vale
+    invalidate_epg_cache()
+
     db.refresh(s)
 
     return {
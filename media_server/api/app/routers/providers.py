@@ -1,14 +1,41 @@
+import hashlib
+import json
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from typing import Callable
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import func, or_, select
 from sqlalchemy.orm import Session
 
+from app.catalog_staging import clear_run, merge_run, purge_stale_staging, stage_items
+from app.catalog_upsert import (
+    deactivate_orphans,
+    dedupe_vod_streams,
+    live_row,
+    rehome_primary_category,
+    series_row,
+    sync_memberships,
+    upsert_categories,
+    upsert_live_streams,
+    upsert_series_items,
+    upsert_vod_streams,
+    vod_row,
+)
 from app.deps import get_db
 from app.models import Category, LiveStream, Provider, ProviderUser, SeriesItem, VodStream
-from app.provider_auto_sync import get_or_create_provider_auto_sync, update_provider_auto_sync
+from app.provider_auto_sync import (
+    VOD_MODES,
+    get_or_create_provider_auto_sync,
+    resolve_vod_mode,
+    update_provider_auto_sync,
+)
 from app.schemas import ProviderAutoSyncConfigOut, ProviderAutoSyncConfigUpdate, ProviderCreate, ProviderOut, ProviderUpdate
-from app.xtream_client import XtreamError, xtream_get
+from app.sync_jobs import enqueue_sync_job
+from app.xtream_client import XtreamError, iter_xtream_concurrent, xtream_get, xtream_pool_stats, xtream_stream
 
 
 router = APIRouter(prefix="/providers", tags=["providers"])
@@ -82,6 +109,11 @@ def list_providers(db: Session = Depends(get_db)):
     providers = db.execute(select(Provider).order_by(Provider.created_at.desc())).scalars().all()
     return [_provider_out(db, provider) for provider in providers]
 
+@router.get("/http-pool")
+def get_http_pool_stats():
+    """Conexiones Xtream pooled por panel: requests, conexiones abiertas y reutilizadas."""
+    return xtream_pool_stats()
+
 @router.get("/{provider_id}", response_model=ProviderOut)
 def get_provider(provider_id: str, db: Session = Depends(get_db)):
     p = db.get(Provider, provider_id)
@@ -135,6 +167,8 @@ def get_provider_auto_sync(provider_id: str, db: Session = Depends(get_db)):
         provider_id=cfg.provider_id,
         interval_minutes=cfg.interval_minutes,
         last_run_at=cfg.last_run_at,
+        vod_added_watermark=cfg.vod_added_watermark,
+        vod_full_reconcile_at=cfg.vod_full_reconcile_at,
     )
 
 
@@ -156,6 +190,8 @@ def update_provider_auto_sync_config(
         provider_id=cfg.provider_id,
         interval_minutes=cfg.interval_minutes,
         last_run_at=cfg.last_run_at,
+        vod_added_watermark=cfg.vod_added_watermark,
+        vod_full_reconcile_at=cfg.vod_full_reconcile_at,
     )
 
 
@@ -168,7 +204,8 @@ def test_provider(provider_id: str, db: Session = Depends(get_db)):
     username, password = _get_sync_credentials(db, p)
 
     try:
-        data = xtream_get(p.base_url, username, password, "get_live_categories")
+        # sin cache: el test tiene que tocar el panel
+        data = xtream_get(p.base_url, username, password, "get_live_categories", cache=False)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Xtream test failed: {e}")
 
@@ -178,53 +215,553 @@ def test_provider(provider_id: str, db: Session = Depends(get_db)):
 
 
 def _sync_one_category_set(db: Session, provider: Provider, cat_type: str, raw: list[dict]) -> int:
-    # Upsert manual (MVP): busca por provider + cat_type + provider_category_id
+    return upsert_categories(db, provider.id, cat_type, raw)
+
+
+def _upsert_live_batch(db: Session, provider: Provider, cat: Category, raw: list, now: datetime) -> tuple[int, set[int]]:
+    rows = [r for r in map(live_row, raw) if r]
+    changed = upsert_live_streams(db, provider.id, cat.id, rows, now=now)
+    return changed, {r["provider_stream_id"] for r in rows}
+
+
+def _finish_live_category(db: Session, provider: Provider, cat: Category, seen: set[int], now: datetime) -> int:
+    # membresías de ESTA categoría = lo que vino; la desactivación va al final (_finalize_live)
+    sync_memberships(db, LiveStream, "provider_stream_id", provider.id, cat.id, seen)
+    return 0
+
+
+def _finalize_live(db: Session, provider: Provider, now: datetime) -> int:
+    # desactiva los que ya no aparecen en NINGUNA categoría
+    return (
+        deactivate_orphans(db, LiveStream, provider.id, now)
+        + rehome_primary_category(db, LiveStream, provider.id, now)
+    )
+
+
+def _upsert_series_batch(db: Session, provider: Provider, cat: Category, raw: list, now: datetime) -> tuple[int, set[int]]:
+    rows = [r for r in map(series_row, raw) if r]
+    changed = upsert_series_items(db, provider.id, cat.id, rows, now=now)
+    return changed, {r["provider_series_id"] for r in rows}
+
+
+def _finish_series_category(db: Session, provider: Provider, cat: Category, seen: set[int], now: datetime) -> int:
+    sync_memberships(db, SeriesItem, "provider_series_id", provider.id, cat.id, seen)
+    return 0
+
+
+def _finalize_series(db: Session, provider: Provider, now: datetime) -> int:
+    return (
+        deactivate_orphans(db, SeriesItem, provider.id, now)
+        + rehome_primary_category(db, SeriesItem, provider.id, now)
+    )
+
+
+def _upsert_vod_batch(db: Session, provider: Provider, cat: Category, raw: list, now: datetime) -> tuple[int, set[int]]:
+    rows = [r for r in map(vod_row, raw) if r]
+    changed = upsert_vod_streams(db, provider.id, cat.id, rows, now=now)
+    return changed, {r["provider_stream_id"] for r in rows}
+
+
+def _finish_vod_category(
+    db: Session,
+    provider: Provider,
+    cat: Category,
+    seen: set[int],
+    now: datetime,
+    full: bool = True,
+) -> int:
+    # full=False (incremental, o sin deactivate_missing): no se quitan membresías
+    sync_memberships(db, VodStream, "provider_stream_id", provider.id, cat.id, seen, full=full)
+    return dedupe_vod_streams(db, provider.id, seen, now)
+
+
+def _finalize_vod(db: Session, provider: Provider, now: datetime, deactivate_missing_streams: bool = False) -> int:
     changed = 0
-    seen = set()
-
-    for item in raw or []:
-        ext_id = int(item.get("category_id"))
-        name = (item.get("category_name") or "").strip() or f"Category {ext_id}"
-        seen.add(ext_id)
-
-        existing = db.execute(
-            select(Category).where(
-                Category.provider_id == provider.id,
-                Category.cat_type == cat_type,
-                Category.provider_category_id == ext_id,
-            )
-        ).scalar_one_or_none()
-
-        if existing:
-            # update si cambió
-            if existing.name != name or existing.is_active is False:
-                existing.name = name
-                existing.is_active = True
-                existing.updated_at = datetime.now(timezone.utc)
-                changed += 1
+    if deactivate_missing_streams:
+        changed += deactivate_orphans(db, VodStream, provider.id, now)
+    return changed + rehome_primary_category(db, VodStream, provider.id, now)
+
+
+@dataclass(frozen=True)
+class _CategoryWriter:
+    """
+    Escritura de una categoría en dos fases:
+    - upsert(db, provider, cat, raw, now) -> (changed, ids vistos); se puede llamar por lotes
+    - finish(db, provider, cat, seen, now) -> changed; desactivación/dedupe cuando ya se
+      vio la categoría completa
+
+    `tag` entra en el content hash: el mismo JSON escrito con otras opciones (p.ej. VOD con
+    deactivate_missing) no cuenta como "ya sincronizado".
+
+    - finalize(db, provider, now) -> changed; una vez al final del sync (desactivar los
+      items que quedaron sin ninguna categoría, mover la categoría principal)
+
+    keep: filtro opcional de los items crudos antes del upsert (sync incremental).
+    store_hash=False: se compara contra Category.content_hash pero no se guarda (una
+    escritura parcial no puede marcar la categoría como sincronizada).
+    """
+    tag: str
+    upsert: Callable[..., tuple[int, set[int]]]
+    finish: Callable[..., int]
+    finalize: Callable[..., int] | None = None
+    keep: Callable[[list], list] | None = None
+    store_hash: bool = True
+
+    def write(self, db: Session, provider: Provider, cat: Category, raw: list) -> int:
+        now = datetime.now(timezone.utc)
+        if self.keep is not None:
+            raw = self.keep(raw)
+        changed, seen = self.upsert(db, provider, cat, raw, now)
+        return changed + self.finish(db, provider, cat, seen, now)
+
+    def hasher(self):
+        return _content_hasher(self.tag)
+
+    @property
+    def content_type(self) -> str:
+        return self.tag.partition("+")[0]
+
+    def set_hash(self, cat: Category, digest: str) -> None:
+        if self.store_hash:
+            cat.content_hash = digest
+
+
+LIVE_WRITER = _CategoryWriter("live", _upsert_live_batch, _finish_live_category, _finalize_live)
+SERIES_WRITER = _CategoryWriter("series", _upsert_series_batch, _finish_series_category, _finalize_series)
+
+
+def _parse_int(value) -> int | None:
+    try:
+        return int(str(value).strip())
+    except Exception:
+        return None
+
+
+class _VodWatermark:
+    """
+    Watermark de `added` (epoch de Xtream) por provider para el sync incremental de VOD.
+
+    incremental=True: keep() deja pasar solo los items con `added` más nuevo que el
+    watermark o cuyo stream_id no está activo en la DB (membresía contra un set cargado
+    una vez); el resto no se escribe. Con incremental=False deja pasar todo. En los dos
+    casos registra el mayor `added` visto para el próximo watermark.
+    """
+
+    def __init__(self, db: Session, provider: Provider, watermark: int | None, incremental: bool) -> None:
+        self.watermark = watermark
+        self.incremental = incremental
+        self.max_added = watermark
+        self.processed = 0
+        self.skipped = 0
+        self.known: set[int] = set()
+        if incremental:
+            self.known = set(db.execute(
+                select(VodStream.provider_stream_id).where(
+                    VodStream.provider_id == provider.id,
+                    VodStream.is_active == True,
+                )
+            ).scalars().all())
+
+    def keep(self, raw: list) -> list:
+        out = []
+        for item in raw:
+            if not isinstance(item, dict):
+                continue
+            added = _parse_int(item.get("added"))
+            if added is not None and (self.max_added is None or added > self.max_added):
+                self.max_added = added
+            if self.incremental:
+                is_new = added is not None and (self.watermark is None or added > self.watermark)
+                ext_id = _parse_int(item.get("stream_id"))
+                if not is_new and ext_id in self.known:
+                    self.skipped += 1
+                    continue
+            out.append(item)
+        self.processed += len(out)
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "watermark_before": self.watermark,
+            "watermark_after": self.max_added,
+            "processed": self.processed,
+            "skipped": self.skipped,
+        }
+
+
+def _vod_writer(deactivate_missing: bool = False, watermark: _VodWatermark | None = None) -> _CategoryWriter:
+    keep = watermark.keep if watermark is not None else None
+    if watermark is not None and watermark.incremental:
+        # sin desactivación (no se vio la categoría entera) y sin guardar hash: eso queda
+        # para el reconcile completo
+        return _CategoryWriter(
+            "vod",
+            _upsert_vod_batch,
+            lambda db, provider, cat, seen, now: _finish_vod_category(db, provider, cat, seen, now, full=False),
+            _finalize_vod,
+            keep=keep,
+            store_hash=False,
+        )
+    # sin deactivate_missing no se quitan membresías: un item que sale de su categoría
+    # queda listado ahí (como antes) en vez de quedar activo y sin ninguna
+    return _CategoryWriter(
+        "vod+deactivate" if deactivate_missing else "vod",
+        _upsert_vod_batch,
+        lambda db, provider, cat, seen, now: _finish_vod_category(
+            db, provider, cat, seen, now, full=deactivate_missing
+        ),
+        lambda db, provider, now: _finalize_vod(db, provider, now, deactivate_missing_streams=deactivate_missing),
+        keep=keep,
+    )
+
+
+INGEST_MODES = ("upsert", "copy")
+
+
+class _IngestRun:
+    """
+    Escritura de un tipo de contenido durante un sync, sobre un _CategoryWriter:
+    - ingest="upsert": INSERT ... ON CONFLICT por lote (catalog_upsert), como siempre
+    - ingest="copy": COPY a catalog_staging por lote; el merge (un statement por tipo de
+      contenido), el finish de cada categoría y los content hash quedan para complete()
+
+    Cuenta filas y segundos de escritura en DB para comparar los dos caminos (stats()).
+    """
+
+    def __init__(self, writer: _CategoryWriter, ingest: str = "upsert") -> None:
+        self.writer = writer
+        self.tag = writer.tag
+        self.ingest = ingest
+        self.run_id = uuid.uuid4() if ingest == "copy" else None
+        self.rows = 0
+        self.seconds = 0.0
+        self._finish: list[tuple[Category, set[int], datetime]] = []
+        self._hashes: list[tuple[Category, str]] = []
+
+    def hasher(self):
+        return self.writer.hasher()
+
+    def upsert(self, db: Session, provider: Provider, cat: Category, raw: list, now: datetime) -> tuple[int, set[int]]:
+        if self.writer.keep is not None:
+            raw = self.writer.keep(raw)
+        t0 = time.perf_counter()
+        if self.run_id is None:
+            changed, seen = self.writer.upsert(db, provider, cat, raw, now)
+        else:
+            changed, seen = 0, stage_items(db, self.run_id, self.writer.content_type, cat.id, raw)
+        self.seconds += time.perf_counter() - t0
+        self.rows += len(seen)
+        return changed, seen
+
+    def finish(self, db: Session, provider: Provider, cat: Category, seen: set[int], now: datetime) -> int:
+        if self.run_id is not None:
+            self._finish.append((cat, seen, now))
+            return 0
+        t0 = time.perf_counter()
+        changed = self.writer.finish(db, provider, cat, seen, now)
+        self.seconds += time.perf_counter() - t0
+        return changed
+
+    def write(self, db: Session, provider: Provider, cat: Category, raw: list) -> int:
+        now = datetime.now(timezone.utc)
+        changed, seen = self.upsert(db, provider, cat, raw, now)
+        return changed + self.finish(db, provider, cat, seen, now)
+
+    def set_hash(self, cat: Category, digest: str) -> None:
+        if not self.writer.store_hash:
+            return
+        # en modo copy el hash solo vale si el merge se commitea
+        if self.run_id is not None:
+            self._hashes.append((cat, digest))
+        else:
+            cat.content_hash = digest
+
+    def complete(self, db: Session, provider: Provider) -> Counter:
+        """
+        Modo copy: merge de todo lo staged, finish de cada categoría y hashes, en una
+        transacción (la commitea el caller). Devuelve filas cambiadas por Category.id.
+        """
+        if self.run_id is None or not (self.rows or self._finish):
+            return Counter()
+
+        t0 = time.perf_counter()
+        changes = merge_run(db, self.writer.content_type, provider.id, self.run_id)
+        for cat, seen, now in self._finish:
+            changes[cat.id] += self.writer.finish(db, provider, cat, seen, now)
+        for cat, digest in self._hashes:
+            cat.content_hash = digest
+        clear_run(db, self.run_id)
+        purge_stale_staging(db)
+        self.seconds += time.perf_counter() - t0
+        self._finish.clear()
+        self._hashes.clear()
+        return changes
+
+    def finalize(self, db: Session, provider: Provider) -> int:
+        """Pasada final del writer (después de complete). Devuelve filas cambiadas."""
+        if self.writer.finalize is None:
+            return 0
+        t0 = time.perf_counter()
+        changed = self.writer.finalize(db, provider, datetime.now(timezone.utc))
+        self.seconds += time.perf_counter() - t0
+        return changed
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.ingest,
+            "rows": self.rows,
+            "write_seconds": round(self.seconds, 3),
+            "rows_per_s": round(self.rows / self.seconds, 1) if self.seconds > 0 else None,
+        }
+
+
+def _content_hasher(tag: str):
+    return hashlib.sha256(f"{tag}\n".encode())
+
+
+def _hash_items(h, items: list) -> None:
+    # item por item (no la lista entera) para que el modo catálogo, que ve cada categoría
+    # repartida en varios lotes, llegue al mismo hash que el fetch por categoría
+    for item in items:
+        h.update(json.dumps(item, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode())
+        h.update(b"\n")
+
+
+def _write_category_hashed(
+    db: Session,
+    provider: Provider,
+    cat: Category,
+    raw: list,
+    writer: _CategoryWriter | _IngestRun,
+    force: bool = False,
+) -> tuple[int, bool]:
+    """
+    Escribe la categoría salvo que la respuesta sea idéntica a la del último sync OK.
+
+    Returns:
+        (changed, unchanged). El hash se guarda en la misma transacción que los datos,
+        así que solo queda registrado si la escritura se commitea.
+    """
+    h = writer.hasher()
+    _hash_items(h, raw)
+    digest = h.hexdigest()
+    if not force and cat.content_hash == digest:
+        return 0, True
+
+    changed = writer.write(db, provider, cat, raw)
+    writer.set_hash(cat, digest)
+    return changed, False
+
+
+FETCH_MODES = ("category", "catalog")
+
+
+def _stream_catalog(
+    db: Session,
+    provider: Provider,
+    username: str,
+    password: str,
+    action: str,
+    by_ext: dict[int, Category],
+    writer: _IngestRun,
+    now: datetime,
+    progress=None,
+) -> tuple[dict[int, dict], str | None]:
+    """
+    Una sola request sin category_id, parseada en streaming: cada lote se reparte por el
+    `category_id` de cada item, se upsertea y se commitea. Nunca hay más de un lote en
+    memoria, solo los ids vistos por categoría (para la fase finish).
+
+    Returns:
+        (estado por category_ext_id, None) o (estado parcial, motivo) si el panel rechaza,
+        devuelve algo inservible o corta a mitad de respuesta y hay que caer al modo por
+        categoría.
+    """
+    state: dict[int, dict] = {}
+    received = 0
+    try:
+        for batch in xtream_stream(provider.base_url, username, password, action):
+            received += len(batch)
+            parts: dict[int, list] = {}
+            for item in batch:
+                try:
+                    ext_id = int(item.get("category_id"))
+                except Exception:
+                    continue
+                if ext_id in by_ext:
+                    parts.setdefault(ext_id, []).append(item)
+
+            for ext_id, items in parts.items():
+                st = state.get(ext_id)
+                if st is None:
+                    st = state[ext_id] = {"count": 0, "changed": 0, "seen": set(), "hash": writer.hasher()}
+                changed, seen = writer.upsert(db, provider, by_ext[ext_id], items, now)
+                _hash_items(st["hash"], items)
+                st["count"] += len(items)
+                st["changed"] += changed
+                st["seen"] |= seen
+            db.commit()
+            if progress:
+                progress.advance(items=sum(len(items) for items in parts.values()))
+    except Exception as e:
+        db.rollback()
+        return state, f"catalog fetch failed: {e}"
+
+    if not received:
+        return state, "catalog fetch returned empty list"
+    return state, None
+
+
+def _sync_category_streams(
+    db: Session,
+    provider: Provider,
+    username: str,
+    password: str,
+    action: str,
+    cats: list[Category],
+    writer: _CategoryWriter,
+    result: dict,
+    total_key: str,
+    concurrency: int | None = None,
+    fetch_mode: str = "category",
+    force: bool = False,
+    ingest: str = "upsert",
+    progress=None,
+) -> None:
+    """
+    Pipeline de sync por categoría: el fetch corre concurrente (iter_xtream_concurrent) y
+    este loop es el writer de DB, que escribe y commitea cada categoría según va llegando.
+
+    fetch_mode="catalog" pide todo el tipo de contenido en una request que se parsea en
+    streaming (xtream_stream) y se escribe por lotes. Las categorías que no aparezcan en
+    esa respuesta (panel que trunca, o que ignora el listado completo) se piden una por
+    una como siempre; si el stream se corta a mitad, se repiten todas por categoría.
+
+    Las categorías cuya respuesta coincide con Category.content_hash (último sync OK) no se
+    escriben y salen como status="unchanged"; force=True ignora el hash. En modo catálogo
+    los lotes ya se upsertearon al llegar (sin cambios reales), así que lo que se salta es
+    la fase finish.
+
+    ingest="copy" manda los lotes a catalog_staging con COPY y hace un solo merge al final
+    (ver _IngestRun); result["ingest"] trae filas/s de escritura de cualquiera de los dos.
+
+    progress: callback opcional (sync_jobs.JobProgress) con advance(categories, items).
+    """
+    by_ext = {cat.provider_category_id: cat for cat in cats}
+    writer = _IngestRun(writer, ingest)
+    order = {ext_id: i for i, ext_id in enumerate(by_ext)}
+    details = []
+
+    def write(ext_id: int, raw, err) -> None:
+        cat = by_ext[ext_id]
+        if progress:
+            progress.advance(categories=1, items=len(raw) if isinstance(raw, list) else 0)
+        if err is not None:
+            details.append({
+                "category_ext_id": ext_id,
+                "category_name": cat.name,
+                "error": str(err),
+            })
+            return
+
+        if not isinstance(raw, list):
+            details.append({
+                "category_ext_id": ext_id,
+                "category_name": cat.name,
+                "error": "Unexpected format (expected list)",
+            })
+            return
+
+        changed, unchanged = _write_category_hashed(db, provider, cat, raw, writer, force=force)
+        db.commit()
+
+        result[total_key] += len(raw)
+        result["changed"] += changed
+        result["unchanged"] += int(unchanged)
+        details.append({
+            "category_ext_id": ext_id,
+            "category_name": cat.name,
+            "count": len(raw),
+            "changed": changed,
+            "status": "unchanged" if unchanged else "synced",
+        })
+
+    pending = list(by_ext)
+    fetch = {"mode": fetch_mode, "requests": 0, "fallback": None}
+
+    if fetch_mode == "catalog" and pending:
+        now = datetime.now(timezone.utc)
+        state, fallback = _stream_catalog(
+            db, provider, username, password, action, by_ext, writer, now, progress=progress
+        )
+        fetch["requests"] += 1
+        if fallback is not None:
+            # lo ya upserteado queda; las categorías se rehacen completas por categoría
+            fetch["fallback"] = fallback
         else:
-            db.add(Category(
-                provider_id=provider.id,
-                cat_type=cat_type,
-                provider_category_id=ext_id,
-                name=name,
-                is_active=True,
-                updated_at=datetime.now(timezone.utc),
-            ))
-            changed += 1
-
-    # desactiva las que ya no vienen
-    existing_all = db.execute(
-        select(Category).where(Category.provider_id == provider.id, Category.cat_type == cat_type)
-    ).scalars().all()
-
-    for c in existing_all:
-        if c.provider_category_id not in seen and c.is_active:
-            c.is_active = False
-            c.updated_at = datetime.now(timezone.utc)
-            changed += 1
-
-    return changed
+            for ext_id, st in state.items():
+                cat = by_ext[ext_id]
+                digest = st["hash"].hexdigest()
+                # si algún upsert tocó filas, la DB no estaba como el último sync: finish completo
+                unchanged = not force and not st["changed"] and cat.content_hash == digest
+                changed = st["changed"]
+                if not unchanged:
+                    changed += writer.finish(db, provider, cat, st["seen"], now)
+                    writer.set_hash(cat, digest)
+                db.commit()
+
+                result[total_key] += st["count"]
+                result["changed"] += changed
+                result["unchanged"] += int(unchanged)
+                if progress:
+                    progress.advance(categories=1)
+                details.append({
+                    "category_ext_id": ext_id,
+                    "category_name": cat.name,
+                    "count": st["count"],
+                    "changed": changed,
+                    "status": "unchanged" if unchanged else "synced",
+                })
+            pending = [ext_id for ext_id in pending if ext_id not in state]
+            if pending:
+                fetch["fallback"] = f"{len(pending)} categories missing from catalog response"
+
+    fetched = iter_xtream_concurrent(
+        provider.base_url,
+        username,
+        password,
+        action,
+        "category_id",
+        pending,
+        concurrency=concurrency,
+    )
+    for ext_id, raw, err in fetched:
+        write(ext_id, raw, err)
+    fetch["requests"] += len(pending)
+
+    merged = writer.complete(db, provider)
+    db.commit()
+    if merged:
+        # el merge devuelve la categoría principal de cada fila, que puede no ser del run
+        result["changed"] += sum(merged.values())
+        for d in details:
+            extra = merged.get(by_ext[d["category_ext_id"]].id, 0)
+            if extra and "changed" in d:
+                d["changed"] += extra
+
+    # solo si se leyó todo: un item que se movió a una categoría que falló quedaría huérfano,
+    # y nunca sin categorías: una lista vacía del panel no puede vaciar el catálogo
+    failed = any("error" in d for d in details)
+    if not failed and by_ext:
+        finalized = writer.finalize(db, provider)
+        db.commit()
+        result["changed"] += finalized
+
+    # llegan en orden de respuesta; se reportan en el orden de siempre (por nombre)
+    details.sort(key=lambda d: order[d["category_ext_id"]])
+    result["details"].extend(details)
+    result["fetch"] = fetch
+    result["ingest"] = writer.stats()
 
 
 def _sync_vod_streams_for_provider(
@@ -232,7 +769,18 @@ def _sync_vod_streams_for_provider(
     provider: Provider,
     include_inactive_categories: bool = True,
     deactivate_missing: bool = False,
+    concurrency: int | None = None,
+    fetch_mode: str = "category",
+    force: bool = False,
+    ingest: str = "upsert",
+    vod_mode: str = "full",
+    progress=None,
 ) -> dict:
+    """
+    vod_mode: "full" (todo el catálogo, con finish y content hash), "incremental" (solo
+    items con `added` > watermark o que no están en la DB) o "auto" (incremental salvo
+    que toque el reconcile completo, ver VOD_FULL_RECONCILE_HOURS).
+    """
     started = datetime.now(timezone.utc)
     username, password = _get_sync_credentials(db, provider)
 
@@ -242,12 +790,13 @@ def _sync_vod_streams_for_provider(
             _sync_one_category_set(db, provider, "vod", vod_cats)
             db.commit()
     except Exception:
-        pass
+        db.rollback()
 
     result = {
         "categories": 0,
         "total_streams": 0,
         "changed": 0,
+        "unchanged": 0,
         "details": [],
         "started_at": started.isoformat() + "Z",
         "finished_at": None,
@@ -255,6 +804,11 @@ def _sync_vod_streams_for_provider(
         "deactivate_missing": deactivate_missing,
     }
 
+    cfg = get_or_create_provider_auto_sync(db, provider.id)
+    mode = resolve_vod_mode(cfg, vod_mode)
+    watermark = _VodWatermark(db, provider, cfg.vod_added_watermark, incremental=mode == "incremental")
+    result["vod_mode"] = mode
+
     q = select(Category).where(
         Category.provider_id == provider.id,
         Category.cat_type == "vod",
@@ -264,184 +818,29 @@ def _sync_vod_streams_for_provider(
 
     cats = db.execute(q.order_by(Category.name.asc())).scalars().all()
     result["categories"] = len(cats)
+    if progress:
+        progress.phase("vod", len(cats))
+
+    _sync_category_streams(
+        db, provider, username, password,
+        "get_vod_streams",
+        cats,
+        _vod_writer(deactivate_missing, watermark),
+        result,
+        "total_streams",
+        concurrency=concurrency,
+        fetch_mode=fetch_mode,
+        force=force,
+        ingest=ingest,
+        progress=progress,
+    )
 
-    for cat in cats:
-        try:
-            raw = xtream_get(
-                provider.base_url,
-                username,
-                password,
-                "get_vod_streams",
-                timeout=120.0,
-                category_id=cat.provider_category_id,
-            )
-        except Exception as e:
-            result["details"].append({
-                "category_ext_id": cat.provider_category_id,
-                "category_name": cat.name,
-                "error": str(e),
-            })
-            continue
-
-        if not isinstance(raw, list):
-            result["details"].append({
-                "category_ext_id": cat.provider_category_id,
-                "category_name": cat.name,
-                "error": "Unexpected format (expected list)",
-            })
-            continue
-
-        seen = set()
-        changed = 0
-        now = datetime.now(timezone.utc)
-
-        def _parse_tmdb_id(raw_value) -> int | None:
-            try:
-                parsed = int(raw_value)
-            except Exception:
-                return None
-            return parsed if parsed > 0 else None
-
-        def _copy_tmdb_fields(target: VodStream, source: VodStream) -> None:
-            target.tmdb_id = source.tmdb_id
-            target.tmdb_status = source.tmdb_status
-            target.tmdb_last_sync = source.tmdb_last_sync
-            target.tmdb_error = None
-            target.tmdb_title = source.tmdb_title
-            target.tmdb_overview = source.tmdb_overview
-            target.tmdb_release_date = source.tmdb_release_date
-            target.tmdb_genres = source.tmdb_genres
-            target.tmdb_vote_average = source.tmdb_vote_average
-            target.tmdb_poster_path = source.tmdb_poster_path
-            target.tmdb_backdrop_path = source.tmdb_backdrop_path
-            target.tmdb_raw = source.tmdb_raw
-
-        for item in raw:
-            try:
-                ext_stream_id = int(item.get("stream_id"))
-            except Exception:
-                continue
-
-            name = (item.get("name") or "").strip() or f"VOD {ext_stream_id}"
-            icon = item.get("stream_icon") or None
-            container_ext = (item.get("container_extension") or None)
-            rating = (item.get("rating") or None)
-            added = (item.get("added") or None)
-            tmdb_id = _parse_tmdb_id(item.get("tmdb_id") or item.get("tmdb"))
-
-            seen.add(ext_stream_id)
-
-            existing = db.execute(
-                select(VodStream)
-                .where(
-                    VodStream.provider_id == provider.id,
-                    VodStream.provider_stream_id == ext_stream_id,
-                )
-                .order_by(VodStream.created_at.desc(), VodStream.id.desc())
-            ).scalars().all()
-
-            if not existing and tmdb_id is not None:
-                existing = db.execute(
-                    select(VodStream)
-                    .where(VodStream.provider_id == provider.id, VodStream.tmdb_id == tmdb_id)
-                    .order_by(VodStream.created_at.desc(), VodStream.id.desc())
-                ).scalars().all()
-
-            if existing:
-                current = existing[0]
-                if (
-                    current.name != name
-                    or current.stream_icon != icon
-                    or current.category_id != cat.id
-                    or current.container_extension != container_ext
-                    or current.rating != rating
-                    or current.added != added
-                    or current.provider_stream_id != ext_stream_id
-                    or current.is_active is False
-                ):
-                    current.name = name
-                    current.stream_icon = icon
-                    current.category_id = cat.id
-                    current.container_extension = container_ext
-                    current.rating = rating
-                    current.added = added
-                    current.provider_stream_id = ext_stream_id
-                    current.is_active = True
-                    current.updated_at = now
-                    changed += 1
-            else:
-                db.add(VodStream(
-                    provider_id=provider.id,
-                    category_id=cat.id,
-                    provider_stream_id=ext_stream_id,
-                    name=name,
-                    stream_icon=icon,
-                    container_extension=container_ext,
-                    rating=rating,
-                    added=added,
-                    is_active=True,
-                    updated_at=now,
-                ))
-                changed += 1
-
-        if deactivate_missing:
-            existing_in_cat = db.execute(
-                select(VodStream).where(
-                    VodStream.provider_id == provider.id,
-                    VodStream.category_id == cat.id,
-                    VodStream.is_active == True,
-                )
-            ).scalars().all()
-
-            for s in existing_in_cat:
-                if s.provider_stream_id not in seen:
-                    s.is_active = False
-                    s.updated_at = now
-                    changed += 1
-
-        if seen:
-            dup_rows = db.execute(
-                select(VodStream)
-                .where(
-                    VodStream.provider_id == provider.id,
-                    VodStream.provider_stream_id.in_(seen),
-                )
-                .order_by(
-                    VodStream.provider_stream_id.asc(),
-                    VodStream.created_at.desc(),
-                    VodStream.id.desc(),
-                )
-            ).scalars().all()
-
-            grouped: dict[int, list[VodStream]] = {}
-            for row in dup_rows:
-                grouped.setdefault(row.provider_stream_id, []).append(row)
-
-            for stream_id, group in grouped.items():
-                if len(group) < 2:
-                    continue
-                winner = group[0]
-                synced_donor = next((item for item in group if item.tmdb_status == "synced"), None)
-                if winner.tmdb_status != "synced" and synced_donor:
-                    _copy_tmdb_fields(winner, synced_donor)
-                    winner.tmdb_status = "synced"
-                    winner.tmdb_error = None
-                    winner.updated_at = now
-                    changed += 1
-                for dup in group[1:]:
-                    db.delete(dup)
-                    changed += 1
-
-        db.commit()
-
-        result["total_streams"] += len(raw)
-        result["changed"] += changed
-        result["details"].append({
-            "category_ext_id": cat.provider_category_id,
-            "category_name": cat.name,
-            "count": len(raw),
-            "changed": changed,
-        })
+    result["watermark"] = watermark.stats()
+    cfg.vod_added_watermark = watermark.max_added
+    if mode == "full" and not any("error" in d for d in result["details"]):
+        cfg.vod_full_reconcile_at = started
+    cfg.updated_at = datetime.now(timezone.utc)
+    db.commit()
 
     finished = datetime.now(timezone.utc)
     result["finished_at"] = finished.isoformat() + "Z"
@@ -453,6 +852,11 @@ def _sync_series_items_for_provider(
     db: Session,
     provider: Provider,
     include_inactive_categories: bool = True,
+    concurrency: int | None = None,
+    fetch_mode: str = "category",
+    force: bool = False,
+    ingest: str = "upsert",
+    progress=None,
 ) -> dict:
     started = datetime.now(timezone.utc)
     username, password = _get_sync_credentials(db, provider)
@@ -463,12 +867,13 @@ def _sync_series_items_for_provider(
             _sync_one_category_set(db, provider, "series", series_cats)
             db.commit()
     except Exception:
-        pass
+        db.rollback()
 
     result = {
         "categories": 0,
         "total_items": 0,
         "changed": 0,
+        "unchanged": 0,
         "details": [],
         "started_at": started.isoformat() + "Z",
         "finished_at": None,
@@ -484,103 +889,22 @@ def _sync_series_items_for_provider(
 
     cats = db.execute(q.order_by(Category.name.asc())).scalars().all()
     result["categories"] = len(cats)
-
-    for cat in cats:
-        try:
-            raw = xtream_get(
-                provider.base_url,
-                username,
-                password,
-                "get_series",
-                category_id=cat.provider_category_id,
-            )
-        except Exception as e:
-            result["details"].append({
-                "category_ext_id": cat.provider_category_id,
-                "category_name": cat.name,
-                "error": str(e),
-            })
-            continue
-
-        if not isinstance(raw, list):
-            result["details"].append({
-                "category_ext_id": cat.provider_category_id,
-                "category_name": cat.name,
-                "error": "Unexpected format (expected list)",
-            })
-            continue
-
-        seen = set()
-        changed = 0
-        now = datetime.now(timezone.utc)
-
-        for item in raw:
-            try:
-                ext_id = int(item.get("series_id"))
-            except Exception:
-                continue
-
-            name = (item.get("name") or "").strip() or f"Series {ext_id}"
-            cover = item.get("cover") or item.get("stream_icon") or None
-
-            seen.add(ext_id)
-
-            existing = db.execute(
-                select(SeriesItem).where(
-                    SeriesItem.provider_id == provider.id,
-                    SeriesItem.provider_series_id == ext_id,
-                )
-            ).scalar_one_or_none()
-
-            if existing:
-                if (
-                    existing.name != name
-                    or existing.cover != cover
-                    or existing.category_id != cat.id
-                    or existing.is_active is False
-                ):
-                    existing.name = name
-                    existing.cover = cover
-                    existing.category_id = cat.id
-                    existing.is_active = True
-                    existing.updated_at = now
-                    changed += 1
-            else:
-                db.add(SeriesItem(
-                    provider_id=provider.id,
-                    category_id=cat.id,
-                    provider_series_id=ext_id,
-                    name=name,
-                    cover=cover,
-                    is_active=True,
-                    updated_at=now,
-                ))
-                changed += 1
-
-        existing_in_cat = db.execute(
-            select(SeriesItem).where(
-                SeriesItem.provider_id == provider.id,
-                SeriesItem.category_id == cat.id,
-                SeriesItem.is_active == True,
-            )
-        ).scalars().all()
-
-        for s in existing_in_cat:
-            if s.provider_series_id not in seen:
-                s.is_active = False
-                s.updated_at = now
-                changed += 1
-
-        db.commit()
-
-        result["total_items"] += len(raw)
-        result["changed"] += changed
-        result["details"].append({
-            "category_ext_id": cat.provider_category_id,
-            "category_name": cat.name,
-            "count": len(raw),
-            "changed": changed,
-        })
+    if progress:
+        progress.phase("series", len(cats))
+
+    _sync_category_streams(
+        db, provider, username, password,
+        "get_series",
+        cats,
+        SERIES_WRITER,
+        result,
+        "total_items",
+        concurrency=concurrency,
+        fetch_mode=fetch_mode,
+        force=force,
+        ingest=ingest,
+        progress=progress,
+    )
 
     finished = datetime.now(timezone.utc)
     result["finished_at"] = finished.isoformat() + "Z"
@@ -674,83 +998,54 @@ def sync_live_streams(provider_id: str, category_ext_id: int, db: Session = Depe
     if not isinstance(raw, list):
         raise HTTPException(status_code=400, detail="Xtream returned unexpected data format (expected list)")
 
-    seen = set()
-    changed = 0
+    changed, _ = _write_category_hashed(db, p, cat, raw, LIVE_WRITER, force=True)
+    changed += LIVE_WRITER.finalize(db, p, datetime.now(timezone.utc))
 
-    for item in raw:
-        ext_stream_id = int(item.get("stream_id"))
-        name = (item.get("name") or "").strip() or f"Live {ext_stream_id}"
-        icon = (item.get("stream_icon") or None)
-        seen.add(ext_stream_id)
+    db.commit()
+    return {"ok": True, "provider_id": provider_id, "category_ext_id": category_ext_id, "count": len(raw), "changed": changed}
 
-        existing = db.execute(
-            select(LiveStream).where(
-                LiveStream.provider_id == p.id,
-                LiveStream.provider_stream_id == ext_stream_id,
-            )
-        ).scalar_one_or_none()
+def _count_categories(db: Session, provider: Provider, cat_type: str, include_inactive_categories: bool) -> int:
+    q = select(func.count(Category.id)).where(
+        Category.provider_id == provider.id,
+        Category.cat_type == cat_type,
+    )
+    if not include_inactive_categories:
+        q = q.where(Category.is_active == True)
+    return int(db.execute(q).scalar() or 0)
 
-        now = datetime.now(timezone.utc)
 
-        if existing:
-            # update si cambió o si estaba inactive
-            if (
-                existing.name != name
-                or existing.stream_icon != icon
-                or existing.category_id != cat.id
-                or existing.is_active is False
-            ):
-                existing.name = name
-                existing.stream_icon = icon
-                existing.category_id = cat.id
-                existing.is_active = True
-                existing.updated_at = now
-                changed += 1
-        else:
-            db.add(LiveStream(
-                provider_id=p.id,
-                category_id=cat.id,
-                provider_stream_id=ext_stream_id,
-                name=name,
-                stream_icon=icon,
-                is_active=True,
-                updated_at=now,
-            ))
-            changed += 1
-
-    # desactiva los que ya no aparecen en ESTA categoría
-    existing_in_cat = db.execute(
-        select(LiveStream).where(
-            LiveStream.provider_id == p.id,
-            LiveStream.category_id == cat.id,
-            LiveStream.is_active == True,
-        )
-    ).scalars().all()
+def _enqueue_sync(db: Session, kind: str, provider_id: str, params: dict) -> dict:
+    p = db.get(Provider, provider_id)
+    if not p:
+        raise HTTPException(status_code=404, detail="Provider not found")
+    # falla rápido (400) en vez de encolar un job que va a fallar
+    _get_sync_credentials(db, p)
 
-    now = datetime.now(timezone.utc)
-    for s in existing_in_cat:
-        if s.provider_stream_id not in seen:
-            s.is_active = False
-            s.updated_at = now
-            changed += 1
+    job, created = enqueue_sync_job(db, kind, p.id, params)
+    return {
+        "ok": True,
+        "provider_id": provider_id,
+        "job_id": str(job.id),
+        "status": job.status,
+        "created": created,
+    }
 
-    db.commit()
-    return {"ok": True, "provider_id": provider_id, "category_ext_id": category_ext_id, "count": len(raw), "changed": changed}
 
-@router.post("/{provider_id}/sync/all")
-def sync_all(
+def run_sync_all(
+    db: Session,
     provider_id: str,
     live: bool = True,
     vod: bool = True,
     series: bool = True,
     include_inactive_categories: bool = False,
-    db: Session = Depends(get_db),
-):
-    """
-    One-click sync:
-    - (asume que YA tienes categories sincronizadas)
-    - recorre todas las categories y hace sync de streams/items
-    """
+    concurrency: int | None = None,
+    fetch_mode: str = "category",
+    force: bool = False,
+    ingest: str = "upsert",
+    vod_mode: str = "full",
+    progress=None,
+) -> dict:
+    """Cuerpo de sync/all. Lo usan el worker de jobs, background=false y el auto-sync."""
     p = db.get(Provider, provider_id)
     if not p:
         raise HTTPException(status_code=404, detail="Provider not found")
@@ -761,14 +1056,21 @@ def sync_all(
     result = {
         "ok": True,
         "provider_id": provider_id,
-        "live": {"categories": 0, "total_streams": 0, "changed": 0, "details": []},
-        "vod": {"categories": 0, "total_streams": 0, "changed": 0, "details": []},
-        "series": {"categories": 0, "total_items": 0, "changed": 0, "details": []},
+        "live": {"categories": 0, "total_streams": 0, "changed": 0, "unchanged": 0, "details": []},
+        "vod": {"categories": 0, "total_streams": 0, "changed": 0, "unchanged": 0, "details": []},
+        "series": {"categories": 0, "total_items": 0, "changed": 0, "unchanged": 0, "details": []},
         "started_at": started.isoformat() + "Z",
         "finished_at": None,
         "seconds": None,
     }
 
+    if progress:
+        progress.plan({
+            cat_type: _count_categories(db, p, cat_type, include_inactive_categories)
+            for cat_type, enabled in (("live", live), ("vod", vod), ("series", series))
+            if enabled
+        })
+
     if live:
         q = select(Category).where(
             Category.provider_id == p.id,
@@ -779,94 +1081,22 @@ def sync_all(
 
         cats = db.execute(q.order_by(Category.name.asc())).scalars().all()
         result["live"]["categories"] = len(cats)
-
-        for cat in cats:
-            raw = xtream_get(
-                p.base_url, username, password,
-                "get_live_streams",
-                category_id=cat.provider_category_id
-            )
-
-            if not isinstance(raw, list):
-                result["live"]["details"].append({
-                    "category_ext_id": cat.provider_category_id,
-                    "category_name": cat.name,
-                    "error": "Unexpected format (expected list)",
-                })
-                continue
-
-            seen = set()
-            changed = 0
-
-            for item in raw:
-                try:
-                    ext_stream_id = int(item.get("stream_id"))
-                except Exception:
-                    continue
-
-                name = (item.get("name") or "").strip() or f"Live {ext_stream_id}"
-                icon = item.get("stream_icon") or None
-                seen.add(ext_stream_id)
-
-                existing = db.execute(
-                    select(LiveStream).where(
-                        LiveStream.provider_id == p.id,
-                        LiveStream.provider_stream_id == ext_stream_id,
-                    )
-                ).scalar_one_or_none()
-
-                now = datetime.now(timezone.utc)
-
-                if existing:
-                    if (
-                        existing.name != name
-                        or existing.stream_icon != icon
-                        or existing.category_id != cat.id
-                        or existing.is_active is False
-                    ):
-                        existing.name = name
-                        existing.stream_icon = icon
-                        existing.category_id = cat.id
-                        existing.is_active = True
-                        existing.updated_at = now
-                        changed += 1
-                else:
-                    db.add(LiveStream(
-                        provider_id=p.id,
-                        category_id=cat.id,
-                        provider_stream_id=ext_stream_id,
-                        name=name,
-                        stream_icon=icon,
-                        is_active=True,
-                        updated_at=now,
-                    ))
-                    changed += 1
-
-            existing_in_cat = db.execute(
-                select(LiveStream).where(
-                    LiveStream.provider_id == p.id,
-                    LiveStream.category_id == cat.id,
-                    LiveStream.is_active == True,
-                )
-            ).scalars().all()
-
-            now = datetime.now(timezone.utc)
-            for s in existing_in_cat:
-                if s.provider_stream_id not in seen:
-                    s.is_active = False
-                    s.updated_at = now
-                    changed += 1
-
-            db.commit()
-
-            result["live"]["total_streams"] += len(raw)
-            result["live"]["changed"] += changed
-            result["live"]["details"].append({
-                "category_ext_id": cat.provider_category_id,
-                "category_name": cat.name,
-                "count": len(raw),
-                "changed": changed,
-            })
+        if progress:
+            progress.phase("live", len(cats))
+
+        _sync_category_streams(
+            db, p, username, password,
+            "get_live_streams",
+            cats,
+            LIVE_WRITER,
+            result["live"],
+            "total_streams",
+            concurrency=concurrency,
+            fetch_mode=fetch_mode,
+            force=force,
+            ingest=ingest,
+            progress=progress,
+        )
 
     if vod:
         vod_result = _sync_vod_streams_for_provider(
@@ -874,12 +1104,23 @@ def sync_all(
             p,
             include_inactive_categories=include_inactive_categories,
             deactivate_missing=False,
+            concurrency=concurrency,
+            fetch_mode=fetch_mode,
+            force=force,
+            ingest=ingest,
+            vod_mode=vod_mode,
+            progress=progress,
         )
         result["vod"] = {
             "categories": vod_result["categories"],
             "total_streams": vod_result["total_streams"],
             "changed": vod_result["changed"],
+            "unchanged": vod_result["unchanged"],
             "details": vod_result["details"],
+            "fetch": vod_result.get("fetch"),
+            "ingest": vod_result.get("ingest"),
+            "vod_mode": vod_result.get("vod_mode"),
+            "watermark": vod_result.get("watermark"),
         }
 
     if series:
@@ -887,12 +1128,20 @@ def sync_all(
             db,
             p,
             include_inactive_categories=include_inactive_categories,
+            concurrency=concurrency,
+            fetch_mode=fetch_mode,
+            force=force,
+            ingest=ingest,
+            progress=progress,
         )
         result["series"] = {
             "categories": series_result["categories"],
             "total_items": series_result["total_items"],
             "changed": series_result["changed"],
+            "unchanged": series_result["unchanged"],
             "details": series_result["details"],
+            "fetch": series_result.get("fetch"),
+            "ingest": series_result.get("ingest"),
         }
 
     finished = datetime.now(timezone.utc)
@@ -900,22 +1149,90 @@ def sync_all(
     result["seconds"] = (finished - started).total_seconds()
     return result
 
-@router.post("/{provider_id}/sync/vod_streams")
-def sync_provider_vod_streams(
+
+@router.post("/{provider_id}/sync/all")
+def sync_all(
     provider_id: str,
-    include_inactive_categories: bool = True,   # ✅ default: incluir todas
-    deactivate_missing: bool = False,            # ✅ default: NO apagar nada
+    live: bool = True,
+    vod: bool = True,
+    series: bool = True,
+    include_inactive_categories: bool = False,
+    concurrency: int | None = None,
+    fetch_mode: str = "category",
+    force: bool = False,
+    ingest: str = "upsert",
+    vod_mode: str = "full",
+    background: bool = True,
     db: Session = Depends(get_db),
 ):
+    """
+    One-click sync:
+    - (asume que YA tienes categories sincronizadas)
+    - recorre todas las categories y hace sync de streams/items
+
+    concurrency: categorías pedidas en paralelo al panel (default XTREAM_FETCH_CONCURRENCY,
+    con tope XTREAM_MAX_CONCURRENCY_PER_PROVIDER).
+    fetch_mode: "category" (una request por categoría) o "catalog" (una request por tipo de
+    contenido, con fallback automático por categoría).
+    force: re-escribe también las categorías cuyo content hash no cambió.
+    ingest: "upsert" (INSERT ... ON CONFLICT por lote) o "copy" (COPY a una tabla UNLOGGED
+    de staging + un merge por tipo de contenido). Cada resultado trae ingest.rows_per_s.
+    vod_mode: "full", "incremental" (watermark de `added`) o "auto" (incremental con
+    reconcile completo cada VOD_FULL_RECONCILE_HOURS).
+    background: (default) encola un job y devuelve job_id al toque; el progreso se
+    consulta en GET /jobs/{job_id}. background=false corre el sync dentro del request.
+    """
+    if fetch_mode not in FETCH_MODES:
+        raise HTTPException(status_code=400, detail=f"fetch_mode must be one of {', '.join(FETCH_MODES)}")
+    if ingest not in INGEST_MODES:
+        raise HTTPException(status_code=400, detail=f"ingest must be one of {', '.join(INGEST_MODES)}")
+    if vod_mode not in VOD_MODES:
+        raise HTTPException(status_code=400, detail=f"vod_mode must be one of {', '.join(VOD_MODES)}")
+
+    params = {
+        "live": live,
+        "vod": vod,
+        "series": series,
+        "include_inactive_categories": include_inactive_categories,
+        "concurrency": concurrency,
+        "fetch_mode": fetch_mode,
+        "force": force,
+        "ingest": ingest,
+        "vod_mode": vod_mode,
+    }
+    if background:
+        return _enqueue_sync(db, "sync_all", provider_id, params)
+    return run_sync_all(db, provider_id, **params)
+
+
+def run_sync_vod_streams(
+    db: Session,
+    provider_id: str,
+    include_inactive_categories: bool = True,
+    deactivate_missing: bool = False,
+    concurrency: int | None = None,
+    force: bool = False,
+    ingest: str = "upsert",
+    vod_mode: str = "full",
+    progress=None,
+) -> dict:
     p = db.get(Provider, provider_id)
     if not p:
         raise HTTPException(status_code=404, detail="Provider not found")
 
+    if progress:
+        progress.plan({"vod": _count_categories(db, p, "vod", include_inactive_categories)})
+
     vod_result = _sync_vod_streams_for_provider(
         db,
         p,
         include_inactive_categories=include_inactive_categories,
         deactivate_missing=deactivate_missing,
+        concurrency=concurrency,
+        force=force,
+        ingest=ingest,
+        vod_mode=vod_mode,
+        progress=progress,
     )
 
     return {
@@ -925,7 +1242,11 @@ def sync_provider_vod_streams(
             "categories": vod_result["categories"],
             "total_streams": vod_result["total_streams"],
             "changed": vod_result["changed"],
+            "unchanged": vod_result["unchanged"],
             "details": vod_result["details"],
+            "ingest": vod_result.get("ingest"),
+            "vod_mode": vod_result.get("vod_mode"),
+            "watermark": vod_result.get("watermark"),
         },
         "started_at": vod_result["started_at"],
         "finished_at": vod_result["finished_at"],
@@ -934,6 +1255,36 @@ def sync_provider_vod_streams(
     }
 
 
+@router.post("/{provider_id}/sync/vod_streams")
+def sync_provider_vod_streams(
+    provider_id: str,
+    include_inactive_categories: bool = True,   # ✅ default: incluir todas
+    deactivate_missing: bool = False,            # ✅ default: NO apagar nada
+    concurrency: int | None = None,
+    force: bool = False,
+    ingest: str = "upsert",
+    vod_mode: str = "full",
+    background: bool = True,
+    db: Session = Depends(get_db),
+):
+    if ingest not in INGEST_MODES:
+        raise HTTPException(status_code=400, detail=f"ingest must be one of {', '.join(INGEST_MODES)}")
+    if vod_mode not in VOD_MODES:
+        raise HTTPException(status_code=400, detail=f"vod_mode must be one of {', '.join(VOD_MODES)}")
+
+    params = {
+        "include_inactive_categories": include_inactive_categories,
+        "deactivate_missing": deactivate_missing,
+        "concurrency": concurrency,
+        "force": force,
+        "ingest": ingest,
+        "vod_mode": vod_mode,
+    }
+    if background:
+        return _enqueue_sync(db, "sync_vod_streams", provider_id, params)
+    return run_sync_vod_streams(db, provider_id, **params)
+
+
 @router.post("/{provider_id}/sync/series_items")
 def sync_series_items(provider_id: str, category_ext_id: int, db: Session = Depends(get_db)):
     p = db.get(Provider, provider_id)
@@ -960,65 +1311,8 @@ def sync_series_items(provider_id: str, category_ext_id: int, db: Session = Depe
     if not isinstance(raw, list):
         raise HTTPException(status_code=400, detail="Xtream returned unexpected data format (expected list)")
 
-    seen = set()
-    changed = 0
-    now = datetime.now(timezone.utc)
-
-    for item in raw:
-        # series_id es lo normal; algunos panels mandan "series_id" como string
-        try:
-            ext_id = int(item.get("series_id"))
-        except Exception:
-            continue
-
-        name = (item.get("name") or "").strip() or f"Series {ext_id}"
-        cover = item.get("cover") or item.get("stream_icon") or None
-
-        seen.add(ext_id)
-
-        existing = db.execute(
-            select(SeriesItem).where(SeriesItem.provider_id == p.id, SeriesItem.provider_series_id == ext_id)
-        ).scalar_one_or_none()
-
-        if existing:
-            if (
-                existing.name != name
-                or existing.cover != cover
-                or existing.category_id != cat.id
-                or existing.is_active is False
-            ):
-                existing.name = name
-                existing.cover = cover
-                existing.category_id = cat.id
-                existing.is_active = True
-                existing.updated_at = now
-                changed += 1
-        else:
-            db.add(SeriesItem(
-                provider_id=p.id,
-                category_id=cat.id,
-                provider_series_id=ext_id,
-                name=name,
-                cover=cover,
-                is_active=True,
-                updated_at=now,
-            ))
-            changed += 1
-
-    # desactiva los que ya no vienen en ESTA categoría
-    existing_in_cat = db.execute(
-        select(SeriesItem).where(
-            SeriesItem.provider_id == p.id,
-            SeriesItem.category_id == cat.id,
-            SeriesItem.is_active == True,
-        )
-    ).scalars().all()
-
-    for s in existing_in_cat:
-        if s.provider_series_id not in seen:
-            s.is_active = False
-            s.updated_at = now
-            changed += 1
+    changed, _ = _write_category_hashed(db, p, cat, raw, SERIES_WRITER, force=True)
+    changed += SERIES_WRITER.finalize(db, p, datetime.now(timezone.utc))
 
     db.commit()
     return {"ok": True, "provider_id": provider_id, "category_ext_id": category_ext_id, "count": len(raw), "changed": changed}
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import select, func, or_
 from app.deps import get_db
-from app.models import Provider, Category, SeriesItem, Season, Episode, ProviderUser
+from app.models import Provider, Category, SeriesItem, Season, Episode, ProviderUser, SeriesItemCategory
 from app.schemas import SeriesItemUpdate
 from app.xtream_client import xtream_get
 from sqlalchemy.exc import IntegrityError
@@ -136,7 +136,10 @@ def list_series(
         ).scalar_one_or_none()
         if not cat:
             raise HTTPException(status_code=404, detail="Category not found for this provider")
-        stmt = stmt.where(SeriesItem.category_id == cat.id)
+        # por membresía: el item puede estar en varias categorías del panel
+        stmt = stmt.where(SeriesItem.id.in_(
+            select(SeriesItemCategory.series_item_id).where(SeriesItemCategory.category_id == cat.id)
+        ))
 
     if q:
         qq = f"%{q.strip()}%"
@@ -41,6 +41,8 @@ def get_provider_auto_sync_config(provider_id: str | None = None, db: Session =
         provider_id=cfg.provider_id,
         interval_minutes=cfg.interval_minutes,
         last_run_at=cfg.last_run_at,
+        vod_added_watermark=cfg.vod_added_watermark,
+        vod_full_reconcile_at=cfg.vod_full_reconcile_at,
     )
 
 
@@ -61,4 +63,6 @@ def update_provider_auto_sync_config(
         provider_id=cfg.provider_id,
         interval_minutes=cfg.interval_minutes,
         last_run_at=cfg.last_run_at,
+        vod_added_watermark=cfg.vod_added_watermark,
+        vod_full_reconcile_at=cfg.vod_full_reconcile_at,
     )
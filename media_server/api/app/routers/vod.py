@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select, func, or_
 
 from app.deps import get_db
-from app.models import Provider, Category, VodStream, ProviderUser
+from app.models import Provider, Category, VodStream, ProviderUser, VodStreamCategory
 from app.schemas import VodStreamUpdate
 from app.xtream_client import xtream_get
 
@@ -116,7 +116,10 @@ def list_vod(
         ).scalar_one_or_none()
         if not cat:
             raise HTTPException(status_code=404, detail="Category not found for this provider")
-        stmt = stmt.where(VodStream.category_id == cat.id)
+        # por membresía: el item puede estar en varias categorías del panel
+        stmt = stmt.where(VodStream.id.in_(
+            select(VodStreamCategory.stream_id).where(VodStreamCategory.category_id == cat.id)
+        ))
 
     if q:
         qq = f"%{q.strip()}%"
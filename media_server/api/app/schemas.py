@@ -1,7 +1,7 @@
 from datetime import datetime
 from pydantic import BaseModel, HttpUrl, Field
 from uuid import UUID
-from typing import Optional
+from typing import Literal, Optional
 
 
 class ProviderCreate(BaseModel):
@@ -79,12 +79,23 @@ class LiveStreamUpdate(BaseModel):
 class EpgSourceCreate(BaseModel):
     name: str = Field(min_length=1, max_length=120)
     xmltv_url: HttpUrl
+    ingest_filter: Literal["all", "mapped"] = "all"
+    ingest_allow_list: list[str] | None = None
+
+class EpgSourceUpdate(BaseModel):
+    name: str | None = Field(default=None, min_length=1, max_length=120)
+    xmltv_url: HttpUrl | None = None
+    is_active: bool | None = None
+    ingest_filter: Literal["all", "mapped"] | None = None
+    ingest_allow_list: list[str] | None = None
 
 class EpgSourceOut(BaseModel):
     id: UUID
     name: str
     xmltv_url: str
     is_active: bool
+    ingest_filter: str = "all"
+    ingest_allow_list: list[str] | None = None
 
     class Config:
         from_attributes = True
@@ -125,6 +136,8 @@ class ProviderAutoSyncConfigOut(BaseModel):
     provider_id: UUID
     interval_minutes: int
     last_run_at: datetime | None = None
+    vod_added_watermark: int | None = None
+    vod_full_reconcile_at: datetime | None = None
 
 
 class ProviderAutoSyncConfigUpdate(BaseModel):
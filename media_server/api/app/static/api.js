@@ -94,6 +94,10 @@ export const api = {
     saveAutoSync: (id, payload) => req(`/providers/${id}/auto-sync`, { method:"PATCH", body: payload }),
   },
 
+  jobs: {
+    get: (id) => req(`/jobs/${id}`),
+  },
+
   epg: {
     sources: () => req("/epg/sources"),
     createSource: (payload) => req("/epg/sources", { method:"POST", body: payload }),
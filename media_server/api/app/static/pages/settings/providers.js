@@ -55,8 +55,24 @@ export function ProvidersTab(appState) {
                 button("Sync", { tone:"blue", small:true, onClick: async ()=>{
                 status.textContent = "Sincronizando…";
                 try {
-                  const r = await api.providers.syncAll(p.id);
-                  status.textContent = `Sync OK (${Math.round(r.seconds)}s)`;
+                  const { job_id } = await api.providers.syncAll(p.id);
+                  // el sync corre como job en background: poll hasta que termine
+                  for (;;) {
+                    const j = await api.jobs.get(job_id);
+                    if (j.status === "succeeded") {
+                      status.textContent = `Sync OK (${Math.round(j.elapsed_seconds || 0)}s)`;
+                      break;
+                    }
+                    if (j.status === "failed") {
+                      status.textContent = `Error: ${j.error || "sync failed"}`;
+                      break;
+                    }
+                    const eta = j.eta_seconds != null ? ` · ETA ${Math.round(j.eta_seconds)}s` : "";
+                    status.textContent = j.status === "queued"
+                      ? "En cola…"
+                      : `Sincronizando ${j.phase || ""} ${j.categories_done}/${j.categories_total}${eta}`;
+                    await new Promise((res) => setTimeout(res, 2000));
+                  }
                 } catch(e) {
                   status.textContent = `Error: ${e.message}`;
                 }
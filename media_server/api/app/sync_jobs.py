@@ -0,0 +1,271 @@
+"""
+Jobs de sync de catálogo en background, con la cola en Postgres (tabla sync_jobs).
+
+Los endpoints encolan (enqueue_sync_job) y devuelven el id; los workers de main.py
+reclaman jobs con FOR UPDATE SKIP LOCKED (varios workers / procesos no se pisan) y
+los corren con commits por categoría. El progreso se escribe por una Session aparte,
+así un rollback del sync no se lleva el progreso y GET /jobs/{id} lo ve en vivo.
+"""
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+import threading
+import time
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models import SyncJob
+from app.pg_locks import advisory_lock
+from app.provider_auto_sync import PROVIDER_SYNC_LOCK
+
+
+log = logging.getLogger("mini_media_server")
+
+SYNC_JOB_WORKERS = int(os.getenv("SYNC_JOB_WORKERS", "1"))
+SYNC_JOB_POLL_SECONDS = float(os.getenv("SYNC_JOB_POLL_SECONDS", "2"))
+# running sin heartbeat por más de esto = el proceso murió a mitad de job
+SYNC_JOB_STALE_MINUTES = int(os.getenv("SYNC_JOB_STALE_MINUTES", "15"))
+
+JOB_KINDS = ("sync_all", "sync_vod_streams")
+ACTIVE_STATUSES = ("queued", "running")
+
+_PROGRESS_FLUSH_SECONDS = 1.0
+# updated_at se refresca al menos así de seguido mientras el job corre, aunque no avance
+# (esperando el lock del provider o en una categoría larga): fail_stale_jobs no lo toma por muerto
+_HEARTBEAT_SECONDS = min(60.0, SYNC_JOB_STALE_MINUTES * 60 / 3)
+
+
+def enqueue_sync_job(db: Session, kind: str, provider_id, params: dict) -> tuple[SyncJob, bool]:
+    """
+    Encola un job. Si ya hay uno queued/running del mismo tipo para el provider, devuelve
+    ese en vez de duplicar el trabajo.
+
+    Returns:
+        (job, created)
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"unknown job kind: {kind}")
+
+    existing = db.execute(
+        select(SyncJob)
+        .where(
+            SyncJob.provider_id == provider_id,
+            SyncJob.kind == kind,
+            SyncJob.status.in_(ACTIVE_STATUSES),
+        )
+        .order_by(SyncJob.created_at.asc())
+        .limit(1)
+    ).scalar_one_or_none()
+    if existing:
+        return existing, False
+
+    job = SyncJob(kind=kind, provider_id=provider_id, params=params, status="queued")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job, True
+
+
+def claim_next_job(db: Session) -> SyncJob | None:
+    job = db.execute(
+        select(SyncJob)
+        .where(SyncJob.status == "queued")
+        .order_by(SyncJob.created_at.asc())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar_one_or_none()
+    if not job:
+        db.rollback()
+        return None
+
+    now = datetime.now(timezone.utc)
+    job.status = "running"
+    job.phase = "starting"
+    job.started_at = now
+    job.updated_at = now
+    db.commit()
+    return job
+
+
+def fail_stale_jobs(db: Session) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=SYNC_JOB_STALE_MINUTES)
+    res = db.execute(
+        update(SyncJob)
+        .where(SyncJob.status == "running", SyncJob.updated_at < cutoff)
+        .values(
+            status="failed",
+            error="worker lost (no progress heartbeat)",
+            finished_at=datetime.now(timezone.utc),
+            updated_at=datetime.now(timezone.utc),
+        )
+    )
+    db.commit()
+    return int(res.rowcount or 0)
+
+
+class JobProgress:
+    """
+    Callback de progreso que reciben los syncs (progress=...). Acumula en memoria y
+    escribe la fila del job como mucho una vez por segundo.
+    """
+
+    def __init__(self, job_id: uuid.UUID) -> None:
+        self.job_id = job_id
+        self.phase_name: str | None = None
+        self.categories_total = 0
+        self.categories_done = 0
+        self.items_done = 0
+        self._planned: dict[str, int] = {}
+        self._last_flush = 0.0
+        # flush() también lo llama el heartbeat desde otro thread
+        self._flush_lock = threading.Lock()
+
+    def plan(self, categories_by_phase: dict[str, int]) -> None:
+        """Total estimado de categorías antes de arrancar (para que el ETA tenga sentido desde el inicio)."""
+        self._planned = dict(categories_by_phase)
+        self.categories_total = sum(self._planned.values())
+        self.flush(force=True)
+
+    def phase(self, name: str, categories: int | None = None) -> None:
+        self.phase_name = name
+        if categories is not None:
+            # el sync puede re-leer las categorías del panel y encontrar otro número
+            planned = self._planned.pop(name, 0)
+            self.categories_total += categories - planned
+        self.flush(force=True)
+
+    def advance(self, categories: int = 0, items: int = 0) -> None:
+        self.categories_done += categories
+        self.items_done += items
+        self.flush()
+
+    def flush(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_flush < _PROGRESS_FLUSH_SECONDS:
+            return
+        self._last_flush = now
+        with self._flush_lock, SessionLocal() as s:
+            s.execute(
+                update(SyncJob)
+                .where(SyncJob.id == self.job_id, SyncJob.status == "running")
+                .values(
+                    phase=self.phase_name,
+                    categories_total=max(self.categories_total, self.categories_done),
+                    categories_done=self.categories_done,
+                    items_done=self.items_done,
+                    updated_at=datetime.now(timezone.utc),
+                )
+            )
+            s.commit()
+
+
+def _heartbeat(progress: JobProgress, stop: threading.Event) -> None:
+    while not stop.wait(_HEARTBEAT_SECONDS):
+        try:
+            progress.flush(force=True)
+        except Exception as e:
+            log.warning("Sync job %s heartbeat failed: %s", progress.job_id, e)
+
+
+def _execute(db: Session, job: SyncJob, progress: JobProgress) -> dict:
+    # Import here to avoid circular import
+    from app.routers.providers import run_sync_all, run_sync_vod_streams
+
+    params = dict(job.params or {})
+    if job.kind == "sync_all":
+        return run_sync_all(db, str(job.provider_id), progress=progress, **params)
+    if job.kind == "sync_vod_streams":
+        return run_sync_vod_streams(db, str(job.provider_id), progress=progress, **params)
+    raise ValueError(f"unknown job kind: {job.kind}")
+
+
+def run_next_sync_job() -> bool:
+    """Reclama y corre un job. False si no había nada encolado."""
+    db = SessionLocal()
+    try:
+        job = claim_next_job(db)
+        if not job:
+            return False
+
+        job_id = job.id
+        progress = JobProgress(job_id)
+        log.info("Sync job %s started kind=%s provider_id=%s", job_id, job.kind, job.provider_id)
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(
+            target=_heartbeat, args=(progress, stop_heartbeat), name=f"sync-job-heartbeat-{job_id}", daemon=True
+        )
+        heartbeat.start()
+        try:
+            # mismo lock que el auto-sync: nunca dos syncs del mismo provider a la vez
+            progress.phase("waiting_lock")
+            with advisory_lock(PROVIDER_SYNC_LOCK, job.provider_id, wait=True):
+                result = _execute(db, job, progress)
+            status, error = "succeeded", None
+        except HTTPException as e:
+            db.rollback()
+            result, status, error = None, "failed", str(e.detail)
+        except Exception as e:
+            db.rollback()
+            log.exception("Sync job %s failed: %s", job_id, e)
+            result, status, error = None, "failed", str(e)[:2000]
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+
+        progress.phase_name = "done" if status == "succeeded" else progress.phase_name
+        progress.flush(force=True)
+        now = datetime.now(timezone.utc)
+        res = db.execute(
+            update(SyncJob)
+            .where(SyncJob.id == job_id, SyncJob.status == "running")
+            .values(status=status, result=result, error=error, finished_at=now, updated_at=now)
+        )
+        db.commit()
+        if not res.rowcount:
+            # otro proceso ya lo dio por muerto (fail_stale_jobs): no pisar ese estado
+            log.warning("Sync job %s finished as %s but was no longer running", job_id, status)
+        else:
+            log.info("Sync job %s %s", job_id, status)
+        return True
+    finally:
+        db.close()
+
+
+def job_out(job: SyncJob) -> dict:
+    """Estado del job con items/s y ETA calculados al vuelo."""
+    now = datetime.now(timezone.utc)
+    elapsed = None
+    if job.started_at:
+        elapsed = ((job.finished_at or now) - job.started_at).total_seconds()
+
+    items_per_s = None
+    eta_seconds = None
+    if elapsed and elapsed > 0:
+        items_per_s = round(job.items_done / elapsed, 1)
+        remaining = max(0, job.categories_total - job.categories_done)
+        if job.status == "running" and job.categories_done > 0:
+            eta_seconds = round(remaining * elapsed / job.categories_done, 1)
+
+    return {
+        "id": str(job.id),
+        "kind": job.kind,
+        "provider_id": str(job.provider_id),
+        "params": job.params,
+        "status": job.status,
+        "phase": job.phase,
+        "categories_done": job.categories_done,
+        "categories_total": job.categories_total,
+        "items_done": job.items_done,
+        "items_per_s": items_per_s,
+        "elapsed_seconds": round(elapsed, 1) if elapsed is not None else None,
+        "eta_seconds": eta_seconds,
+        "error": job.error,
+        "result": job.result,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
@@ -1,6 +1,8 @@
-import gzip
+import hashlib
 import os
 import tempfile
+import zlib
+from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
 
 import httpx
@@ -9,6 +11,19 @@ from lxml import etree
 def xmltv_url(base_url: str, username: str, password: str) -> str:
     return f"{base_url.rstrip('/')}/xmltv.php?username={username}&password={password}"
 
+_TZ_CACHE: dict[str, timezone] = {}
+
+
+def _xmltv_tz(tz_raw: str) -> timezone:
+    tz = _TZ_CACHE.get(tz_raw)
+    if tz is None:
+        sign = 1 if tz_raw.startswith("+") else -1
+        hh = int(tz_raw[1:3])
+        mm = int(tz_raw[3:5])
+        tz = _TZ_CACHE[tz_raw] = timezone(timedelta(hours=hh, minutes=mm) * sign)
+    return tz
+
+
 def parse_xmltv_datetime(s: str) -> datetime:
     """
     XMLTV típico: YYYYMMDDHHMMSS +0000
@@ -22,45 +37,133 @@ def parse_xmltv_datetime(s: str) -> datetime:
     dt_raw = parts[0]
     tz_raw = parts[1] if len(parts) > 1 else "+0000"
 
-    dt = datetime.strptime(dt_raw, "%Y%m%d%H%M%S")
+    if len(dt_raw) == 14 and dt_raw.isdigit():
+        # camino rápido (strptime es lo más caro de todo el parseo de la guía)
+        dt = datetime(
+            int(dt_raw[0:4]), int(dt_raw[4:6]), int(dt_raw[6:8]),
+            int(dt_raw[8:10]), int(dt_raw[10:12]), int(dt_raw[12:14]),
+        )
+    else:
+        dt = datetime.strptime(dt_raw, "%Y%m%d%H%M%S")
 
-    sign = 1 if tz_raw.startswith("+") else -1
-    hh = int(tz_raw[1:3])
-    mm = int(tz_raw[3:5])
-    offset = timedelta(hours=hh, minutes=mm) * sign
+    return dt.replace(tzinfo=_xmltv_tz(tz_raw)).astimezone(timezone.utc)
 
-    return dt.replace(tzinfo=timezone(offset)).astimezone(timezone.utc)
+# Trozos de red / escritura: la memoria queda acotada a esto (más el buffer de zlib)
+XMLTV_CHUNK_BYTES = 1024 * 1024
 
-def download_xmltv_to_file(url: str, timeout: float = 60.0) -> str:
-    """
-    Descarga XMLTV a un archivo temporal. Soporta gzip.
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class _GunzipStream:
+    """Descompresión gzip incremental (soporta varios miembros concatenados)."""
+
+    def __init__(self) -> None:
+        self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def feed(self, data: bytes) -> bytes:
+        out = []
+        while data:
+            out.append(self._d.decompress(data))
+            data = self._d.unused_data
+            if data:
+                # terminó un miembro y empieza otro
+                self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return b"".join(out)
+
+    def flush(self) -> bytes:
+        return self._d.flush()
+
+
+@dataclass
+class XmltvFetch:
+    """Resultado de fetch_xmltv. path es None si el server contestó 304."""
+
+    path: str | None
+    not_modified: bool
+    etag: str | None
+    last_modified: str | None
+    digest: str | None  # sha256 del XML descomprimido
+
+
+def fetch_xmltv(
+    url: str,
+    etag: str | None = None,
+    last_modified: str | None = None,
+    timeout: float = 60.0,
+) -> XmltvFetch:
     """
-    with httpx.Client(timeout=timeout, follow_redirects=True) as client:
-        r = client.get(url)
-        r.raise_for_status()
+    Descarga XMLTV a un archivo temporal en streaming: cada trozo se descomprime (si es
+    gzip) y se escribe a disco, nunca se tiene el body completo en memoria.
 
-        content = r.content
-        enc = (r.headers.get("content-encoding") or "").lower()
+    Soporta Content-Encoding: gzip (lo decodifica httpx) y archivos .xml.gz servidos tal
+    cual (se detecta por los magic bytes).
 
-        if enc == "gzip" or content[:2] == b"\x1f\x8b":
-            content = gzip.decompress(content)
+    Con etag / last_modified hace un GET condicional (If-None-Match / If-Modified-Since).
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
 
     fd, path = tempfile.mkstemp(prefix="xmltv_", suffix=".xml")
-    os.close(fd)
-    with open(path, "wb") as f:
-        f.write(content)
-    return path
+    try:
+        with os.fdopen(fd, "wb") as f, httpx.Client(timeout=timeout, follow_redirects=True) as client:
+            with client.stream("GET", url, headers=headers) as r:
+                if r.status_code == 304:
+                    os.remove(path)
+                    return XmltvFetch(None, True, etag, last_modified, None)
+                r.raise_for_status()
+                digest = hashlib.sha256()
+                gunzip = None
+                first = True
+                for chunk in r.iter_bytes(XMLTV_CHUNK_BYTES):
+                    if not chunk:
+                        continue
+                    if first:
+                        first = False
+                        if chunk[:2] == _GZIP_MAGIC:
+                            gunzip = _GunzipStream()
+                    data = gunzip.feed(chunk) if gunzip else chunk
+                    digest.update(data)
+                    f.write(data)
+                if gunzip:
+                    data = gunzip.flush()
+                    digest.update(data)
+                    f.write(data)
+                return XmltvFetch(
+                    path,
+                    False,
+                    r.headers.get("etag"),
+                    r.headers.get("last-modified"),
+                    digest.hexdigest(),
+                )
+    except Exception:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+
+
+def download_xmltv_to_file(url: str, timeout: float = 60.0) -> str:
+    """Descarga incondicional (ver fetch_xmltv). Devuelve el path del archivo temporal."""
+    return fetch_xmltv(url, timeout=timeout).path
 
 def iter_xmltv(path: str):
     """
     Generator de eventos (channels, programmes) usando iterparse.
+
+    Cada elemento ya procesado se borra del árbol (no solo clear()), así la memoria no
+    crece con el tamaño de la guía.
     """
-    context = etree.iterparse(path, events=("end",), recover=True, huge_tree=True)
+    context = etree.iterparse(
+        path, events=("end",), tag=("channel", "programme"), recover=True, huge_tree=True
+    )
     for _, elem in context:
-        tag = elem.tag
-        if tag == "channel":
-            yield ("channel", elem)
-            elem.clear()
-        elif tag == "programme":
-            yield ("programme", elem)
-            elem.clear()
+        yield (elem.tag, elem)
+        elem.clear()
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
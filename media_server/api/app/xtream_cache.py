@@ -0,0 +1,263 @@
+"""
+Cache en disco de respuestas de player_api.php.
+
+- key = (base_url, action, params sin credenciales)
+- body guardado gzip, meta (ETag / Last-Modified / stored_at) en un json al lado
+- TTL por action: dentro del TTL se sirve local; pasado el TTL se revalida con
+  If-None-Match / If-Modified-Since (un 304 reutiliza el body guardado)
+- tamaño acotado con desalojo LRU (mtime se toca en cada hit)
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+
+log = logging.getLogger("xtream_cache")
+
+XTREAM_CACHE = os.getenv("XTREAM_CACHE", "1").strip().lower() not in {"0", "false", "no", "off"}
+XTREAM_CACHE_DIR = os.getenv("XTREAM_CACHE_DIR", os.path.join(tempfile.gettempdir(), "xtream_cache"))
+XTREAM_CACHE_MAX_MB = int(os.getenv("XTREAM_CACHE_MAX_MB", "512"))
+
+# Segundos que una respuesta se sirve sin tocar el panel. 0 = siempre revalidar
+# (condicional), actions que no están acá no se cachean.
+DEFAULT_ACTION_TTLS: dict[str, int] = {
+    # las listas de categorías deciden qué se desactiva en el sync: nunca servirlas viejas
+    "get_live_categories": 0,
+    "get_vod_categories": 0,
+    "get_series_categories": 0,
+    "get_live_streams": 0,
+    "get_vod_streams": 0,
+    "get_series": 0,
+    "get_vod_info": 6 * 3600,
+    "get_series_info": 3600,
+}
+
+_CREDENTIAL_PARAMS = {"username", "password"}
+
+
+def _parse_ttls(raw: str) -> dict[str, int]:
+    # XTREAM_CACHE_TTLS="get_vod_info=3600,get_series_info=600"
+    out: dict[str, int] = {}
+    for part in (raw or "").split(","):
+        if "=" not in part:
+            continue
+        action, _, value = part.partition("=")
+        try:
+            out[action.strip()] = int(value.strip())
+        except ValueError:
+            continue
+    return out
+
+
+ACTION_TTLS = {**DEFAULT_ACTION_TTLS, **_parse_ttls(os.getenv("XTREAM_CACHE_TTLS", ""))}
+
+
+def action_ttl(action: str) -> int | None:
+    ttl = ACTION_TTLS.get(action)
+    if ttl is None or ttl < 0:
+        return None
+    return ttl
+
+
+def cache_key(base_url: str, action: str, params: dict) -> str:
+    clean = {k: str(v) for k, v in params.items() if k not in _CREDENTIAL_PARAMS}
+    raw = json.dumps([base_url.strip().rstrip("/").lower(), action, clean], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+@dataclass
+class CachedResponse:
+    key: str
+    body_path: str
+    meta: dict
+
+    @property
+    def age(self) -> float:
+        return time.time() - float(self.meta.get("stored_at") or 0)
+
+    def is_fresh(self, ttl: int) -> bool:
+        return ttl > 0 and self.age < ttl
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+    def json(self):
+        with gzip.open(self.body_path, "rb") as f:
+            return json.loads(f.read())
+
+
+_lock = threading.Lock()
+_total_bytes: int | None = None
+_stats = {"hits": 0, "revalidated": 0, "misses": 0, "stores": 0, "skipped": 0, "evictions": 0, "errors": 0}
+
+
+def _count(field: str, n: int = 1) -> None:
+    with _lock:
+        _stats[field] += n
+
+
+def _paths(key: str) -> tuple[str, str]:
+    d = os.path.join(XTREAM_CACHE_DIR, key[:2])
+    return os.path.join(d, f"{key}.json.gz"), os.path.join(d, f"{key}.meta.json")
+
+
+def _iter_entries():
+    if not os.path.isdir(XTREAM_CACHE_DIR):
+        return
+    for root, _, files in os.walk(XTREAM_CACHE_DIR):
+        for name in files:
+            if name.endswith(".json.gz"):
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+
+def _ensure_total() -> None:
+    global _total_bytes
+    if _total_bytes is None:
+        _total_bytes = sum(size for _, size, _ in _iter_entries())
+
+
+def _remove(body_path: str) -> int:
+    meta_path = body_path[: -len(".json.gz")] + ".meta.json"
+    size = 0
+    try:
+        size = os.path.getsize(body_path)
+        os.remove(body_path)
+    except OSError:
+        pass
+    try:
+        os.remove(meta_path)
+    except OSError:
+        pass
+    return size
+
+
+def _evict_locked() -> None:
+    global _total_bytes
+    limit = XTREAM_CACHE_MAX_MB * 1024 * 1024
+    if _total_bytes is None or _total_bytes <= limit:
+        return
+    # baja al 90% para no desalojar en cada store
+    target = int(limit * 0.9)
+    for path, _, _ in sorted(_iter_entries(), key=lambda e: e[2]):
+        if _total_bytes <= target:
+            break
+        _total_bytes -= _remove(path)
+        _stats["evictions"] += 1
+    _total_bytes = max(0, _total_bytes)
+
+
+def lookup(key: str) -> CachedResponse | None:
+    body_path, meta_path = _paths(key)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        os.utime(body_path)  # LRU
+    except (OSError, ValueError):
+        return None
+    return CachedResponse(key=key, body_path=body_path, meta=meta)
+
+
+def worth_storing(ttl: int, headers) -> bool:
+    """
+    Con TTL 0 y sin ETag / Last-Modified la entrada nunca se podría usar (nunca está
+    fresca y no hay con qué revalidar): no vale comprimirla ni que desaloje a otras.
+    """
+    if ttl > 0 or headers.get("etag") or headers.get("last-modified"):
+        return True
+    _count("skipped")
+    return False
+
+
+def store(key: str, action: str, body: bytes, headers) -> None:
+    """Guarda el body (ya decodificado) comprimido. Errores de disco no rompen el request."""
+    global _total_bytes
+    body_path, meta_path = _paths(key)
+    meta = {
+        "action": action,
+        "etag": headers.get("etag"),
+        "last_modified": headers.get("last-modified"),
+        "stored_at": time.time(),
+        "raw_size": len(body),
+    }
+    with _lock:
+        _ensure_total()
+    try:
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        data = gzip.compress(body, compresslevel=5)
+        tmp = f"{body_path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        old_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+        os.replace(tmp, body_path)
+        _write_meta(meta_path, meta)
+    except OSError as e:
+        _count("errors")
+        log.warning("xtream cache store failed key=%s err=%s", key, e)
+        return
+
+    with _lock:
+        _total_bytes += len(data) - old_size
+        _stats["stores"] += 1
+        _evict_locked()
+
+
+def refresh(entry: CachedResponse, headers) -> None:
+    """Tras un 304: reinicia el TTL y actualiza validadores si el panel mandó nuevos."""
+    entry.meta["stored_at"] = time.time()
+    if headers.get("etag"):
+        entry.meta["etag"] = headers.get("etag")
+    if headers.get("last-modified"):
+        entry.meta["last_modified"] = headers.get("last-modified")
+    try:
+        _write_meta(_paths(entry.key)[1], entry.meta)
+    except OSError:
+        _count("errors")
+
+
+def _write_meta(meta_path: str, meta: dict) -> None:
+    tmp = f"{meta_path}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+
+
+def discard(entry: CachedResponse) -> None:
+    global _total_bytes
+    size = _remove(entry.body_path)
+    with _lock:
+        if _total_bytes is not None:
+            _total_bytes = max(0, _total_bytes - size)
+
+
+def record(outcome: str) -> None:
+    """outcome: hits | revalidated | misses"""
+    _count(outcome)
+
+
+def cache_stats() -> dict:
+    with _lock:
+        _ensure_total()
+        return {
+            "enabled": XTREAM_CACHE,
+            "dir": XTREAM_CACHE_DIR,
+            "max_mb": XTREAM_CACHE_MAX_MB,
+            "size_mb": round((_total_bytes or 0) / (1024 * 1024), 2),
+            "ttls": ACTION_TTLS,
+            **_stats,
+        }
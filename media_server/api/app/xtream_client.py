@@ -1,12 +1,145 @@
+import codecs
+import json
+import os
+import queue
+import threading
 import time
 import httpx
 
+from app import xtream_cache
+
+# Fetch concurrente de categorías (sync). El tope por provider evita que un valor alto
+# en el request termine tumbando paneles que limitan conexiones simultáneas.
+XTREAM_FETCH_CONCURRENCY = int(os.getenv("XTREAM_FETCH_CONCURRENCY", "4"))
+XTREAM_MAX_CONCURRENCY_PER_PROVIDER = int(os.getenv("XTREAM_MAX_CONCURRENCY_PER_PROVIDER", "8"))
+# Items por lote en modo streaming (get_vod_streams completo puede pesar 50-150 MB)
+XTREAM_STREAM_BATCH = int(os.getenv("XTREAM_STREAM_BATCH", "2000"))
+# Tope de tiempo de descarga de una respuesta en streaming (sin contar lo que tarda el
+# writer entre lotes). El timeout de httpx es por lectura: un panel que manda de a pocos
+# bytes nunca lo dispara y dejaría al sync colgado.
+XTREAM_STREAM_MAX_SECONDS = float(os.getenv("XTREAM_STREAM_MAX_SECONDS", "1800"))
+
+# Pool HTTP por base_url (keep-alive). HTTP/2 solo si está instalado `h2`
+# (pip install httpx[http2]); brotli solo si está `brotli`/`brotlicffi`.
+XTREAM_HTTP2 = os.getenv("XTREAM_HTTP2", "1").strip().lower() not in {"0", "false", "no", "off"}
+XTREAM_POOL_MAX_CONNECTIONS = int(os.getenv("XTREAM_POOL_MAX_CONNECTIONS", str(XTREAM_MAX_CONCURRENCY_PER_PROVIDER)))
+XTREAM_POOL_MAX_KEEPALIVE = int(os.getenv("XTREAM_POOL_MAX_KEEPALIVE", str(XTREAM_POOL_MAX_CONNECTIONS)))
+XTREAM_POOL_KEEPALIVE_EXPIRY = float(os.getenv("XTREAM_POOL_KEEPALIVE_EXPIRY", "30"))
+
+
+def _has_module(name: str) -> bool:
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+
+_HTTP2_ENABLED = XTREAM_HTTP2 and _has_module("h2")
+_ACCEPT_ENCODING = "gzip, deflate, br" if (_has_module("brotli") or _has_module("brotlicffi")) else "gzip, deflate"
+
+
 class XtreamError(Exception):
     pass
 
 def _player_api_url(base_url: str) -> str:
     return base_url.rstrip("/") + "/player_api.php"
 
+
+class _PoolStats:
+    """Contadores por base_url. connections_opened sale del trace de httpcore."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.errors = 0
+
+    def trace(self, event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            with self.lock:
+                self.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            with self.lock:
+                self.tls_handshakes += 1
+
+    def count(self, field: str) -> None:
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            reused = max(0, self.requests - self.connections_opened)
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes,
+                "reused": reused,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else None,
+                "errors": self.errors,
+            }
+
+
+_CLIENTS: dict[str, tuple[httpx.Client, _PoolStats]] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _pool_key(base_url: str) -> str:
+    return base_url.strip().rstrip("/").lower()
+
+
+def get_xtream_client(base_url: str) -> tuple[httpx.Client, _PoolStats]:
+    """
+    Cliente compartido (process-wide) para un panel. httpx.Client es thread-safe, así que
+    lo usan a la vez el sync, los workers de fetch concurrente y los endpoints de info.
+    """
+    key = _pool_key(base_url)
+    with _CLIENTS_LOCK:
+        entry = _CLIENTS.get(key)
+        if entry is None:
+            client = httpx.Client(
+                http2=_HTTP2_ENABLED,
+                follow_redirects=True,
+                timeout=httpx.Timeout(120.0, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=XTREAM_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=XTREAM_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=XTREAM_POOL_KEEPALIVE_EXPIRY,
+                ),
+                headers={"Accept-Encoding": _ACCEPT_ENCODING},
+            )
+            entry = _CLIENTS[key] = (client, _PoolStats())
+        return entry
+
+
+def close_xtream_clients() -> None:
+    with _CLIENTS_LOCK:
+        entries = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for client, _ in entries:
+        try:
+            client.close()
+        except Exception:
+            pass
+
+
+def xtream_pool_stats() -> dict:
+    with _CLIENTS_LOCK:
+        entries = list(_CLIENTS.items())
+    return {
+        "http2": _HTTP2_ENABLED,
+        "accept_encoding": _ACCEPT_ENCODING,
+        "limits": {
+            "max_connections": XTREAM_POOL_MAX_CONNECTIONS,
+            "max_keepalive_connections": XTREAM_POOL_MAX_KEEPALIVE,
+            "keepalive_expiry": XTREAM_POOL_KEEPALIVE_EXPIRY,
+        },
+        "clients": [{"base_url": key, **stats.snapshot()} for key, (_, stats) in entries],
+        "cache": xtream_cache.cache_stats(),
+    }
+
+
 def xtream_get(
     base_url: str,
     username: str,
@@ -14,10 +147,31 @@ def xtream_get(
     action: str,
     timeout: float = 120.0,   # ✅ antes 20s, ahora 120s
     retries: int = 2,         # ✅ retry simple
+    cache: bool = True,
     **extra_params
 ):
+    """
+    GET a player_api.php por el cliente pooled. Con cache=True (y si la action tiene TTL,
+    ver xtream_cache.ACTION_TTLS) responde desde disco dentro del TTL y, pasado el TTL,
+    revalida con If-None-Match / If-Modified-Since.
+    """
     url = _player_api_url(base_url)
     params = {"username": username, "password": password, "action": action, **extra_params}
+    client, stats = get_xtream_client(base_url)
+
+    ttl = xtream_cache.action_ttl(action) if (cache and xtream_cache.XTREAM_CACHE) else None
+    key = xtream_cache.cache_key(base_url, action, extra_params) if ttl is not None else None
+    cached = xtream_cache.lookup(key) if key else None
+    if cached is not None and cached.is_fresh(ttl):
+        try:
+            data = cached.json()
+            xtream_cache.record("hits")
+            return data
+        except Exception:
+            xtream_cache.discard(cached)
+            cached = None
+
+    headers = cached.conditional_headers() if cached is not None else {}
 
     # timeout granular (evita que connect sea rápido pero read muera)
     t = httpx.Timeout(timeout, connect=10.0)
@@ -25,16 +179,254 @@ def xtream_get(
     last_err = None
     for attempt in range(retries + 1):
         try:
-            with httpx.Client(timeout=t, follow_redirects=True) as client:
-                r = client.get(url, params=params)
-                r.raise_for_status()
+            stats.count("requests")
+            r = client.get(url, params=params, headers=headers, timeout=t, extensions={"trace": stats.trace})
+            if r.status_code == 304 and cached is not None:
                 try:
-                    return r.json()
-                except Exception as e:
-                    raise XtreamError(f"Respuesta no es JSON. status={r.status_code} err={e}") from e
+                    data = cached.json()
+                except Exception:
+                    # body local roto: se pide de nuevo sin condicionales
+                    xtream_cache.discard(cached)
+                    cached, headers = None, {}
+                    raise XtreamError("cached body unreadable after 304")
+                xtream_cache.refresh(cached, r.headers)
+                xtream_cache.record("revalidated")
+                return data
+            r.raise_for_status()
+            try:
+                data = r.json()
+            except Exception as e:
+                raise XtreamError(f"Respuesta no es JSON. status={r.status_code} err={e}") from e
+            if key:
+                xtream_cache.record("misses")
+                if xtream_cache.worth_storing(ttl, r.headers):
+                    xtream_cache.store(key, action, r.content, r.headers)
+                elif cached is not None:
+                    # el panel dejó de mandar validadores: la entrada vieja ya no sirve
+                    xtream_cache.discard(cached)
+            return data
         except Exception as e:
             last_err = e
+            stats.count("errors")
             if attempt < retries:
                 time.sleep(1.0 * (attempt + 1))  # backoff 1s, 2s...
                 continue
             raise XtreamError(f"Xtream GET failed action={action} params={extra_params} err={e}") from e
+
+
+_DONE = object()
+
+
+def iter_xtream_concurrent(
+    base_url: str,
+    username: str,
+    password: str,
+    action: str,
+    param: str,
+    values: list,
+    concurrency: int | None = None,
+    timeout: float = 120.0,
+    retries: int = 2,
+):
+    """
+    Fetch stage concurrente: pide `action` una vez por cada valor de `param`
+    (típicamente category_id) con hasta N requests en vuelo, y va entregando
+    (value, data, error) en orden de llegada.
+
+    Los requests salen por el cliente pooled del panel (get_xtream_client) desde N
+    threads, así que reutilizan las conexiones keep-alive del resto del proceso. El
+    consumidor (el writer de DB, que usa una Session no thread-safe) sigue siendo código
+    síncrono. La cola es acotada: si el writer va más lento que la red, el fetch espera.
+    """
+    values = list(values)
+    if not values:
+        return
+
+    limit = max(1, min(concurrency or XTREAM_FETCH_CONCURRENCY, XTREAM_MAX_CONCURRENCY_PER_PROVIDER, len(values)))
+    todo: queue.Queue = queue.Queue()
+    for v in values:
+        todo.put(v)
+    out: queue.Queue = queue.Queue(maxsize=limit * 2)
+    stop = threading.Event()
+    remaining = [limit]
+    remaining_lock = threading.Lock()
+
+    def _put(item) -> None:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _worker() -> None:
+        try:
+            while not stop.is_set():
+                try:
+                    value = todo.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    data = xtream_get(
+                        base_url, username, password, action,
+                        timeout=timeout, retries=retries, **{param: value},
+                    )
+                    _put((value, data, None))
+                except Exception as e:
+                    _put((value, None, e))
+        finally:
+            with remaining_lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                _put(_DONE)
+
+    for i in range(limit):
+        threading.Thread(target=_worker, name=f"xtream-fetch-{action}-{i}", daemon=True).start()
+
+    try:
+        while True:
+            item = out.get()
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        # Si el consumidor corta antes (error de DB, etc.) los workers dejan de pedir
+        stop.set()
+
+
+def iter_json_array(chunks):
+    """
+    Parser incremental de un array JSON top-level: va entregando cada elemento en cuanto
+    está completo, sin tener nunca el documento entero en memoria.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    it = iter(chunks)
+    buf, pos, eof = "", 0, False
+
+    def more() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        try:
+            data = next(it)
+        except StopIteration:
+            eof = True
+            data = b""
+        buf = buf[pos:] + utf8.decode(data, final=eof)
+        pos = 0
+        return True
+
+    def skip_ws() -> None:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or not more():
+                return
+
+    skip_ws()
+    if pos >= len(buf) or buf[pos] != "[":
+        raise ValueError("expected JSON array")
+    pos += 1
+
+    expect_value = True
+    first = True
+    while True:
+        skip_ws()
+        if pos >= len(buf):
+            raise ValueError("unexpected end of JSON array")
+
+        ch = buf[pos]
+        if ch == "]" and (first or not expect_value):
+            return
+        if not expect_value:
+            if ch != ",":
+                raise ValueError(f"expected ',' or ']' in JSON array, got {ch!r}")
+            pos += 1
+            expect_value = True
+            continue
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if more():
+                    continue
+                raise
+            # un valor pegado al final del buffer (o un número cortado tipo "1." / "2e")
+            # podría seguir en el próximo chunk
+            if (end >= len(buf) or buf[end] not in " \t\r\n,]") and more():
+                continue
+            break
+
+        pos = end
+        yield value
+        first = False
+        expect_value = False
+
+
+def _download_budget(chunks, max_seconds: float):
+    """Pasa los chunks y corta si la espera acumulada de la red supera max_seconds."""
+    waited = 0.0
+    it = iter(chunks)
+    while True:
+        started = time.monotonic()
+        try:
+            chunk = next(it)
+        except StopIteration:
+            return
+        waited += time.monotonic() - started
+        if waited > max_seconds:
+            raise XtreamError(f"download exceeded {max_seconds:.0f}s")
+        yield chunk
+
+
+def xtream_stream(
+    base_url: str,
+    username: str,
+    password: str,
+    action: str,
+    batch_size: int | None = None,
+    timeout: float = 300.0,
+    retries: int = 2,
+    **extra_params
+):
+    """
+    Como xtream_get, pero para respuestas que son un array enorme: parsea mientras
+    descarga y entrega listas de hasta `batch_size` items. La memoria queda acotada
+    al lote, no al tamaño del catálogo.
+
+    Solo reintenta si todavía no entregó ningún lote (después ya no es idempotente
+    para el consumidor).
+    """
+    url = _player_api_url(base_url)
+    params = {"username": username, "password": password, "action": action, **extra_params}
+    size = max(1, batch_size or XTREAM_STREAM_BATCH)
+    t = httpx.Timeout(timeout, connect=10.0)
+    client, stats = get_xtream_client(base_url)
+
+    for attempt in range(retries + 1):
+        yielded = False
+        try:
+            stats.count("requests")
+            with client.stream("GET", url, params=params, timeout=t, extensions={"trace": stats.trace}) as r:
+                r.raise_for_status()
+                batch = []
+                for item in iter_json_array(_download_budget(r.iter_bytes(65536), XTREAM_STREAM_MAX_SECONDS)):
+                    batch.append(item)
+                    if len(batch) >= size:
+                        yielded = True
+                        yield batch
+                        batch = []
+                if batch:
+                    yielded = True
+                    yield batch
+            return
+        except Exception as e:
+            stats.count("errors")
+            if not yielded and attempt < retries:
+                time.sleep(1.0 * (attempt + 1))
+                continue
+            raise XtreamError(f"Xtream stream failed action={action} params={extra_params} err={e}") from e